@@ -1,6 +1,177 @@
-from django.contrib.staticfiles import finders
+import os
+import threading
+import time
 
-from assetfiles import filters
+from django.contrib.staticfiles import finders, utils
+
+from assetfiles import filters, settings, signals
+from assetfiles.stats import stats
+
+
+class AssetIndex(object):
+    """
+    AssetIndex maps the paths of static files to their absolute paths, so
+    finding a file is a dictionary lookup instead of a walk through every
+    finder and static directory.
+
+    The index is built by listing the finders once. The modification times
+    of the static directories are recorded, and checked at most once every
+    `check_interval` seconds. When a file was added or removed in any of
+    them, `assetfiles.signals.static_files_changed` is sent, which discards
+    the index, so it's rebuilt on the next lookup. The runserver watcher
+    sends the signal as soon as it notices changes. Finders that don't
+    expose their storages can't be watched this way, in which case the
+    index is bypassed and the finders are searched directly.
+
+    Attributes:
+        check_interval: The number of seconds between checks of the static
+            directories. Defaults to the ASSETFILES_INDEX_CHECK_INTERVAL
+            setting.
+    """
+
+    def __init__(self, check_interval=None):
+        self._check_interval = check_interval
+        self._checked = 0
+        self._built = False
+        self._files = None
+        self._assets = {}
+        self._dirs = {}
+        self._finders = None
+        self._lock = threading.Lock()
+        signals.static_files_changed.connect(self._on_static_files_changed)
+
+    @property
+    def check_interval(self):
+        if self._check_interval is None:
+            return settings.INDEX_CHECK_INTERVAL
+        return self._check_interval
+
+    def find(self, path):
+        """
+        Returns the absolute path of the given static file, like
+        `django.contrib.staticfiles.finders.find`, or `None`.
+        """
+        files, assets = self._get_index()
+        if files is None:
+            return finders.find(path)
+        return files.get(path)
+
+    def find_asset(self, output_path):
+        """
+        Returns a tuple of the absolute path to the input file and the filter
+        that would output the given path, or (None, None).
+        """
+        files, assets = self._get_index()
+        if files is None:
+            return self._find_asset(output_path, finders.find)
+
+        if output_path not in assets:
+            assets[output_path] = self._find_asset(output_path, files.get)
+        return assets[output_path]
+
+    def check(self):
+        """
+        Sends `assetfiles.signals.static_files_changed` if a file was added
+        to or removed from the static directories since the index was built.
+        Like lookups, this checks the directories at most once every
+        `check_interval` seconds.
+        """
+        if self._is_stale():
+            signals.static_files_changed.send(sender=type(self), paths=None)
+
+    def clear(self):
+        """
+        Discards the index, so it is rebuilt on the next lookup.
+        """
+        with self._lock:
+            self._built = False
+            self._files = None
+            self._assets = {}
+            self._dirs = {}
+            self._finders = None
+
+    def _on_static_files_changed(self, sender, **kwargs):
+        self.clear()
+
+    def _find_asset(self, output_path, find):
+        # Several filters may output the same path, i.e. a bundle and a
+        # CoffeeScript file, so the first one with an existing input wins.
+        for filter in filters.find_all_by_output_path(output_path):
+            for input_path in filter.derive_input_paths(output_path):
+                stats.incr('find.probes')
+                full_input_path = find(input_path)
+                if full_input_path:
+                    return full_input_path, filter
+        return None, None
+
+    def _get_index(self):
+        self.check()
+        with self._lock:
+            current_finders = list(finders.get_finders())
+            if not self._built or self._finders != current_finders:
+                self._build(current_finders)
+            return self._files, self._assets
+
+    def _is_stale(self):
+        """
+        Returns true if a file was added to or removed from any of the static
+        directories since the index was built. The directories are checked
+        at most once every `check_interval` seconds, and without holding the
+        lock, so lookups don't wait for the checks.
+        """
+        with self._lock:
+            now = time.time()
+            if not self._built or now - self._checked < self.check_interval:
+                return False
+            self._checked = now
+            dirs = list(self._dirs.items())
+
+        for path, mtime in dirs:
+            if _get_mtime(path) != mtime:
+                return True
+        return False
+
+    def _build(self, current_finders):
+        self._built = True
+        self._checked = time.time()
+        self._finders = current_finders
+        self._assets = {}
+        self._dirs = {}
+
+        storages = []
+        for finder in current_finders:
+            if not hasattr(finder, 'storages'):
+                self._files = None
+                return
+            storages += list(finder.storages.values())
+
+        files = {}
+        for storage in storages:
+            self._dirs[storage.location] = _get_mtime(storage.location)
+            if not os.path.isdir(storage.location):
+                continue
+            for dir_path, dir_names, file_names in os.walk(storage.location):
+                self._dirs[dir_path] = _get_mtime(dir_path)
+
+            prefix = getattr(storage, 'prefix', None)
+            for path in utils.get_files(storage, []):
+                prefixed_path = os.path.join(prefix, path) if prefix else path
+                if prefixed_path not in files:
+                    files[prefixed_path] = storage.path(path)
+        self._files = files
+
+
+def _get_mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+"""
+The index shared by the views and `find`.
+"""
+index = AssetIndex()
 
 
 def find(output_path):
@@ -22,10 +193,16 @@ def find(output_path):
     >>> find('/path/to/unfiltered.file')
     (None, None)
     """
-    filter = filters.find_by_output_path(output_path)
-    if filter:
-        for input_path in filter.derive_input_paths(output_path):
-            full_input_path = finders.find(input_path)
-            if full_input_path:
-                return full_input_path, filter
-    return None, None
+    with stats.timer('find') as timer:
+        input_path, filter = index.find_asset(output_path)
+    signals.asset_found.send(sender=type(filter) if filter else None,
+                             path=output_path, input_path=input_path,
+                             duration=timer.duration)
+    return input_path, filter
+
+
+def find_static(path):
+    """
+    Returns the absolute path of the given static file, or `None`.
+    """
+    return index.find(path)
@@ -0,0 +1,634 @@
+"""
+Caches for filtered assets, so unchanged assets are not processed again on
+every request.
+"""
+import errno
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from django.utils.encoding import force_bytes
+
+from assetfiles import settings, signals, utils
+from assetfiles.stats import add_duration, stats
+
+
+class MemoryCache(object):
+    """
+    MemoryCache is a thread-safe, process-local LRU cache of filtered content.
+
+    The cache is bounded by the total size of the stored content in bytes.
+    When a new entry exceeds the budget, the least recently used entries are
+    evicted. Entries larger than the whole budget are not stored at all.
+
+    Attributes:
+        max_size: The budget in bytes. Defaults to the
+            ASSETFILES_MEMORY_CACHE_SIZE setting. Set to 0 to disable caching.
+    """
+
+    def __init__(self, max_size=None):
+        self._max_size = max_size
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @property
+    def max_size(self):
+        if self._max_size is None:
+            return settings.MEMORY_CACHE_SIZE
+        return self._max_size
+
+    @property
+    def size(self):
+        return self._size
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            entry = self._entries.pop(key)
+            self._entries[key] = entry
+            return entry[0]
+
+    def set(self, key, value, size=None):
+        if size is None:
+            size = len(value)
+
+        with self._lock:
+            self._delete(key)
+            if size > self.max_size:
+                return False
+            while self._entries and self._size + size > self.max_size:
+                self._delete(next(iter(self._entries)))
+            self._entries[key] = (value, size)
+            self._size += size
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._delete(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _delete(self, key):
+        if key in self._entries:
+            value, size = self._entries.pop(key)
+            self._size -= size
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class MissCache(object):
+    """
+    MissCache is a thread-safe, bounded cache of recently requested paths
+    that could not be found, so repeated requests for missing files don't
+    search the static directories every time.
+
+    Entries expire after a short time. All entries are discarded when
+    `assetfiles.signals.static_files_changed` is sent, i.e. when the
+    runserver watcher or the index of static files notices that a file was
+    added or removed.
+
+    Attributes:
+        max_size: The maximum number of entries. Defaults to the
+            ASSETFILES_MISS_CACHE_SIZE setting. Set to 0 to disable caching.
+        ttl: The number of seconds entries are kept. Defaults to the
+            ASSETFILES_MISS_CACHE_TTL setting.
+    """
+
+    def __init__(self, max_size=None, ttl=None):
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        signals.static_files_changed.connect(self._on_static_files_changed)
+
+    @property
+    def max_size(self):
+        if self._max_size is None:
+            return settings.MISS_CACHE_SIZE
+        return self._max_size
+
+    @property
+    def ttl(self):
+        if self._ttl is None:
+            return settings.MISS_CACHE_TTL
+        return self._ttl
+
+    def add(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            if self.max_size <= 0:
+                return
+            while len(self._entries) >= self.max_size:
+                self._entries.popitem(last=False)
+            self._entries[key] = time.time() + self.ttl
+
+    def has(self, key):
+        """
+        Returns true if the given key was recently added.
+        """
+        with self._lock:
+            expires = self._entries.get(key)
+            if expires is None:
+                return False
+            if expires <= time.time():
+                del self._entries[key]
+                return False
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _on_static_files_changed(self, sender, **kwargs):
+        self.clear()
+
+
+class DiskCache(object):
+    """
+    DiskCache is a content-addressed cache of filtered content on disk, which
+    is shared across processes and restarts.
+
+    Each entry is stored in its own file, named after its key. Entries are
+    written to a temporary file first and then renamed, so readers never see
+    partially written entries. Reading an entry updates its modification time,
+    which is used to prune the least recently used entries once the cache
+    grows larger than its maximum size.
+
+    Attributes:
+        location: The cache directory. Defaults to the ASSETFILES_CACHE_DIR
+            setting. The cache is disabled if it's not set.
+        max_size: The maximum size of the cache in bytes. Defaults to the
+            ASSETFILES_CACHE_MAX_SIZE setting.
+    """
+
+    def __init__(self, location=None, max_size=None):
+        self._location = location
+        self._max_size = max_size
+        self._estimated_size = None
+        self._lock = threading.Lock()
+
+    @property
+    def location(self):
+        if self._location is None:
+            return settings.CACHE_DIR
+        return self._location
+
+    @property
+    def max_size(self):
+        if self._max_size is None:
+            return settings.CACHE_MAX_SIZE
+        return self._max_size
+
+    @property
+    def enabled(self):
+        return bool(self.location)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as file:
+                content = file.read()
+        except (IOError, OSError):
+            return None
+
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return content
+
+    def open(self, key):
+        """
+        Returns the entry with the given key as an open file, or `None`.
+        """
+        path = self._path(key)
+        try:
+            file = open(path, 'rb')
+        except (IOError, OSError):
+            return None
+
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return file
+
+    def set(self, key, content):
+        """
+        Stores the given content, which may be a string or a file object.
+        """
+        if not hasattr(content, 'read'):
+            content = force_bytes(content)
+        size = write_atomic(self._path(key), content)
+
+        with self._lock:
+            if self._estimated_size is None:
+                self._estimated_size = self.size()
+            else:
+                self._estimated_size += size
+            if self._estimated_size > self.max_size:
+                self._estimated_size = self.prune()
+
+    def entries(self):
+        """
+        Returns a list of (path, size, modified time) tuples for each entry,
+        ordered from the least to the most recently used.
+        """
+        entries = []
+        if not self.location or not os.path.isdir(self.location):
+            return entries
+
+        for root, dirs, files in os.walk(self.location):
+            # Entries are stored in subdirectories named after their keys,
+            # other files in the cache directory are not entries.
+            if root == self.location:
+                continue
+            for file_name in files:
+                if file_name.startswith('.'):
+                    continue
+                path = os.path.join(root, file_name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+
+        entries.sort(key=lambda entry: entry[2])
+        return entries
+
+    def size(self):
+        """
+        Returns the total size of the entries in bytes.
+        """
+        return sum(size for path, size, mtime in self.entries())
+
+    def prune(self, max_size=None):
+        """
+        Removes the least recently used entries until the cache is no larger
+        than the given size, which defaults to `max_size`.
+
+        Returns:
+            The size of the cache after pruning.
+        """
+        if max_size is None:
+            max_size = self.max_size
+
+        entries = self.entries()
+        total_size = sum(size for path, size, mtime in entries)
+        for path, size, mtime in entries:
+            if total_size <= max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_size -= size
+        return total_size
+
+    def clear(self):
+        if self.location and os.path.isdir(self.location):
+            shutil.rmtree(self.location, ignore_errors=True)
+        self._estimated_size = None
+
+    def _path(self, key):
+        return os.path.join(self.location, key[:2], key[2:])
+
+
+"""
+The memory cache shared by `assetfiles.views.serve`.
+"""
+memory_cache = MemoryCache()
+
+"""
+The disk cache shared by `assetfiles.views.serve` and `collectstatic`.
+"""
+disk_cache = DiskCache()
+
+"""
+The cache of missing paths used by the views.
+"""
+miss_cache = MissCache()
+
+
+def filter(filter, input_path, memory=True, hashes=None, stamp=None):
+    """
+    Filters the given file, reusing the previously filtered content if
+    neither the file nor any of its dependencies changed since.
+
+    Filtered content is looked up in the memory cache first and then in the
+    disk cache, if one is configured.
+
+    Args:
+        filter: The filter instance that processes the file.
+        input_path: An absolute path to the file to filter.
+        memory: Whether to use the memory cache. Processes that filter each
+            file only once, like `collectstatic`, should not use it.
+        hashes: The result of `get_hashes` for the given file, if the caller
+            already computed it.
+        stamp: The result of `get_stamp` for the given file, if the caller
+            already computed it.
+    Returns:
+        The filtered content.
+    """
+    key = (filter.get_fingerprint(), input_path)
+    if stamp is None:
+        stamp = get_stamp(filter, input_path)
+
+    if memory:
+        entry = memory_cache.get(key)
+        if _count_lookup('memory', entry is not None and entry[0] == stamp):
+            return entry[1]
+
+    content = None
+    if disk_cache.enabled:
+        digest = get_digest(filter, input_path, hashes)
+        content = disk_cache.get(digest)
+        _count_lookup('disk', content is not None)
+
+    if content is None:
+        content = _run_filter(filter, input_path, memory)
+        # Don't cache content of files that changed while being filtered.
+        if disk_cache.enabled and get_stamp(filter, input_path) == stamp:
+            disk_cache.set(digest, content)
+
+    if memory:
+        memory_cache.set(key, (stamp, content), len(content))
+    return content
+
+
+def filter_content(filter, content, input_path, memory=True):
+    """
+    Filters the given content with a filter that follows another one in a
+    pipeline, reusing the previously filtered content if the filter was
+    given the same content before.
+
+    Entries are keyed by the filter, the input path within the static
+    directories and a hash of the content, so they stay valid for as long
+    as the earlier filters produce the same output for the file.
+
+    Args:
+        filter: The filter instance that processes the content.
+        content: The bytes to filter.
+        input_path: An absolute path to the file the pipeline filters.
+        memory: Whether to use the memory cache.
+    Returns:
+        The filtered content.
+    """
+    content = force_bytes(content)
+    digest = hashlib.sha1()
+    digest.update(force_bytes(filter.get_fingerprint()))
+    digest.update(b'\0')
+    digest.update(force_bytes(filter.get_version()))
+    digest.update(b'\0')
+    digest.update(force_bytes(get_key_path(input_path)))
+    digest.update(b'\0')
+    digest.update(hashlib.sha1(content).digest())
+    digest = digest.hexdigest()
+
+    if memory:
+        filtered = memory_cache.get(digest)
+        if _count_lookup('memory', filtered is not None):
+            return filtered
+
+    filtered = None
+    if disk_cache.enabled:
+        filtered = disk_cache.get(digest)
+        _count_lookup('disk', filtered is not None)
+
+    if filtered is None:
+        filtered = force_bytes(filter.filter_content(content, input_path))
+        if disk_cache.enabled:
+            disk_cache.set(digest, filtered)
+
+    if memory:
+        memory_cache.set(digest, filtered)
+    return filtered
+
+
+def filter_file(filter, input_path, memory=True, hashes=None, stamp=None,
+                timings=None):
+    """
+    Filters the given file like `filter`, but returns the filtered content as
+    a file object, so large outputs are not held in memory.
+
+    The output of the filter is streamed into a temporary file, which is kept
+    in memory up to ASSETFILES_SPOOL_SIZE bytes and written to disk when it
+    grows larger. Only outputs that fit in memory are added to the memory
+    cache. Entries in the disk cache are opened rather than read.
+
+    Args:
+        timings: A dict the time spent looking up the caches ("cache") and
+            filtering the file ("compile") is added to, in seconds.
+    Returns:
+        A file object, positioned at the start of the filtered content.
+    """
+    start = time.time()
+    key = (filter.get_fingerprint(), input_path)
+    if stamp is None:
+        stamp = get_stamp(filter, input_path)
+
+    if memory:
+        entry = memory_cache.get(key)
+        if _count_lookup('memory', entry is not None and entry[0] == stamp):
+            add_duration(timings, 'cache', start)
+            return io.BytesIO(entry[1])
+
+    if disk_cache.enabled:
+        digest = get_digest(filter, input_path, hashes)
+        file = disk_cache.open(digest)
+        if _count_lookup('disk', file is not None):
+            add_duration(timings, 'cache', start)
+            return file
+
+    add_duration(timings, 'cache', start)
+    start = time.time()
+    file = tempfile.SpooledTemporaryFile(max_size=settings.SPOOL_SIZE)
+    try:
+        for chunk in _run_filter_stream(filter, input_path, memory):
+            file.write(force_bytes(chunk))
+        size = file.tell()
+
+        # Don't cache content of files that changed while being filtered.
+        if disk_cache.enabled and get_stamp(filter, input_path) == stamp:
+            file.seek(0)
+            disk_cache.set(digest, file)
+        if memory and size <= settings.SPOOL_SIZE:
+            file.seek(0)
+            memory_cache.set(key, (stamp, file.read()), size)
+    except:
+        file.close()
+        raise
+
+    add_duration(timings, 'compile', start)
+    file.seek(0)
+    return file
+
+
+def _run_filter(filter, input_path, memory):
+    """
+    Runs the given filter, passing `memory` on to filters that filter other
+    files through the cache (see `BaseFilter.uses_cache`).
+    """
+    if filter.uses_cache:
+        return filter.filter(input_path, memory=memory)
+    return filter.filter(input_path)
+
+
+def _run_filter_stream(filter, input_path, memory):
+    """
+    Runs the given filter like `_run_filter`, returning the output in chunks.
+    """
+    if filter.uses_cache:
+        return iter([filter.filter(input_path, memory=memory)])
+    return filter.filter_stream(input_path)
+
+
+def _count_lookup(cache_name, hit):
+    """
+    Counts a hit or miss of the given cache in `assetfiles.stats`, and
+    returns whether it was a hit.
+    """
+    stats.incr('cache.{0}.{1}'.format(cache_name, 'hits' if hit else 'misses'))
+    return hit
+
+
+def get_stamp(filter, input_path):
+    """
+    Returns a tuple of the path, modification time and size of the given file
+    and each of its dependencies. The stamp changes whenever any of them is
+    modified, added or removed.
+    """
+    paths = [input_path] + list(filter.get_dependencies(input_path))
+    stamp = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stamp.append((path, None, None))
+        else:
+            stamp.append((path, stat.st_mtime, stat.st_size))
+    return tuple(stamp)
+
+
+def get_etag(filter, input_path, stamp=None):
+    """
+    Returns an entity tag for the filtered content of the given file, which
+    changes whenever the file or any of its dependencies is modified, or the
+    filter configuration or tool version changes. The file isn't filtered.
+    """
+    if stamp is None:
+        stamp = get_stamp(filter, input_path)
+
+    digest = hashlib.sha1()
+    digest.update(force_bytes(filter.get_fingerprint()))
+    digest.update(b'\0')
+    digest.update(force_bytes(filter.get_version()))
+    digest.update(b'\0')
+    digest.update(force_bytes(repr(stamp)))
+    return digest.hexdigest()
+
+
+def get_hashes(filter, input_path):
+    """
+    Returns a list of (path, hex digest) tuples with the content hashes of
+    the given file and each of its dependencies.
+    """
+    paths = [input_path] + list(filter.get_dependencies(input_path))
+    return [(path, hash_file(path)) for path in paths]
+
+
+def get_digest(filter, input_path, hashes=None):
+    """
+    Returns a hex digest of the contents of the given file and each of its
+    dependencies, along with the filter fingerprint and tool version.
+
+    The files are identified by their paths within the static directories
+    (see `get_key_path`), so the digest is the same in every checkout of
+    a project, and can be used to share the disk cache between them.
+    """
+    if hashes is None:
+        hashes = get_hashes(filter, input_path)
+
+    digest = hashlib.sha1()
+    digest.update(force_bytes(filter.get_fingerprint()))
+    digest.update(b'\0')
+    digest.update(force_bytes(filter.get_version()))
+    for path, file_hash in hashes:
+        digest.update(b'\0')
+        digest.update(force_bytes(get_key_path(path)))
+        digest.update(b'\0')
+        digest.update(force_bytes(file_hash))
+    return digest.hexdigest()
+
+
+def get_key_path(path):
+    """
+    Returns the path of the given file relative to the static directories,
+    for use in keys that are shared between checkouts. Files outside of the
+    static directories, like Sass partials in other load paths, are only
+    identified by their content, so an empty string is returned for them.
+    """
+    return utils.get_static_path(path) or ''
+
+
+def write_atomic(path, content):
+    """
+    Writes the given bytes, or the contents of the given file object, to a
+    temporary file next to the given path and renames it into place, so
+    readers never see a partially written file.
+
+    Returns:
+        The number of bytes written.
+    """
+    dirname = os.path.dirname(path)
+    try:
+        os.makedirs(dirname)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+    fd, temp_path = tempfile.mkstemp(dir=dirname, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            if hasattr(content, 'read'):
+                shutil.copyfileobj(content, file)
+            else:
+                file.write(content)
+            size = file.tell()
+        os.rename(temp_path, path)
+    except:
+        os.remove(temp_path)
+        raise
+    return size
+
+
+def hash_file(path, block_size=64 * 1024):
+    """
+    Returns the SHA-1 hex digest of the contents of the given file, or an
+    empty string if it does not exist.
+    """
+    digest = hashlib.sha1()
+    try:
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(block_size), b''):
+                digest.update(block)
+    except (IOError, OSError):
+        return ''
+    return digest.hexdigest()
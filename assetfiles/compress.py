@@ -0,0 +1,107 @@
+"""
+Precompressed variants of static files, so front-end servers can serve
+them without compressing every response.
+
+Brotli variants are only created if the `brotli` package is installed.
+"""
+import gzip
+import io
+import os
+import tempfile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from assetfiles import settings
+
+
+"""
+The extensions of the compressed variants.
+"""
+ENCODINGS = ('gz', 'br')
+
+CHUNK_SIZE = 64 * 1024
+
+
+def is_compressible(path, size=None):
+    """
+    Returns true if the given file is of a format that compresses well
+    and, if the size is given, is at least ASSETFILES_PRECOMPRESS_MIN_SIZE
+    bytes large.
+    """
+    ext = os.path.splitext(path)[1][1:].lower()
+    if ext not in settings.PRECOMPRESS_EXTENSIONS:
+        return False
+    return size is None or size >= settings.PRECOMPRESS_MIN_SIZE
+
+
+def compress(path, content):
+    """
+    Returns the compressed variants of the given file content. Variants that
+    are not smaller than the content itself are left out.
+
+    Args:
+        path: The path of the file, used to check its format.
+        content: The bytes to compress.
+    Returns:
+        A dict of variant extensions ('gz' or 'br') to compressed bytes.
+    """
+    variants = {}
+    for ext, file in compress_file(path, io.BytesIO(content)).items():
+        with file:
+            variants[ext] = file.read()
+    return variants
+
+
+def compress_file(path, file):
+    """
+    Compresses the given file like `compress`, but reads it in chunks and
+    writes the variants to temporary files, which are kept in memory up to
+    ASSETFILES_SPOOL_SIZE bytes, so large files are never held in memory.
+
+    Returns:
+        A dict of variant extensions ('gz' or 'br') to temporary files,
+        positioned at the start of the compressed content. The caller is
+        responsible for closing them.
+    """
+    file.seek(0, os.SEEK_END)
+    size = file.tell()
+    file.seek(0)
+    if not is_compressible(path, size):
+        return {}
+
+    variants = {'gz': tempfile.SpooledTemporaryFile(
+        max_size=settings.SPOOL_SIZE)}
+    # The timestamp and file name are left out of the gzip header, so the
+    # same content always compresses to the same bytes.
+    gzip_file = gzip.GzipFile(filename='', fileobj=variants['gz'], mode='wb',
+                              compresslevel=9, mtime=0)
+    compressor = None
+    if brotli is not None:
+        variants['br'] = tempfile.SpooledTemporaryFile(
+            max_size=settings.SPOOL_SIZE)
+        compressor = brotli.Compressor()
+
+    try:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            gzip_file.write(chunk)
+            if compressor is not None:
+                variants['br'].write(compressor.process(chunk))
+        gzip_file.close()
+        if compressor is not None:
+            variants['br'].write(compressor.finish())
+    except Exception:
+        for variant in variants.values():
+            variant.close()
+        raise
+
+    smaller = {}
+    for ext, variant in variants.items():
+        if variant.tell() < size:
+            variant.seek(0)
+            smaller[ext] = variant
+        else:
+            variant.close()
+    return smaller
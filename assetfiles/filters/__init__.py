@@ -1,12 +1,134 @@
+import json
+import threading
+
 from django.core.exceptions import ImproperlyConfigured
 from django.utils.datastructures import SortedDict
-from django.utils.functional import memoize
+from django.utils import six
 from django.utils.importlib import import_module
 
 from assetfiles import settings
 from assetfiles.filters.base import BaseFilter
 from assetfiles.filters.mixins import (CommandMixin, ExtensionMixin,
-                                       MultiInputMixin)
+                                       MultiInputMixin, WorkerMixin)
+from assetfiles.filters.pipeline import PipelineFilter
+
+
+class FilterRegistry(object):
+    """
+    FilterRegistry holds the filters configured in ASSETFILES_FILTERS, indexed
+    by the extensions of the paths they accept (see
+    `BaseFilter.get_input_exts`), so finding the filter for a path only
+    checks the filters that could match it, in their configured order.
+
+    The registry is built on first use, and rebuilt when ASSETFILES_FILTERS
+    changes or `clear` is called.
+
+    Each entry of ASSETFILES_FILTERS is either the import path of a filter
+    class, or a tuple of an import path and a dict of keyword arguments for
+    the filter, i.e. `('assetfiles.filters.bundle.BundleFilter',
+    {'output_path': 'js/all.js', 'input_paths': 'js/*.js'})`, or a list of
+    such entries, which are run as a pipeline (see PipelineFilter).
+    """
+
+    def __init__(self):
+        self._paths = None
+        self._filters = []
+        self._by_input_ext = {}
+        self._by_output_ext = {}
+        self._unindexed_inputs = []
+        self._unindexed_outputs = []
+        self._lock = threading.Lock()
+
+    @property
+    def filters(self):
+        """
+        The filter instances, in their configured order.
+        """
+        self._build()
+        return self._filters
+
+    def find_by_input_path(self, input_path):
+        self._build()
+        candidates = self._by_input_ext.get(_get_ext(input_path),
+                                            self._unindexed_inputs)
+        for filter in candidates:
+            if filter.matches_input(input_path):
+                return filter
+        return None
+
+    def find_by_output_path(self, output_path):
+        for filter in self.find_all_by_output_path(output_path):
+            return filter
+        return None
+
+    def find_all_by_output_path(self, output_path):
+        """
+        Returns all filters that would output the given path, in their
+        configured order.
+        """
+        self._build()
+        candidates = self._by_output_ext.get(_get_ext(output_path),
+                                             self._unindexed_outputs)
+        return [filter for filter in candidates
+                if filter.matches_output(output_path)]
+
+    def classify(self, input_paths):
+        """
+        Returns a dict of each of the given input paths to the filter that
+        accepts it, or `None`.
+        """
+        return dict((input_path, self.find_by_input_path(input_path))
+                    for input_path in input_paths)
+
+    def clear(self):
+        with self._lock:
+            self._paths = None
+            _filters.clear()
+
+    def _build(self):
+        paths = tuple(settings.FILTERS)
+        if paths == self._paths:
+            return
+
+        with self._lock:
+            if paths == self._paths:
+                return
+            filters = [get_filter(spec) for spec in paths]
+            (self._by_input_ext,
+             self._unindexed_inputs) = self._index(filters, 'get_input_exts')
+            (self._by_output_ext,
+             self._unindexed_outputs) = self._index(filters, 'get_output_exts')
+            self._filters = filters
+            self._paths = paths
+
+    def _index(self, filters, get_exts):
+        """
+        Returns a dict of extensions to the filters that may match paths
+        with that extension, and the list of filters that may match any
+        path. Both keep the filters in their configured order.
+        """
+        filter_keys = []
+        for filter in filters:
+            exts = getattr(filter, get_exts)()
+            if exts is not None:
+                exts = set(ext.rsplit('.', 1)[-1] for ext in exts)
+            filter_keys.append((filter, exts))
+
+        index = {}
+        for filter, keys in filter_keys:
+            for key in keys or ():
+                index[key] = [f for f, k in filter_keys
+                              if k is None or key in k]
+        unindexed = [filter for filter, keys in filter_keys if keys is None]
+        return index, unindexed
+
+
+def _get_ext(path):
+    """
+    Returns the last extension of the given path, without the ".".
+    """
+    file_name = path.rsplit('/', 1)[-1]
+    return file_name.rsplit('.', 1)[-1] if '.' in file_name else ''
 
 
 def find_by_input_path(input_path):
@@ -18,10 +140,7 @@ def find_by_input_path(input_path):
     Returns:
         The found filter instance or `None`
     """
-    for filter in get_filters():
-        if filter.matches_input(input_path):
-            return filter
-    return None
+    return registry.find_by_input_path(input_path)
 
 
 def find_by_output_path(output_path):
@@ -33,24 +152,64 @@ def find_by_output_path(output_path):
     Returns:
         The found filter instance or `None`
     """
-    for filter in get_filters():
-        if filter.matches_output(output_path):
-            return filter
-    return None
+    return registry.find_by_output_path(output_path)
+
+
+def find_all_by_output_path(output_path):
+    """
+    Returns all filters that would output the given path, in their
+    configured order.
+
+    Args:
+        output_path: An absolute path to the file
+    Returns:
+        A list of filter instances. Can be empty.
+    """
+    return registry.find_all_by_output_path(output_path)
+
+
+def classify(input_paths):
+    """
+    Finds the filters for many input paths at once.
+
+    Args:
+        input_paths: An iterable of paths, relative to the static dirs
+    Returns:
+        A dict of each path to the filter instance that would accept it as
+        input, or `None`
+    """
+    return registry.classify(input_paths)
 
 
 def get_filters():
     """
     Returns filter instances configured in ASSETFILES_FILTERS.
     """
-    for filter_path in settings.FILTERS:
-        yield get_filter(filter_path)
+    return iter(registry.filters)
 
 
-def _get_filter(import_path):
+def get_filter(spec):
+    """
+    Returns the filter instance described by the given entry of
+    ASSETFILES_FILTERS. Instances are shared by equal entries.
+    """
+    key = json.dumps(spec, sort_keys=True, default=repr)
+    if key not in _filters:
+        if isinstance(spec, six.string_types):
+            _filters[key] = _get_filter(spec)
+        elif isinstance(spec, list):
+            _filters[key] = PipelineFilter([get_filter(s) for s in spec])
+        else:
+            import_path, kwargs = spec
+            _filters[key] = _get_filter(import_path, kwargs)
+    return _filters[key]
+
+
+def _get_filter(import_path, kwargs=None):
     """
     Imports the assetfiles filter class described by import_path, where
-    import_path is the full Python path to the class.
+    import_path is the full Python path to the class, and instantiates it
+    with the given keyword arguments.
     """
     module, attr = import_path.rsplit('.', 1)
     try:
@@ -66,7 +225,11 @@ def _get_filter(import_path):
     if not issubclass(Filter, BaseFilter):
         raise ImproperlyConfigured('Filter "%s" is not a subclass of "%s"' %
                                    (Filter, BaseFilter))
-    return Filter()
+    return Filter(**(kwargs or {}))
 
 _filters = SortedDict()
-get_filter = memoize(_get_filter, _filters, 1)
+
+"""
+The registry of the filters configured in ASSETFILES_FILTERS.
+"""
+registry = FilterRegistry()
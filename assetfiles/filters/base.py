@@ -1,9 +1,20 @@
+import hashlib
+import json
+
+
 class BaseFilter(object):
     """
     Base class for filters that process files.
+
+    Attributes:
+        uses_cache: Whether `filter` filters other files through
+            `assetfiles.cache`, like BundleFilter. Such filters take a
+            `memory` argument, which the cache passes on from the call that
+            runs them, so the files they filter are cached the same way.
     """
     # input_path = None
     # output_path = None
+    uses_cache = False
 
     def __init__(self, input_path=None, output_path=None):
         self.input_path = input_path
@@ -17,7 +28,7 @@ class BaseFilter(object):
             input_path: A file path, relative to the static dir.
         """
         if self.input_path:
-            return input_path is self.input_path
+            return input_path == self.input_path
         else:
             return self._matches_input(input_path)
 
@@ -32,13 +43,44 @@ class BaseFilter(object):
             output_path: A file path, relative to the static dir.
         """
         if self.output_path:
-            return output_path is self.output_path
+            return output_path == self.output_path
         else:
             return self._matches_output(output_path)
 
     def _matches_output(self, input_path):
         return False
 
+    def get_input_exts(self):
+        """
+        Returns the extensions of the input paths this filter matches, so
+        the filter registry only considers it for paths with one of them.
+
+        Returns:
+            A tuple of extensions (without the prefixed "."), or `None` if
+            the filter may match any path.
+        """
+        return None
+
+    def get_output_exts(self):
+        """
+        Returns the extensions of the output paths this filter matches. See
+        `get_input_exts`.
+        """
+        return None
+
+    def get_output_paths(self):
+        """
+        Returns the paths of files this filter builds from several inputs,
+        rather than from each file it accepts as input.
+
+        Implement this method for filters like BundleFilter, whose outputs
+        `collectstatic` has to build on their own.
+
+        Returns:
+            A list of file paths, relative to the static dir. Can be empty.
+        """
+        return []
+
     def is_filterable(self, output_path):
         """
         Determines wether to filter the file with the given output path.
@@ -84,6 +126,69 @@ class BaseFilter(object):
     def _derive_output_path(self, input_path):
         return None
 
+    def get_dependencies(self, input_path):
+        """
+        Returns the files the output of the given input path depends on,
+        besides the input file itself.
+
+        Implement this method if the filter reads other files while
+        processing, i.e. Sass partials. Caches use it to invalidate filtered
+        content when one of the dependencies changes.
+
+        Args:
+            input_path: An absolute path to the file to filter.
+        Returns:
+            A list of absolute paths. Can be empty.
+        """
+        return []
+
+    def get_dependents(self, input_path):
+        """
+        Returns the files whose output depends on the given file. This is the
+        reverse of `get_dependencies`.
+
+        Args:
+            input_path: An absolute path to a file.
+        Returns:
+            A list of absolute paths. Can be empty.
+        """
+        return []
+
+    def get_fingerprint(self):
+        """
+        Returns a string identifying this filter and its configuration.
+
+        Two filters with the same fingerprint produce the same output for the
+        same input, so the fingerprint is used as part of cache keys.
+        """
+        options = json.dumps(self.get_fingerprint_options(),
+                             sort_keys=True, default=repr)
+        key = '{module}.{name}:{options}'.format(
+            module=type(self).__module__,
+            name=type(self).__name__,
+            options=options,
+        )
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def get_fingerprint_options(self):
+        """
+        Returns the options included in the fingerprint.
+
+        Override this method if the options contain paths on the server,
+        which would keep checkouts in other directories from sharing cached
+        content, i.e. by replacing files with hashes of their contents.
+        """
+        return getattr(self, 'options', None)
+
+    def get_version(self):
+        """
+        Returns the version of the tool used to process files.
+
+        Implement this method for filters that rely on external compilers, so
+        persistent caches are invalidated when the compiler is upgraded.
+        """
+        return ''
+
     def filter(self, input_path):
         """
         Filters the file with the given input path.
@@ -97,3 +202,37 @@ class BaseFilter(object):
             The filtered string.
         """
         raise NotImplementedError()
+
+    def filter_content(self, content, input_path):
+        """
+        Filters the given content, which is the output of the previous
+        filter in a pipeline (see PipelineFilter).
+
+        Implement this method for filters that can follow other filters in a
+        pipeline.
+
+        Args:
+            content: The bytes to filter.
+            input_path: An absolute path to the file the pipeline filters.
+
+        Returns:
+            The filtered string.
+        """
+        raise NotImplementedError()
+
+    def filter_stream(self, input_path):
+        """
+        Filters the file with the given input path, returning the output in
+        chunks, so large outputs don't need to be held in memory at once.
+
+        Implement this method for filters that can produce their output
+        incrementally, i.e. by running a command. By default, the output of
+        `filter` is returned as a single chunk.
+
+        Args:
+            input_path: An absolute path to the file to filter.
+
+        Returns:
+            An iterable of filtered strings.
+        """
+        return iter([self.filter(input_path)])
@@ -0,0 +1,167 @@
+import hashlib
+
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import six
+from django.utils.encoding import force_bytes
+
+from assetfiles import assets, cache, filters
+from assetfiles.exceptions import FilterError
+from assetfiles.filters import BaseFilter, MultiInputMixin
+
+
+class BundleFilter(MultiInputMixin, BaseFilter):
+    """
+    Concatenates many files into a single output file, so pages can load
+    them with one request.
+
+    Bundles are configured in ASSETFILES_FILTERS, one entry per bundle:
+
+        ASSETFILES_FILTERS = (
+            'assetfiles.filters.sass.SassFilter',
+            'assetfiles.filters.coffee.CoffeeScriptFilter',
+            ('assetfiles.filters.bundle.BundleFilter', {
+                'output_path': 'js/all.js',
+                'input_paths': ('js/jquery.js', 'js/app.coffee'),
+            }),
+        )
+
+    Members are given as an ordered list of paths, or as a single glob, whose
+    matches are bundled in order of their paths. A member that another filter
+    accepts as input, or a member given by the path of another filter's
+    output, is filtered by that filter first. The members are dependencies of
+    the bundle, so it's cached like any other filtered file and built again
+    when one of them changes.
+
+    Members are still collected on their own by `collectstatic`; the bundle
+    is built in addition to them.
+
+    Attributes:
+        separator: The string inserted between members.
+    """
+    separator = '\n'
+    uses_cache = True
+
+    def __init__(self, input_paths=None, output_path=None, separator=None,
+                 *args, **kwargs):
+        if not output_path:
+            raise ImproperlyConfigured('BundleFilter requires an output_path.')
+        if not input_paths:
+            raise ImproperlyConfigured('BundleFilter requires input_paths.')
+        super(BundleFilter, self).__init__(input_paths=input_paths,
+                                           output_path=output_path,
+                                           *args, **kwargs)
+        if separator is not None:
+            self.separator = separator
+        self.options = {
+            'input_paths': input_paths,
+            'output_path': output_path,
+            'separator': self.separator,
+        }
+
+    def _matches_input(self, input_path):
+        # Members are filtered on their own, the bundle is built from its
+        # output path.
+        return False
+
+    def get_input_exts(self):
+        return ()
+
+    def get_output_exts(self):
+        file_name = self.output_path.rsplit('/', 1)[-1]
+        if '.' not in file_name:
+            return None
+        return (file_name.rsplit('.', 1)[-1],)
+
+    def get_output_paths(self):
+        return [self.output_path]
+
+    def get_members(self):
+        """
+        Returns the paths of the bundled files, relative to the static dirs,
+        in order.
+        """
+        members = self._multi_input_delegate.derive_input_paths(
+            self.output_path)
+        if isinstance(self.options['input_paths'], six.string_types):
+            members = sorted(members)
+        return members
+
+    def _derive_input_paths(self, output_path):
+        """
+        Returns the members, each followed by the files other filters would
+        output it from, so a bundle is found as long as any of its members
+        exists.
+        """
+        paths = []
+        for member in self.get_members():
+            paths.append(member)
+            for filter in filters.find_all_by_output_path(member):
+                if not isinstance(filter, BundleFilter):
+                    paths += filter.derive_input_paths(member)
+        return paths
+
+    def get_dependencies(self, input_path):
+        dependencies = []
+        for member in self.get_members():
+            path, filter = self._find_member(member)
+            if path:
+                dependencies.append(path)
+                if filter:
+                    dependencies += filter.get_dependencies(path)
+        return dependencies
+
+    def get_fingerprint(self):
+        """
+        Adds the fingerprints of the filters of the members, as they filter
+        them first.
+        """
+        key = super(BundleFilter, self).get_fingerprint()
+        for filter in self._get_member_filters():
+            key += ':' + filter.get_fingerprint()
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def get_version(self):
+        """
+        Returns the versions of the filters of the members, as they filter
+        them first.
+        """
+        return ','.join(filter.get_version()
+                        for filter in self._get_member_filters())
+
+    def filter(self, input_path, memory=True):
+        contents = []
+        for member in self.get_members():
+            path, filter = self._find_member(member)
+            if not path:
+                raise FilterError("Bundle member '{0}' of '{1}' could not "
+                                  "be found".format(member, self.output_path))
+            if filter:
+                content = cache.filter(filter, path, memory=memory)
+            else:
+                with open(path, 'rb') as file:
+                    content = file.read()
+            contents.append(force_bytes(content))
+        return force_bytes(self.separator).join(contents)
+
+    def _find_member(self, member):
+        """
+        Returns a tuple of the absolute path of the given member and the
+        filter that filters it, if any.
+        """
+        path = assets.find_static(member)
+        if path:
+            filter = filters.find_by_input_path(member)
+            return path, filter
+        return assets.find(member)
+
+    def _get_member_filters(self):
+        """
+        Returns the filters that filter the members, in order, so a bundle of
+        plain files doesn't depend on the versions of unrelated compilers.
+        """
+        member_filters = []
+        for member in self.get_members():
+            path, filter = self._find_member(member)
+            if filter and filter not in member_filters:
+                member_filters.append(filter)
+        return member_filters
@@ -1,20 +1,38 @@
+import os
+
 from assetfiles import settings
-from assetfiles.filters import BaseFilter, CommandMixin, ExtensionMixin
+from assetfiles.filters import (BaseFilter, CommandMixin, ExtensionMixin,
+                                WorkerMixin)
 from assetfiles.exceptions import CoffeeScriptFilterError
 
 
-class CoffeeScriptFilter(ExtensionMixin, CommandMixin, BaseFilter):
+class CoffeeScriptFilter(ExtensionMixin, CommandMixin, WorkerMixin,
+                         BaseFilter):
     """
     Filters CoffeeScript files into JS.
+
+    Attributes:
+        coffee_path: The full path to the CoffeeScript command.
+        node_path: The full path to the Node command used by the workers.
+            When `workers` is set, CoffeeScript files are compiled by
+            long-running Node processes that load the compiler once.
+        coffee_module: The CoffeeScript compiler module the workers load.
+            Defaults to the module the CoffeeScript command belongs to.
     """
+    SCRIPTS_PATH = os.path.abspath(
+        os.path.join(os.path.dirname(__file__), '../scripts'))
+
     input_ext = 'coffee'
     output_ext = 'js'
     coffee_path = 'coffee'
+    coffee_worker_path = os.path.join(SCRIPTS_PATH, 'coffee_worker.js')
+    coffee_module = None
+    node_path = 'node'
 
     def __init__(self, options=None, *args, **kwargs):
         super(CoffeeScriptFilter, self).__init__(*args, **kwargs)
-        if options is None:
-            options = {}
+        # The options are changed below, and may come from the settings.
+        options = dict(options or {})
 
         coffee_options = settings.COFFEE_SCRIPT_OPTIONS
 
@@ -22,20 +40,54 @@ class CoffeeScriptFilter(ExtensionMixin, CommandMixin, BaseFilter):
             'coffee_path',
             coffee_options.get('coffee_path', self.coffee_path)
         )
+        for attr in ('coffee_worker_path', 'coffee_module', 'node_path'):
+            setattr(self, attr, options.pop(
+                attr, coffee_options.get(attr, getattr(self, attr))))
+        self.set_worker_options(options, coffee_options)
         if 'bare' not in options:
             options['bare'] = coffee_options.get('bare')
 
         self.options = options
 
     def filter(self, input):
+        if self.workers:
+            return self._filter_with_worker(input)
+        return b''.join(self._stream_command(input))
+
+    def filter_stream(self, input):
+        """
+        Streams the output of the CoffeeScript command. The output of the
+        workers is returned as a single chunk.
+        """
+        if self.workers:
+            return super(CoffeeScriptFilter, self).filter_stream(input)
+        return self._stream_command(input)
+
+    def get_version(self):
+        return self.get_command_version(
+            '{0} --version'.format(self.coffee_path))
+
+    def _stream_command(self, input):
         command = '{command} {args} {input}'.format(
             command=self.coffee_path,
             args=self._build_args(),
             input=self.format_option('print', input),
         )
 
-        return self.run_command(command,
-                                exception_type=CoffeeScriptFilterError)
+        return self.stream_command(command,
+                                   exception_type=CoffeeScriptFilterError)
+
+    def _filter_with_worker(self, input):
+        """
+        Compiles the given file with one of the shared CoffeeScript workers.
+        """
+        args = [self.node_path, self.coffee_worker_path,
+                self.coffee_module or self.coffee_path]
+        response = self.request_worker(args, {
+            'path': input,
+            'options': {'bare': bool(self.options['bare'])},
+        }, exception_type=CoffeeScriptFilterError)
+        return response['js'].encode('utf-8')
 
     def _build_args(self):
         args = []
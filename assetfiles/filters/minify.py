@@ -0,0 +1,308 @@
+"""
+Pure-Python CSS and JavaScript minifiers.
+
+Both minifiers tokenize their input in a single pass, yielding tokens as
+they are found, and only remove comments and whitespace, so they run in
+linear time and never change the meaning of the code.
+"""
+from __future__ import unicode_literals
+
+import re
+
+from django.utils.encoding import force_bytes
+
+from assetfiles.filters import BaseFilter, ExtensionMixin
+
+
+class MinifyFilter(ExtensionMixin, BaseFilter):
+    """
+    Base class for minifiers, which output files with the same extension as
+    their input.
+
+    A minifier can be configured on its own, to minify plain static files in
+    `collectstatic`, or as the last filter of a pipeline (see
+    PipelineFilter), to minify the output of other filters. The development
+    server serves plain static files as they are.
+    """
+
+    def filter(self, input_path):
+        with open(input_path, 'rb') as file:
+            return self.filter_content(file.read(), input_path)
+
+    def filter_content(self, content, input_path):
+        """
+        Minifies the given content, which is decoded as UTF-8 if possible.
+        Other encodings, i.e. of vendored files, are decoded as latin-1,
+        which maps every byte to a character, and encoded the same way
+        again, so the characters the minifier doesn't remove are kept as
+        they are.
+        """
+        content = force_bytes(content)
+        try:
+            text, encoding = content.decode('utf-8'), 'utf-8'
+        except UnicodeDecodeError:
+            text, encoding = content.decode('latin-1'), 'latin-1'
+        return self.minify(text).encode(encoding)
+
+    def minify(self, text):
+        raise NotImplementedError()
+
+    def _derive_output_path(self, input_path):
+        return input_path
+
+
+class CSSMinFilter(MinifyFilter):
+    """
+    Minifies CSS files.
+    """
+    input_ext = 'css'
+    output_ext = 'css'
+
+    def minify(self, text):
+        return minify_css(text)
+
+
+class JSMinFilter(MinifyFilter):
+    """
+    Minifies JavaScript files.
+    """
+    input_ext = 'js'
+    output_ext = 'js'
+
+    def minify(self, text):
+        return minify_js(text)
+
+
+CSS_TOKEN_RE = re.compile(r'''
+    (?P<comment>/\*.*?(?:\*/|$))
+  | (?P<string>"(?:[^"\\\n]|\\.)*"?|'(?:[^'\\\n]|\\.)*'?)
+  | (?P<url>url\(\s*(?:"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*'|[^)]*)\s*\))
+  | (?P<space>\s+)
+  | (?P<other>[^/"'\su{};:,>~()]+|.)
+''', re.VERBOSE | re.DOTALL | re.IGNORECASE)
+
+"""
+Characters whitespace can be removed before and after.
+"""
+CSS_SPACE_BEFORE = frozenset('{};,>~)')
+CSS_SPACE_AFTER = frozenset('{};,>~(:')
+
+
+def minify_css(text):
+    """
+    Returns the given CSS without comments and unnecessary whitespace.
+    Comments starting with "/*!" are kept.
+    """
+    return ''.join(_minify_css_tokens(text))
+
+
+def _minify_css_tokens(text):
+    previous = ''
+    space = False
+    semicolon = False
+    for match in CSS_TOKEN_RE.finditer(text):
+        kind = match.lastgroup
+        value = match.group()
+        if kind == 'space':
+            space = True
+            continue
+        if kind == 'comment' and not value.startswith('/*!'):
+            # Comments separate tokens like whitespace does.
+            space = True
+            continue
+
+        first = value[0]
+        if semicolon:
+            # Semicolons before a closing brace are not needed.
+            if first != '}':
+                yield ';'
+                previous = ';'
+            semicolon = False
+        if (space and previous and previous[-1] not in CSS_SPACE_AFTER and
+                first not in CSS_SPACE_BEFORE):
+            yield ' '
+        space = False
+
+        if value == ';':
+            semicolon = True
+            continue
+        yield value
+        previous = value
+
+    if semicolon:
+        yield ';'
+
+
+JS_TOKEN_RE = re.compile(r'''
+    (?P<space>[ \t\r\n\f\v\u00a0\u2028\u2029\ufeff]+)
+  | (?P<comment>//[^\n]*|/\*.*?(?:\*/|$))
+  | (?P<string>"(?:[^"\\\n]|\\\r\n|\\.)*"?|'(?:[^'\\\n]|\\\r\n|\\.)*'?)
+  | (?P<word>(?:[\w$\\]|[^\x00-\x7f\u00a0\u2028\u2029\ufeff])+(?:\.\d+)?)
+  | (?P<number>\.\d[\w]*)
+''', re.VERBOSE | re.DOTALL | re.UNICODE)
+
+JS_REGEX_RE = re.compile(r'''
+    /(?![*/])(?:[^/\\\[\n]|\\.|\[(?:[^\]\\\n]|\\.)*\])+/[\w$]*
+''', re.VERBOSE)
+
+"""
+Punctuators and keywords after which a "/" starts a regular expression
+rather than a division.
+"""
+JS_REGEX_PREFIXES = frozenset('(,=:[!&|?{};+-*%<>~^')
+JS_REGEX_KEYWORDS = frozenset([
+    'return', 'typeof', 'case', 'do', 'else', 'in', 'instanceof', 'new',
+    'delete', 'void', 'throw', 'yield', 'await',
+])
+
+"""
+Tokens a line break is kept after and before, so automatic semicolon
+insertion works as before.
+"""
+JS_NEWLINE_AFTER = frozenset(')]}+-\'"`')
+JS_NEWLINE_BEFORE = frozenset('([{+-!~\'"`/')
+
+
+def minify_js(text):
+    """
+    Returns the given JavaScript without comments and unnecessary
+    whitespace. Comments starting with "/*!" are kept. Line breaks that may
+    end a statement are kept.
+    """
+    return ''.join(_minify_js_tokens(text))
+
+
+def _minify_js_tokens(text):
+    previous = None
+    space = None
+    for kind, value in _tokenize_js(text):
+        if kind == 'space':
+            if space != '\n':
+                space = '\n' if _has_newline(value) else ' '
+            continue
+        if kind == 'comment' and not value.startswith('/*!'):
+            if space != '\n':
+                space = '\n' if _has_newline(value) else ' '
+            continue
+
+        if space and previous is not None:
+            separator = _js_separator(previous, kind, value, space)
+            if separator:
+                yield separator
+        space = None
+        yield value
+        previous = (kind, value)
+
+
+def _js_separator(previous, kind, value, space):
+    previous_kind, previous_value = previous
+    last, first = previous_value[-1], value[0]
+    previous_word = previous_kind in ('word', 'regex', 'number')
+    word = kind in ('word', 'number')
+
+    if space == '\n':
+        if ((previous_word or last in JS_NEWLINE_AFTER) and
+                (word or first in JS_NEWLINE_BEFORE)):
+            return '\n'
+    if previous_word and word:
+        return ' '
+    if last in '+-' and first == last:
+        return ' '
+    if previous_kind == 'word' and previous_value.isdigit() and first == '.':
+        # "1 .toString()" must not become "1.toString()".
+        return ' '
+    if last == '/' and first == '/' or last == '<' and value.startswith('!--'):
+        return ' '
+    return ''
+
+
+def _tokenize_js(text):
+    """
+    Yields (kind, value) tuples of the tokens of the given JavaScript. Kinds
+    are 'space', 'comment', 'string', 'template', 'regex', 'word', 'number'
+    and 'punctuator'.
+    """
+    pos = 0
+    length = len(text)
+    previous = None
+    while pos < length:
+        char = text[pos]
+        if char == '`':
+            end = _find_template_end(text, pos)
+            kind, value = 'template', text[pos:end]
+        elif char == '/' and _starts_regex(previous) and \
+                JS_REGEX_RE.match(text, pos):
+            match = JS_REGEX_RE.match(text, pos)
+            kind, value = 'regex', match.group()
+        else:
+            match = JS_TOKEN_RE.match(text, pos)
+            if match:
+                kind, value = match.lastgroup, match.group()
+            else:
+                kind, value = 'punctuator', char
+        pos += len(value)
+        if kind not in ('space', 'comment'):
+            previous = (kind, value)
+        yield kind, value
+
+
+def _starts_regex(previous):
+    if previous is None:
+        return True
+    kind, value = previous
+    if kind == 'punctuator':
+        return value in JS_REGEX_PREFIXES
+    return kind == 'word' and value in JS_REGEX_KEYWORDS
+
+
+def _find_template_end(text, pos):
+    """
+    Returns the index after the template literal starting at the given
+    index, skipping over nested expressions and strings.
+    """
+    depth = 0
+    pos += 1
+    length = len(text)
+    while pos < length:
+        char = text[pos]
+        if char == '\\':
+            pos += 2
+            continue
+        if depth == 0:
+            if char == '`':
+                return pos + 1
+            if text.startswith('${', pos):
+                depth = 1
+                pos += 2
+                continue
+        else:
+            if char == '{':
+                depth += 1
+            elif char == '}':
+                depth -= 1
+            elif char in '\'"`':
+                end = (_find_template_end(text, pos) if char == '`' else
+                       _find_string_end(text, pos))
+                pos = end
+                continue
+        pos += 1
+    return length
+
+
+def _find_string_end(text, pos):
+    quote = text[pos]
+    pos += 1
+    length = len(text)
+    while pos < length:
+        char = text[pos]
+        if char == '\\':
+            pos += 2
+            continue
+        if char == quote or char == '\n':
+            return pos + 1
+        pos += 1
+    return length
+
+
+def _has_newline(value):
+    return any(char in value for char in '\n\r\u2028\u2029')
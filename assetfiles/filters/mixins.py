@@ -1,15 +1,41 @@
 import os
 import pipes
 import re
+import tempfile
+import time
 from subprocess import Popen, PIPE
 
 from django.utils import six
 
+from assetfiles import signals
 from assetfiles.exceptions import FilterError
+from assetfiles.filters.base import BaseFilter
+from assetfiles.stats import stats
+from assetfiles.toolchain import toolchain
+from assetfiles.workers import WorkerError, get_pool
 
 
 class CommandMixin(object):
     def run_command(self, command, extra_env=None, exception_type=None):
+        return b''.join(self.stream_command(command, extra_env=extra_env,
+                                            exception_type=exception_type))
+
+    def stream_command(self, command, extra_env=None, exception_type=None,
+                       chunk_size=64 * 1024):
+        """
+        Runs the given command, yielding its output in chunks as it is
+        written, so callers don't need to hold all of it in memory.
+
+        The error output is collected in a temporary file, so a command
+        writing a lot of it can't block on a full pipe.
+
+        The command is counted in `assetfiles.stats`, and
+        `assetfiles.signals.command_finished` is sent when it finishes.
+
+        Raises:
+            exception_type: If the command fails, with its error output.
+                This is raised after all of the output has been yielded.
+        """
         if not exception_type:
             exception_type = FilterError
 
@@ -17,13 +43,53 @@ class CommandMixin(object):
         if extra_env:
             env.update(extra_env)
 
-        process = Popen(command, shell=True, stdout=PIPE, stderr=PIPE, env=env)
-        stdout, stderr = process.communicate()
-
-        if process.returncode:
-            raise exception_type(stderr)
-        else:
-            return stdout
+        start = time.time()
+        size = 0
+        returncode = None
+        with tempfile.TemporaryFile() as stderr:
+            process = Popen(command, shell=True, stdout=PIPE, stderr=stderr,
+                            env=env)
+            stats.incr('commands.spawned')
+            try:
+                for chunk in iter(lambda: process.stdout.read(chunk_size), b''):
+                    size += len(chunk)
+                    yield chunk
+                returncode = process.wait()
+            finally:
+                process.stdout.close()
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+                self._record_command(command, time.time() - start, size,
+                                     returncode)
+
+            if returncode:
+                stderr.seek(0)
+                raise exception_type(stderr.read())
+
+    def _record_command(self, command, duration, size, returncode):
+        stats.incr('commands.bytes', size)
+        if returncode:
+            stats.incr('commands.failed')
+        stats.add_timing('commands', duration)
+        signals.command_finished.send(sender=type(self), command=command,
+                                      duration=duration, size=size,
+                                      returncode=returncode)
+
+    def get_command_version(self, command):
+        """
+        Returns the stripped output of the given version command, or an empty
+        string if the command fails. The result is shared by all filters in
+        the process, and persisted by `assetfiles.toolchain`.
+        """
+        return toolchain.get_version(command, self._run_version_command)
+
+    def _run_version_command(self, command):
+        try:
+            version = self.run_command(command)
+        except FilterError:
+            version = b''
+        return version.decode('utf-8', 'replace').strip()
 
     def format_option_array(self, name, values):
         if values:
@@ -44,6 +110,56 @@ class CommandMixin(object):
         return pipes.quote(value) if value else ''
 
 
+class WorkerMixin(object):
+    """
+    A mixin for filters that can compile with a pool of long-running
+    processes, instead of running a command for every file. See
+    `assetfiles.workers`.
+
+    Attributes:
+        workers: The number of worker processes. Defaults to 0, which
+            disables the workers.
+        worker_max_jobs: The number of files a worker compiles before it
+            is restarted.
+        worker_timeout: The number of seconds to wait for a worker to
+            compile a file, or None to wait indefinitely.
+    """
+    workers = 0
+    worker_max_jobs = 100
+    worker_timeout = None
+
+    def set_worker_options(self, options, default_options):
+        """
+        Sets the worker attributes from the filter's options, falling back
+        to the given options from the settings. The worker options are
+        removed from the filter's options, as they don't affect the output.
+        """
+        for attr in ('workers', 'worker_max_jobs', 'worker_timeout'):
+            setattr(self, attr, options.pop(
+                attr, default_options.get(attr, getattr(self, attr))))
+
+    def request_worker(self, args, payload, exception_type=None):
+        """
+        Sends the given payload to one of the workers started with the given
+        command, and returns the decoded response.
+
+        Raises:
+            exception_type: If the worker fails, or answers with an error.
+        """
+        if not exception_type:
+            exception_type = FilterError
+
+        pool = get_pool(args, size=self.workers, max_jobs=self.worker_max_jobs,
+                        timeout=self.worker_timeout)
+        try:
+            response = pool.request(payload)
+        except WorkerError as e:
+            raise exception_type(e)
+        if 'error' in response:
+            raise exception_type(response['error'])
+        return response
+
+
 class GlobInputMixin(object):
     def __init__(self, input_path_glob, **kwargs):
         self.input_path_glob = input_path_glob
@@ -99,7 +215,7 @@ class ListInputMixin(object):
 class MultiInputMixin(object):
     def __init__(self, input_paths=None, *args, **kwargs):
         super(MultiInputMixin, self).__init__(*args, **kwargs)
-        if isinstance(input_paths, str):
+        if isinstance(input_paths, six.string_types):
             self._multi_input_delegate = GlobInputMixin(input_path_glob=input_paths)
         else:
             self._multi_input_delegate = ListInputMixin(input_paths=input_paths)
@@ -137,14 +253,28 @@ class ExtensionMixin(object):
         if not self.input_exts and self.input_ext:
             self.input_exts = (self.input_ext,)
 
+    def get_input_exts(self):
+        if (getattr(self, 'input_path', None) or
+                _overrides(self, BaseFilter, 'matches_input') or
+                _overrides(self, ExtensionMixin, '_matches_input')):
+            return None
+        return _indexable_exts(self.input_exts)
+
+    def get_output_exts(self):
+        if (getattr(self, 'output_path', None) or
+                _overrides(self, BaseFilter, 'matches_output') or
+                _overrides(self, ExtensionMixin, '_matches_output')):
+            return None
+        return _indexable_exts((self.output_ext,) if self.output_ext else ())
+
     def _matches_input(self, intput_path):
         if self.input_exts:
-            return re.search(r'\.({0})$'.format('|'.join(self.input_exts)), intput_path)
+            return self._get_input_re().search(intput_path)
         return False
 
     def _matches_output(self, output_path):
         if self.output_ext:
-            return re.search(r'\.{0}$'.format(self.output_ext), output_path)
+            return self._get_output_re().search(output_path)
         return False
 
     def _derive_input_paths(self, output_path):
@@ -153,16 +283,63 @@ class ExtensionMixin(object):
             for ext in self.input_exts:
                 ext = '.' + ext
                 paths.append(output_path + ext)
-                paths.append(re.sub(r'\.[^\.]*$', ext, output_path))
+                paths.append(EXTENSION_RE.sub(ext, output_path))
         return paths
 
     def _derive_output_path(self, input_path):
         if self.output_ext:
-            path = re.sub(r'\.{0}'.format(self.output_ext), '', input_path)
-            ext = '.' + self.output_ext
-            return re.sub(r'\.[^\.]*$', ext, path)
+            path = self._get_output_ext_re().sub('', input_path)
+            return EXTENSION_RE.sub('.' + self.output_ext, path)
         return None
 
+    def _get_input_re(self):
+        return self._get_re('input', self.input_exts,
+                            r'\.({0})$'.format, '|'.join)
+
+    def _get_output_re(self):
+        return self._get_re('output', self.output_ext, r'\.{0}$'.format)
+
+    def _get_output_ext_re(self):
+        return self._get_re('output_ext', self.output_ext, r'\.{0}'.format)
+
+    def _get_re(self, name, value, template, join=None):
+        """
+        Returns the regex built from the given template and attribute
+        value, compiling it only when the value changes.
+        """
+        cached = self.__dict__.setdefault('_compiled_res', {}).get(name)
+        if cached is None or cached[0] != value:
+            pattern = template(join(value) if join else value)
+            cached = self._compiled_res[name] = (value, re.compile(pattern))
+        return cached[1]
+
     def set_input_ext(self, value):
         self.input_exts = (value,)
     input_ext = property(fset=set_input_ext)
+
+
+EXTENSION_RE = re.compile(r'\.[^\.]*$')
+
+INDEXABLE_EXT_RE = re.compile(r'^[\w\-.]+$')
+
+
+def _indexable_exts(exts):
+    """
+    Returns the given extensions, or `None` if any of them can't be indexed
+    by its last component, as it contains regex syntax.
+    """
+    for ext in exts:
+        if not INDEXABLE_EXT_RE.match(ext):
+            return None
+    return tuple(exts)
+
+
+def _overrides(obj, cls, name):
+    """
+    Returns true if the class of the given object overrides the given
+    method of the given class.
+    """
+    method = getattr(type(obj), name)
+    original = getattr(cls, name)
+    return (getattr(method, '__func__', method) is not
+            getattr(original, '__func__', original))
@@ -0,0 +1,117 @@
+import hashlib
+
+from django.core.exceptions import ImproperlyConfigured
+
+from assetfiles import cache
+from assetfiles.filters.base import BaseFilter
+
+
+class PipelineFilter(BaseFilter):
+    """
+    Runs a file through several filters in order, handing the output of
+    each filter to the next one in memory.
+
+    Pipelines are configured in ASSETFILES_FILTERS as lists of filters:
+
+        ASSETFILES_FILTERS = (
+            ['assetfiles.filters.coffee.CoffeeScriptFilter',
+             'assetfiles.filters.minify.JSMinFilter'],
+        )
+
+    The first filter reads the input file, and decides which files the
+    pipeline accepts. Every later filter must implement `filter_content`.
+    The output of each filter is cached on its own, so changing a later
+    filter doesn't run the earlier ones again.
+
+    Attributes:
+        filters: The filter instances, in order.
+    """
+    uses_cache = True
+
+    def __init__(self, filters, *args, **kwargs):
+        super(PipelineFilter, self).__init__(*args, **kwargs)
+        if not filters:
+            raise ImproperlyConfigured('A filter pipeline needs at least one '
+                                       'filter.')
+        for filter in filters[1:]:
+            if type(filter).filter_content == BaseFilter.filter_content:
+                raise ImproperlyConfigured(
+                    'Filter "{0}" can only be the first filter of a '
+                    'pipeline.'.format(type(filter).__name__))
+        self.filters = list(filters)
+
+    @property
+    def first(self):
+        return self.filters[0]
+
+    @property
+    def last(self):
+        return self.filters[-1]
+
+    def matches_input(self, input_path):
+        return self.first.matches_input(input_path)
+
+    def matches_output(self, output_path):
+        if not self.last.matches_output(output_path):
+            return False
+        # The earlier filters must output a path the later ones accept.
+        return bool(self.derive_input_paths(output_path))
+
+    def get_input_exts(self):
+        return self.first.get_input_exts()
+
+    def get_output_exts(self):
+        return self.last.get_output_exts()
+
+    def get_output_paths(self):
+        return [self._derive_output_path(path, self.filters[1:])
+                for path in self.first.get_output_paths()]
+
+    def is_filterable(self, output_path):
+        return self.first.is_filterable(output_path)
+
+    def derive_input_paths(self, output_path):
+        paths = [output_path]
+        for filter in reversed(self.filters):
+            input_paths = []
+            for path in paths:
+                if filter is not self.last and not filter.matches_output(path):
+                    continue
+                for input_path in filter.derive_input_paths(path):
+                    if input_path not in input_paths:
+                        input_paths.append(input_path)
+            paths = input_paths
+        return paths
+
+    def derive_output_path(self, input_path):
+        return self._derive_output_path(input_path, self.filters)
+
+    def _derive_output_path(self, path, filters):
+        for filter in filters:
+            path = filter.derive_output_path(path)
+        return path
+
+    def get_dependencies(self, input_path):
+        dependencies = []
+        for filter in self.filters:
+            for path in filter.get_dependencies(input_path):
+                if path not in dependencies:
+                    dependencies.append(path)
+        return dependencies
+
+    def get_dependents(self, input_path):
+        return self.first.get_dependents(input_path)
+
+    def get_fingerprint(self):
+        key = ':'.join(filter.get_fingerprint() for filter in self.filters)
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def get_version(self):
+        return ','.join(filter.get_version() for filter in self.filters)
+
+    def filter(self, input_path, memory=True):
+        content = cache.filter(self.first, input_path, memory=memory)
+        for filter in self.filters[1:]:
+            content = cache.filter_content(filter, content, input_path,
+                                           memory=memory)
+        return content
@@ -1,39 +1,63 @@
 from __future__ import unicode_literals
 
+import hashlib
 import os
 
 from django.conf import settings
 from django.contrib.staticfiles.finders import find
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.functional import lazy
 
-from assetfiles.filters import BaseFilter, CommandMixin, ExtensionMixin
+from assetfiles import cache, utils
+from assetfiles.filters import (BaseFilter, CommandMixin, ExtensionMixin,
+                                WorkerMixin)
+from assetfiles.filters import sass_libsass
+from assetfiles.filters.sass_imports import import_graph
 import assetfiles.settings
 from assetfiles.exceptions import SassFilterError
+from assetfiles.toolchain import toolchain
 
 
-class SassFilter(ExtensionMixin, CommandMixin, BaseFilter):
+class SassFilter(ExtensionMixin, CommandMixin, WorkerMixin, BaseFilter):
     """
     Filters Sass files into CSS.
 
+    Sass is compiled by the Ruby Sass command by default. Set the `backend`
+    option to 'libsass' to compile in-process with the libsass Python
+    bindings instead. The libsass backend supports the `style`, `precision`,
+    `load_paths` and `line_numbers` options, and the Django integration
+    functions, but not Compass.
+
+    Whether Compass is available, and the Sass directories within the
+    static directories, are looked up when the options are first used, so
+    loading the filters doesn't search for them.
+
     Attributes:
         sass_path: The full path to the Sass command. This defaults to a
             customized binstub that allows for better Bundler integration.
         functions_path: The full path to the Sass extension functions for
             Django integration. Set to None or False to bypass adding
             these functions.
+        ruby_path: The full path to the Ruby command used by the workers.
+            When `workers` is set, Sass files are compiled by long-running
+            Ruby processes that load Sass and the required files once.
     """
     SCRIPTS_PATH = os.path.abspath(
         os.path.join(os.path.dirname(__file__), '../scripts'))
+    BACKENDS = ('ruby', 'libsass')
 
     input_exts = ('sass', 'scss')
     output_ext = 'css'
     sass_path = 'sass'
     sass_env_path = os.path.join(SCRIPTS_PATH, 'sass_env.rb')
     sass_functions_path = os.path.join(SCRIPTS_PATH, 'sass_functions.rb')
+    sass_worker_path = os.path.join(SCRIPTS_PATH, 'sass_worker.rb')
+    ruby_path = 'ruby'
 
     def __init__(self, options=None, *args, **kwargs):
         super(SassFilter, self).__init__(*args, **kwargs)
-        if options is None:
-            options = {}
+        # The options are changed below, and may come from the settings.
+        options = dict(options or {})
 
         sass_options = assetfiles.settings.SASS_OPTIONS
 
@@ -49,10 +73,25 @@ class SassFilter(ExtensionMixin, CommandMixin, BaseFilter):
             'sass_functions_path',
             sass_options.get('sass_functions_path', self.sass_functions_path)
         )
-        options['compass'] = options.get(
-            'compass',
-            sass_options.get('compass', self._detect_compass())
+        self.sass_worker_path = options.pop(
+            'sass_worker_path',
+            sass_options.get('sass_worker_path', self.sass_worker_path)
+        )
+        self.ruby_path = options.pop(
+            'ruby_path',
+            sass_options.get('ruby_path', self.ruby_path)
         )
+        self.set_worker_options(options, sass_options)
+        options['backend'] = options.get(
+            'backend',
+            sass_options.get('backend', 'ruby')
+        )
+        if options['backend'] not in self.BACKENDS:
+            raise ImproperlyConfigured(
+                'Unknown Sass backend "{0}". Use one of: {1}.'.format(
+                    options['backend'], ', '.join(self.BACKENDS)))
+        if 'compass' not in options and 'compass' in sass_options:
+            options['compass'] = sass_options['compass']
 
         for option in ('style', 'precision', 'quiet', 'debug_info',
                        'line_numbers', 'cache_location', 'no_cache'):
@@ -69,32 +108,130 @@ class SassFilter(ExtensionMixin, CommandMixin, BaseFilter):
             options['require'].insert(0, self.sass_env_path)
 
         options['load_paths'] = (
-            sass_load_paths +
             sass_options.get('load_paths', []) +
             options.get('load_paths', [])
         )
 
-        self.options = options
+        self._options = options
+        self._resolved_options = None
+        self._required_hashes = None
+
+    @property
+    def options(self):
+        """
+        The options of the filter, including the detected Compass
+        integration and the Sass directories within the static directories.
+        """
+        if self._resolved_options is None:
+            options = dict(self._options)
+            if 'compass' not in options:
+                options['compass'] = self._detect_compass()
+            options['load_paths'] = (get_static_sass_dirs() +
+                                     options['load_paths'])
+            self._resolved_options = options
+        return self._resolved_options
 
     def filter(self, input):
+        if self.options['backend'] == 'libsass':
+            return sass_libsass.compile_file(input, settings.STATIC_URL,
+                                             self.options)
+        if self.workers:
+            return self._filter_with_worker(input)
+        return b''.join(self._stream_command(input))
+
+    def filter_stream(self, input):
+        """
+        Streams the output of the Sass command. The output of the libsass
+        backend and the workers is returned as a single chunk.
+        """
+        if self.options['backend'] == 'libsass' or self.workers:
+            return super(SassFilter, self).filter_stream(input)
+        return self._stream_command(input)
+
+    def get_fingerprint(self):
+        """
+        Adds STATIC_URL to the fingerprint, as it's passed to the Sass
+        functions through the environment.
+        """
+        fingerprint = super(SassFilter, self).get_fingerprint()
+        key = '{0}:{1}'.format(fingerprint, settings.STATIC_URL)
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def get_fingerprint_options(self):
+        """
+        Replaces the load paths with their paths within the static
+        directories, and the required files with hashes of their contents,
+        so the fingerprint is the same in every checkout. Files imported
+        from load paths outside of the static directories are part of the
+        digests by their contents.
+        """
+        options = dict(self.options)
+        options['load_paths'] = [utils.get_static_path(path)
+                                 for path in options['load_paths']]
+        if self._required_hashes is None:
+            self._required_hashes = [
+                cache.hash_file(path) if os.path.isfile(path) else path
+                for path in options['require']]
+        options['require'] = self._required_hashes
+        return options
+
+    def get_version(self):
+        if self.options['backend'] == 'libsass':
+            return sass_libsass.get_version()
+        return self.get_command_version(
+            '{0} --version'.format(self.sass_path))
+
+    def is_filterable(self, output_path):
+        """
+        Skips files prefixed with a '_'. These are Sass dependencies.
+        """
+        _, file_name = os.path.split(output_path)
+        return not file_name.startswith('_')
+
+    def get_dependencies(self, input_path):
+        """
+        Returns the Sass files imported by the given file, directly or
+        through other imports.
+        """
+        return import_graph.get_dependencies(input_path,
+                                             self.options['load_paths'])
+
+    def get_dependents(self, input_path):
+        """
+        Returns the Sass files within the load paths that import the given
+        file, directly or through other imports.
+        """
+        return import_graph.get_dependents(input_path,
+                                           self.options['load_paths'])
+
+    def _stream_command(self, input):
         command = '{command} {args} {input}'.format(
             command=self.sass_path,
             args=self._build_args(),
             input=self.format_option_value(input),
         )
 
-        return self.run_command(
+        return self.stream_command(
             command,
             extra_env={'DJANGO_STATIC_URL': settings.STATIC_URL},
             exception_type=SassFilterError
         )
 
-    def is_filterable(self, output_path):
+    def _filter_with_worker(self, input):
         """
-        Skips files prefixed with a '_'. These are Sass dependencies.
+        Compiles the given file with one of the shared Sass workers.
         """
-        _, file_name = os.path.split(output_path)
-        return not file_name.startswith('_')
+        args = [self.ruby_path, self.sass_worker_path] + self.options['require']
+        worker_options = dict((option, self.options[option]) for option in (
+            'style', 'precision', 'load_paths', 'quiet', 'compass',
+            'debug_info', 'line_numbers', 'cache_location', 'no_cache'))
+
+        response = self.request_worker(args, {
+            'path': input,
+            'static_url': settings.STATIC_URL,
+            'options': worker_options,
+        }, exception_type=SassFilterError)
+        return response['css'].encode('utf-8')
 
     def _build_args(self):
         """
@@ -122,7 +259,7 @@ class SassFilter(ExtensionMixin, CommandMixin, BaseFilter):
         """
         Returns true if Compass integration is available.
         """
-        return os.system('which compass > /dev/null') is 0
+        return toolchain.which('compass') is not None
 
 
 def get_static_sass_dirs(dirs=None):
@@ -147,8 +284,10 @@ def get_static_sass_dirs(dirs=None):
 
 
 """
-Directories that will be added to the Sass load path.
+The directories with Sass files within the static directories, as a lazy
+list, which is looked up whenever it's used rather than on import.
 
-By default, these are 'css' directories within the static directories.
+SassFilter looks the directories up when its options are first used; this
+is kept for code that imports it.
 """
-sass_load_paths = get_static_sass_dirs()
+sass_load_paths = lazy(get_static_sass_dirs, list)()
@@ -0,0 +1,359 @@
+"""
+Tracks which Sass files import which, so filtered stylesheets can be
+invalidated when one of the partials they import changes.
+"""
+from __future__ import unicode_literals
+
+import io
+import json
+import os
+import re
+import threading
+
+from django.utils.encoding import force_bytes
+
+from assetfiles import cache
+import assetfiles.settings
+
+
+SASS_EXTS = ('scss', 'sass')
+
+COMMENTS_RE = re.compile(
+    r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|/\*.*?(?:\*/|\Z)|//[^\n]*',
+    re.S)
+SCSS_IMPORT_RE = re.compile(
+    r'(?:^|(?<=[;{}]))[ \t]*@(import|use|forward)\s+([^;]*)', re.M)
+SASS_IMPORT_RE = re.compile(
+    r'^[ \t]*@(import|use|forward)\s+([^;\n]*)', re.M)
+STRING_RE = re.compile(r'"([^"]*)"|\'([^\']*)\'')
+
+
+def parse_imports(source, syntax='scss'):
+    """
+    Returns the names of the files imported by the given Sass source, in
+    order of appearance. Plain CSS imports are skipped.
+
+    Args:
+        source: The Sass source.
+        syntax: Either 'scss' or 'sass' (the indented syntax).
+    Returns:
+        A list of import names, as written in the source.
+
+    >>> parse_imports('@import "base", "folder/dep"; @import "x.css";')
+    ['base', 'folder/dep']
+    """
+    source = COMMENTS_RE.sub(_strip_comment, source)
+    import_re = SASS_IMPORT_RE if syntax == 'sass' else SCSS_IMPORT_RE
+
+    names = []
+    for match in import_re.finditer(source):
+        rule, args = match.groups()
+        quoted = [a or b for a, b in STRING_RE.findall(args)]
+        if rule != 'import':
+            # @use and @forward take a single URL, followed by options.
+            quoted = quoted[:1]
+        elif not quoted and syntax == 'sass':
+            # The indented syntax allows unquoted imports.
+            quoted = [arg.strip() for arg in args.split(',')]
+
+        for name in quoted:
+            if name and not _is_css_import(name):
+                names.append(name)
+    return names
+
+
+def resolve_import(name, base_dir, load_paths):
+    """
+    Returns the absolute path of the file the given import name refers to,
+    the way Sass resolves it: relative to the importing file first, then
+    within each of the load paths. Partials (prefixed with '_') and index
+    files are taken into account.
+
+    Args:
+        name: The import name, as written in the source.
+        base_dir: The directory of the importing file.
+        load_paths: A list of directories to search.
+    Returns:
+        The absolute path to the imported file or `None`.
+    """
+    candidates = _import_candidates(name)
+    for search_path in [base_dir] + list(load_paths):
+        for candidate in candidates:
+            path = os.path.join(search_path, candidate)
+            if os.path.isfile(path):
+                return os.path.normpath(path)
+    return None
+
+
+class ImportGraph(object):
+    """
+    ImportGraph records the imports of each Sass file and resolves them into
+    a dependency graph.
+
+    Parsing a file is the expensive part, so the parsed imports of each file
+    are kept along with the file's modification time and size, and a file
+    is only parsed again once it changes. Imports are resolved on every
+    lookup, as adding a file can change which file an import refers to.
+
+    The parsed imports are persisted in ASSETFILES_CACHE_DIR, if set, so they
+    survive restarts.
+
+    The reverse graph of each set of load paths is kept too. It's built once,
+    and afterwards only the imports of files that changed are resolved
+    again, unless files were added to or removed from the load paths.
+
+    Attributes:
+        cache_path: The file to persist the parsed imports in. Defaults to
+            `sass-imports.json` within ASSETFILES_CACHE_DIR.
+    """
+    CACHE_VERSION = 1
+
+    def __init__(self, cache_path=None):
+        self._cache_path = cache_path
+        self._files = None
+        self._dirty = False
+        self._graphs = {}
+        self._lock = threading.RLock()
+
+    @property
+    def cache_path(self):
+        if self._cache_path is None and assetfiles.settings.CACHE_DIR:
+            return os.path.join(assetfiles.settings.CACHE_DIR,
+                                'sass-imports.json')
+        return self._cache_path
+
+    def get_imports(self, path, load_paths):
+        """
+        Returns the absolute paths of the files directly imported by the
+        given file. Imports that can't be resolved are skipped.
+        """
+        with self._lock:
+            names = self._parse(path)
+        base_dir = os.path.dirname(path)
+
+        imports = []
+        for name in names:
+            import_path = resolve_import(name, base_dir, load_paths)
+            if import_path and import_path not in imports:
+                imports.append(import_path)
+        return imports
+
+    def get_dependencies(self, path, load_paths):
+        """
+        Returns the absolute paths of all of the files the given file
+        imports, directly or through other imports.
+        """
+        dependencies = []
+        pending = [path]
+        seen = set(pending)
+        while pending:
+            for import_path in self.get_imports(pending.pop(0), load_paths):
+                if import_path not in seen:
+                    seen.add(import_path)
+                    dependencies.append(import_path)
+                    pending.append(import_path)
+        self.save()
+        return dependencies
+
+    def get_dependents(self, path, load_paths):
+        """
+        Returns the absolute paths of all of the Sass files within the load
+        paths that import the given file, directly or through other imports.
+        """
+        reverse = self.build(load_paths)
+        path = os.path.normpath(path)
+
+        dependents = []
+        pending = [path]
+        seen = set(pending)
+        while pending:
+            for dependent in reverse.get(pending.pop(0), ()):
+                if dependent not in seen:
+                    seen.add(dependent)
+                    dependents.append(dependent)
+                    pending.append(dependent)
+        return sorted(dependents)
+
+    def build(self, load_paths):
+        """
+        Parses every Sass file within the load paths and returns the reverse
+        dependency graph: a dict of absolute paths to the list of files that
+        directly import them.
+        """
+        key = tuple(load_paths)
+        with self._lock:
+            graph = self._graphs.get(key)
+            if graph is None or _get_mtimes(graph['dirs']) != graph['dirs']:
+                paths, dirs = _walk_sass_files(load_paths)
+                graph = {'dirs': dirs, 'stamps': {}, 'imports': {}}
+                self._graphs[key] = graph
+                changed_paths = paths
+            else:
+                changed_paths = [path for path, stamp in graph['stamps'].items()
+                                 if _get_stamp(path) != stamp]
+
+            if changed_paths or 'reverse' not in graph:
+                for path in changed_paths:
+                    graph['stamps'][path] = _get_stamp(path)
+                    graph['imports'][path] = self.get_imports(path, load_paths)
+                graph['reverse'] = _reverse(graph['imports'])
+                self.save()
+            return graph['reverse']
+
+    def save(self):
+        """
+        Persists the parsed imports, if anything changed since they were
+        loaded. Files that no longer exist are dropped.
+        """
+        with self._lock:
+            if not self._dirty or not self.cache_path:
+                return
+            files = dict((path, entry)
+                         for path, entry in self._files.items()
+                         if os.path.exists(path))
+            data = {'version': self.CACHE_VERSION, 'files': files}
+            cache.write_atomic(self.cache_path, force_bytes(json.dumps(data)))
+            self._dirty = False
+
+    def clear(self):
+        with self._lock:
+            self._files = {}
+            self._dirty = False
+            self._graphs = {}
+
+    def _parse(self, path):
+        if self._files is None:
+            self._files = self._load()
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return []
+
+        entry = self._files.get(path)
+        if (entry and entry['mtime'] == stat.st_mtime and
+                entry['size'] == stat.st_size):
+            return entry['imports']
+
+        with io.open(path, 'r', encoding='utf-8', errors='replace') as file:
+            source = file.read()
+        syntax = 'sass' if path.endswith('.sass') else 'scss'
+        imports = parse_imports(source, syntax)
+
+        self._files[path] = {
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'imports': imports,
+        }
+        self._dirty = True
+        return imports
+
+    def _load(self):
+        if not self.cache_path:
+            return {}
+        try:
+            with io.open(self.cache_path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except (IOError, OSError, ValueError):
+            return {}
+        if data.get('version') != self.CACHE_VERSION:
+            return {}
+        return data.get('files', {})
+
+
+def find_sass_files(load_paths):
+    """
+    Returns the absolute paths of all of the Sass files within the given
+    directories.
+    """
+    return _walk_sass_files(load_paths)[0]
+
+
+"""
+The import graph shared by all Sass filters.
+"""
+import_graph = ImportGraph()
+
+
+def _walk_sass_files(load_paths):
+    """
+    Returns a list of the Sass files within the given directories, and a
+    dict of the directories walked to their modification times.
+    """
+    paths = []
+    seen = set()
+    dirs = {}
+    for load_path in load_paths:
+        for root, dir_names, file_names in os.walk(load_path):
+            dirs[root] = _get_mtime(root)
+            for file_name in sorted(file_names):
+                if file_name.rsplit('.', 1)[-1] in SASS_EXTS:
+                    path = os.path.normpath(os.path.join(root, file_name))
+                    if path not in seen:
+                        seen.add(path)
+                        paths.append(path)
+    return paths, dirs
+
+
+def _reverse(imports):
+    """
+    Returns a dict of each imported file to the files that import it, given
+    a dict of files to the files they import.
+    """
+    reverse = {}
+    for path in sorted(imports):
+        for import_path in imports[path]:
+            reverse.setdefault(import_path, []).append(path)
+    return reverse
+
+
+def _get_mtimes(dirs):
+    return dict((dir, _get_mtime(dir)) for dir in dirs)
+
+
+def _get_mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _get_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime, stat.st_size)
+
+
+def _strip_comment(match):
+    text = match.group(0)
+    if text.startswith('/'):
+        # Keep line breaks, so the indented syntax keeps its lines.
+        return '\n' * text.count('\n')
+    return text
+
+
+def _is_css_import(name):
+    return (name.endswith('.css') or name.startswith('url(') or
+            name.startswith(('http://', 'https://', '//')) or
+            name.startswith('sass:'))
+
+
+def _import_candidates(name):
+    dirname, basename = os.path.split(name)
+    root, ext = os.path.splitext(basename)
+
+    if ext[1:] in SASS_EXTS:
+        basenames = [basename, '_' + basename]
+    else:
+        basenames = []
+        for sass_ext in SASS_EXTS:
+            basenames += [basename + '.' + sass_ext,
+                          '_' + basename + '.' + sass_ext]
+        for sass_ext in SASS_EXTS:
+            basenames += [os.path.join(basename, 'index.' + sass_ext),
+                          os.path.join(basename, '_index.' + sass_ext)]
+
+    return [os.path.join(dirname, candidate) for candidate in basenames]
+
@@ -0,0 +1,97 @@
+"""
+Compiles Sass in-process with the libsass Python bindings, as an alternative
+to running the Ruby Sass command.
+
+Requires the `libsass` package.
+"""
+from __future__ import absolute_import, unicode_literals
+
+from django.core.exceptions import ImproperlyConfigured
+
+from assetfiles.exceptions import SassFilterError
+
+
+def compile_file(path, static_url, options):
+    """
+    Compiles the given Sass file into CSS.
+
+    Args:
+        path: The absolute path to the Sass file.
+        static_url: The URL the static path functions join paths to.
+        options: The SassFilter options. `style`, `precision`, `load_paths`
+            and `line_numbers` are supported.
+    Returns:
+        The compiled CSS, as bytes.
+    Raises:
+        SassFilterError: If the file could not be compiled.
+    """
+    sass = _import_libsass()
+
+    kwargs = {
+        'filename': path,
+        'output_style': options.get('style') or 'nested',
+        'include_paths': list(options.get('load_paths') or []),
+        'source_comments': bool(options.get('line_numbers')),
+        'custom_functions': get_functions(sass, static_url),
+    }
+    if options.get('precision'):
+        kwargs['precision'] = int(options['precision'])
+
+    try:
+        css = sass.compile(**kwargs)
+    except (sass.CompileError, ValueError) as e:
+        raise SassFilterError(e)
+    return css.encode('utf-8')
+
+
+def get_version():
+    """
+    Returns the versions of the libsass bindings and of libsass itself.
+    """
+    sass = _import_libsass()
+    return 'libsass-python {0} (libsass {1})'.format(
+        sass.__version__, sass.libsass_version)
+
+
+def get_functions(sass, static_url):
+    """
+    Returns the Python versions of the Sass functions provided to the Ruby
+    Sass command by `scripts/sass_functions.rb`, including Compass'
+    `image-url` and `font-url` signatures.
+    """
+    def static_path(source):
+        return '"{0}"'.format(join_url(static_url or '..', source))
+
+    def static_url_function(source, only_path=False, cache_buster=False):
+        if only_path is True:
+            return static_path(source)
+        return 'url({0})'.format(static_path(source))
+
+    url_args = ('$source', '$only-path: false', '$cache-buster: false')
+    return set([
+        sass.SassFunction('static-path', ('$source',), static_path),
+        sass.SassFunction('static-url', url_args, static_url_function),
+        sass.SassFunction('image-path', ('$source',), static_path),
+        sass.SassFunction('image-url', url_args, static_url_function),
+        sass.SassFunction('font-path', ('$source',), static_path),
+        sass.SassFunction('font-url', url_args, static_url_function),
+    ])
+
+
+def join_url(base, path):
+    """
+    Joins the given paths with a single '/', like Ruby's `File.join`.
+
+    >>> join_url('/static/', '/img/bg.jpg')
+    '/static/img/bg.jpg'
+    """
+    return '{0}/{1}'.format(base.rstrip('/'), path.lstrip('/'))
+
+
+def _import_libsass():
+    try:
+        import sass
+    except ImportError:
+        raise ImproperlyConfigured(
+            'The libsass Sass backend requires the libsass package.')
+    return sass
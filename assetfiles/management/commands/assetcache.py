@@ -0,0 +1,42 @@
+from optparse import make_option
+
+from django.core.management.base import CommandError, NoArgsCommand
+
+from assetfiles.cache import disk_cache
+
+
+class Command(NoArgsCommand):
+    """
+    Inspects, prunes or clears the persistent cache of filtered assets
+    configured with ASSETFILES_CACHE_DIR.
+    """
+    option_list = NoArgsCommand.option_list + (
+        make_option('--prune', action='store_true', dest='prune', default=False,
+            help='Removes the least recently used entries until the cache '
+                 'fits within ASSETFILES_CACHE_MAX_SIZE.'),
+        make_option('--max-size', type='int', dest='max_size', default=None,
+            help='Prunes the cache to the given size in bytes instead.'),
+        make_option('--clear', action='store_true', dest='clear', default=False,
+            help='Removes all entries from the cache.'),
+    )
+    help = 'Inspects, prunes or clears the cache of filtered assets.'
+
+    def handle_noargs(self, **options):
+        if not disk_cache.enabled:
+            raise CommandError('The asset cache is disabled. '
+                               'Set ASSETFILES_CACHE_DIR to enable it.')
+
+        if options['clear']:
+            disk_cache.clear()
+            self.stdout.write('Cleared the asset cache.')
+        elif options['prune'] or options['max_size'] is not None:
+            entries_count = len(disk_cache.entries())
+            disk_cache.prune(options['max_size'])
+            removed_count = entries_count - len(disk_cache.entries())
+            self.stdout.write('Removed %s entries.' % removed_count)
+
+        entries = disk_cache.entries()
+        self.stdout.write('Location: %s' % disk_cache.location)
+        self.stdout.write('Entries: %s' % len(entries))
+        self.stdout.write('Size: %s bytes (max %s bytes)' % (
+            sum(size for path, size, mtime in entries), disk_cache.max_size))
@@ -1,11 +1,18 @@
+import json
 import os
+from collections import deque, OrderedDict
+from multiprocessing.pool import ThreadPool
+from optparse import make_option
 
 from django.contrib.staticfiles.management.commands import collectstatic
 from django.contrib.staticfiles import finders
+from django.core.files.base import ContentFile, File
 from django.core.management.base import CommandError
 from django.utils.datastructures import SortedDict
+from django.utils.encoding import force_bytes
 
-from assetfiles import filters
+from assetfiles import cache, compress, filters, manifest, settings, signals
+from assetfiles.stats import get_peak_rss, stats
 from assetfiles.storage import TempFilesStorage
 
 
@@ -13,23 +20,79 @@ class Command(collectstatic.Command):
     """
     Overrides staticfiles' `collectstatic` command to filter files before
     copying them to the target storage.
+
+    A build manifest is kept in the target storage, recording a digest of
+    the inputs and dependencies of each filtered file, so files that have
+    not changed since the last run are not filtered again. The manifest is
+    served along with the static files, so it doesn't contain the paths of
+    the inputs on the server.
+
+    If ASSETFILES_HASH_NAMES is set, each filtered file is also saved under
+    a name containing the hash of its content, and the hashed names are
+    written to a manifest for the `{% static %}` template tag.
     """
+    BUILD_MANIFEST_VERSION = 2
+    SLOWEST_ASSETS_COUNT = 10
+
+    option_list = collectstatic.Command.option_list + (
+        make_option('--force', action='store_true', dest='force', default=False,
+            help='Filters all asset files, even if they have not changed '
+                 'since the last run.'),
+        make_option('-j', '--jobs', type='int', dest='jobs', default=1,
+            help='The number of asset files to filter in parallel.'),
+        make_option('--compress', action='store_true', dest='compress',
+            default=False,
+            help='Writes gzip (and brotli) compressed variants of each '
+                 'compressible file next to it.'),
+        make_option('--timings', action='store_true', dest='timings',
+            default=False,
+            help='Prints the slowest asset files, the commands run, the '
+                 'cache hits and the peak memory use.'),
+    )
+
     def __init__(self, *args, **kwargs):
         super(Command, self).__init__(*args, **kwargs)
         self.found_files = SortedDict()
         self.temp_storage = TempFilesStorage()
+        self.build_manifest = {}
+        self.previous_build_manifest = {}
+        self.prepared_files = {}
+        self.pending_files = OrderedDict()
+        self.compressing_files = deque()
+        self.file_filters = {}
+        self.hashed_files = {}
+        self.previous_hashed_files = {}
+        self.asset_timings = {}
+        self.pool = None
 
     def set_options(self, **options):
         super(Command, self).set_options(**options)
         if self.symlink:
             raise CommandError('Symlinking is not supported by Assetfiles.')
+        self.force = options.get('force', False)
+        self.jobs = max(options.get('jobs') or 1, 1)
+        self.compress = options.get('compress') or settings.PRECOMPRESS
+        self.hash_names = settings.HASH_NAMES
+        self.timings = options.get('timings', False)
 
     def collect(self):
+        if self.timings:
+            stats.reset()
         if self.clear:
             self.clear_dir('')
+        if not self.force:
+            self.previous_build_manifest = self._load_build_manifest()
+        if self.hash_names:
+            self.previous_hashed_files = manifest.manifest.load(self.storage)
         self._collect_files()
+        if not self.dry_run:
+            self._save_build_manifest()
+            if self.hash_names:
+                manifest.manifest.save(self.hashed_files, self.storage)
         if self.post_process and hasattr(self.storage, 'post_process'):
             self._post_process_files()
+        if self.timings:
+            self._print_timings()
 
         return {
             'modified': self.copied_files,
@@ -38,13 +101,66 @@ class Command(collectstatic.Command):
         }
 
     def _collect_files(self):
-        for path, prefixed_path, source_storage in self._full_file_list():
-            if self._is_copied(prefixed_path):
-                self.log("Skipping '%s' (already copied earlier)" % path)
-            elif self.delete_file(path, prefixed_path, source_storage):
-                path, prefixed_path, source_storage = self._collect_file(
-                    path, prefixed_path, source_storage)
-            self.found_files[prefixed_path] = (source_storage, path)
+        files = list(self._full_file_list())
+        self.file_filters = filters.classify(
+            prefixed_path for path, prefixed_path, source_storage in files)
+        if self.jobs > 1:
+            self.pool = ThreadPool(self.jobs)
+            self._prepare_files(files)
+
+        try:
+            for path, prefixed_path, source_storage in files:
+                if self._is_copied(prefixed_path):
+                    self.log("Skipping '%s' (already copied earlier)" % path)
+                elif self.delete_file(path, prefixed_path, source_storage):
+                    path, prefixed_path, source_storage = self._collect_file(
+                        path, prefixed_path, source_storage)
+                else:
+                    self._compress_unmodified_file(prefixed_path)
+                self.found_files[prefixed_path] = (source_storage, path)
+            self._collect_bundles()
+            self._collect_compressed_files()
+        finally:
+            self.prepared_files.clear()
+            self.pending_files.clear()
+            self.compressing_files.clear()
+            self.temp_storage.clear()
+            if self.pool:
+                self.pool.terminate()
+                self.pool.join()
+                self.pool = None
+
+    def _prepare_files(self, files):
+        """
+        Queues the given files to be filtered in the worker pool. The results
+        are picked up in order by `_collect_file`, so the target storage is
+        only written to from the main thread and the output stays
+        deterministic.
+        """
+        seen = set()
+        for path, prefixed_path, source_storage in files:
+            if prefixed_path in seen:
+                continue
+            seen.add(prefixed_path)
+
+            filter = self._get_filter(prefixed_path)
+            if filter and filter.is_filterable(prefixed_path):
+                source_path = source_storage.path(path)
+                self.pending_files[source_path] = (filter, prefixed_path)
+        self._submit_prepared_files()
+
+    def _submit_prepared_files(self):
+        """
+        Starts filtering queued files, keeping twice as many files in the
+        worker pool as there are workers. Each filtered file holds up to
+        ASSETFILES_SPOOL_SIZE bytes in memory until it is copied, so the
+        workers only run a little ahead of the copying.
+        """
+        while self.pending_files and len(self.prepared_files) < self.jobs * 2:
+            source_path, (filter, prefixed_path) = \
+                self.pending_files.popitem(last=False)
+            self.prepared_files[source_path] = self.pool.apply_async(
+                self._prepare_file, (filter, prefixed_path, source_path))
 
     def _post_process_files(self):
         processor = self.storage.post_process(self.found_files,
@@ -65,41 +181,321 @@ class Command(collectstatic.Command):
 
     def _collect_file(self, path, prefixed_path, source_storage):
         source_path = source_storage.path(path)
-        target_path = prefixed_path
-        filter = filters.find_by_input_path(prefixed_path)
+        filter = self._get_filter(prefixed_path)
 
         if filter and not filter.is_filterable(prefixed_path):
             self.log("Skipping '%s' (filter dependency)" % path)
+        elif filter:
+            return self._collect_filtered_file(filter, prefixed_path,
+                                               source_path, source_storage)
         else:
-            if filter:
-                target_path, source_storage = self._filter_file(
-                    filter, prefixed_path, source_path, source_storage)
-            self._copy_file(source_path, target_path, source_storage)
+            self._copy_file(source_path, prefixed_path, source_storage)
             if not prefixed_path in self.copied_files:
                 self.copied_files.append(prefixed_path)
 
-        return (source_path, target_path, source_storage)
+        return (source_path, prefixed_path, source_storage)
+
+    def _collect_filtered_file(self, filter, prefixed_path, source_path,
+                               source_storage):
+        target_path = filter.derive_output_path(prefixed_path)
+        record, unmodified, content, variants = self._get_prepared_file(
+            filter, prefixed_path, source_path)
+        self.build_manifest[target_path] = record
+        if unmodified:
+            self.log("Skipping '%s' (not modified)" % source_path)
+            self.unmodified_files.append(prefixed_path)
+            self._compress_unmodified_file(target_path)
+            if self.hash_names:
+                self.hashed_files[target_path] = \
+                    self.previous_hashed_files[target_path]
+                self._compress_unmodified_file(self.hashed_files[target_path])
+            return (target_path, target_path, self.storage)
+
+        target_path, source_storage = self._filter_file(
+            filter, prefixed_path, source_path, source_storage, content)
+        self._copy_file(source_path, target_path, source_storage,
+                        hash_name=self.hash_names, filter=filter,
+                        variants=variants)
+        if not prefixed_path in self.copied_files:
+            self.copied_files.append(prefixed_path)
+        if self.dry_run:
+            return (source_path, target_path, source_storage)
+
+        # Temporary copies of filtered files are freed once they have been
+        # copied, so they are post-processed from the target storage.
+        self.temp_storage.delete(source_path)
+        return (target_path, target_path, self.storage)
+
+    def _collect_bundles(self):
+        """
+        Builds the outputs of filters that combine several files, i.e.
+        BundleFilter. Their members have been collected on their own by now.
+        """
+        for filter in filters.get_filters():
+            for output_path in filter.get_output_paths():
+                source_path = self._find_bundle_input(filter, output_path)
+                if source_path is None:
+                    self.log("Skipping '%s' (no inputs found)" % output_path)
+                    continue
+                path, prefixed_path, source_storage = \
+                    self._collect_filtered_file(filter, output_path,
+                                                source_path, None)
+                if source_storage is not None:
+                    self.found_files[prefixed_path] = (source_storage, path)
+
+    def _find_bundle_input(self, filter, output_path):
+        for input_path in filter.derive_input_paths(output_path):
+            source_path = finders.find(input_path)
+            if source_path:
+                return source_path
+        return None
+
+    def _get_filter(self, prefixed_path):
+        if prefixed_path in self.file_filters:
+            return self.file_filters[prefixed_path]
+        return filters.find_by_input_path(prefixed_path)
+
+    def _get_prepared_file(self, filter, prefixed_path, source_path):
+        result = self.prepared_files.pop(source_path, None)
+        self.pending_files.pop(source_path, None)
+        if self.pool:
+            self._submit_prepared_files()
+        if result is not None:
+            return result.get()
+        return self._prepare_file(filter, prefixed_path, source_path)
+
+    def _prepare_file(self, filter, prefixed_path, source_path):
+        """
+        Filters and compresses the given file, unless it has not been
+        modified since the last run. This may run in a worker thread, so it
+        must not write to the target storage.
+
+        Returns:
+            A tuple of the build manifest record, whether the file is
+            unmodified, a file object with the filtered content (`None` if
+            the file is unmodified or this is a dry run), and a dict of its
+            compressed variants (see `_compress_file`).
+        """
+        target_path = filter.derive_output_path(prefixed_path)
+        hashes = cache.get_hashes(filter, source_path)
+        record = self._build_record(filter, prefixed_path, source_path,
+                                    hashes)
+        if self._is_unmodified(target_path, record):
+            return (record, True, None, None)
+        if self.dry_run:
+            return (record, False, None, None)
+
+        with stats.timer('collectstatic.filter') as timer:
+            content = cache.filter_file(filter, source_path, memory=False,
+                                        hashes=hashes)
+        self._add_timing(filter, target_path, 'filter', timer.duration)
+        try:
+            variants = self._compress_file(target_path, content, filter)
+        except Exception:
+            content.close()
+            raise
+        content.seek(0)
+        return (record, False, content, variants)
 
-    def _filter_file(self, filter, prefixed_path, source_path, source_storage):
+    def _filter_file(self, filter, prefixed_path, source_path, source_storage,
+                     content):
         target_path = filter.derive_output_path(prefixed_path)
         if self.dry_run:
             self.log("Pretending to process '%s'" % source_path, level=1)
         else:
             self.log("Processing '%s'" % source_path, level=1)
-            content = filter.filter(source_path)
             source_storage = self.temp_storage
-            source_storage.save(source_path, content)
+            with content:
+                source_storage.save(source_path, content)
 
         return (target_path, source_storage)
 
-    def _copy_file(self, source_path, target_path, source_storage):
+    def _copy_file(self, source_path, target_path, source_storage,
+                   hash_name=False, filter=None, variants=None):
+        """
+        Copies the given file to the target storage. With `hash_name`, the
+        file is also saved under a name containing the hash of its content,
+        which is computed from the open file as it is copied, rather than in
+        a later pass.
+
+        The given compressed variants are saved next to both copies. Without
+        them, the file is compressed in the worker pool, if there is one,
+        and the variants are saved once they are ready.
+        """
         if self.dry_run:
             self.log("Pretending to copy '%s'" % source_path, level=1)
-        else:
-            self.log("Copying '%s'" % source_path, level=1)
-            with source_storage.open(source_path) as source_file:
-                self._make_local_dirs(target_path)
-                self.storage.save(target_path, source_file)
+            return
+
+        self.log("Copying '%s'" % source_path, level=1)
+        target_paths = [target_path]
+        try:
+            with stats.timer('collectstatic.copy') as timer, \
+                    source_storage.open(source_path) as source_file:
+                self._save_file(target_path, source_file)
+                if hash_name:
+                    hashed_path = manifest.hash_name(target_path, source_file)
+                    self.hashed_files[target_path] = hashed_path
+                    self.log("Copying '%s' as '%s'" % (source_path,
+                                                       hashed_path), level=1)
+                    self._save_file(hashed_path, source_file)
+                    target_paths.append(hashed_path)
+        except Exception:
+            self._close_files(variants)
+            raise
+        self._add_timing(filter, target_path, 'copy', timer.duration)
+
+        if variants is not None:
+            self._save_compressed_files(target_paths, variants)
+        elif self.compress and compress.is_compressible(target_path):
+            self._submit_compressed_file(target_path, target_paths,
+                                         source_storage, source_path, filter)
+
+    def _save_file(self, target_path, source_file):
+        """
+        Saves the given file to the target storage. Earlier copies of the
+        file are replaced, and their compressed variants are deleted, so
+        they aren't served in place of the new content.
+        """
+        self._make_local_dirs(target_path)
+        # Filtered files are written to a different path than their
+        # source, so `delete_file` doesn't remove stale copies.
+        self._delete_target_file(target_path)
+        source_file.seek(0)
+        self.storage.save(target_path, source_file)
+
+    def _compress_file(self, target_path, source_file, filter=None):
+        """
+        Returns a dict of extensions to temporary files with the compressed
+        variants of the given file, if compression is enabled. This may run
+        in a worker thread.
+        """
+        if not self.compress or not compress.is_compressible(target_path):
+            return {}
+        with stats.timer('collectstatic.compress') as timer:
+            variants = compress.compress_file(target_path, source_file)
+        self._add_timing(filter, target_path, 'compress', timer.duration)
+        return variants
+
+    def _compress_stored_file(self, target_path, storage, path, filter=None):
+        """
+        Compresses the given file of the given storage. This may run in a
+        worker thread, so it only reads from the storage.
+        """
+        with storage.open(path) as file:
+            return self._compress_file(target_path, file, filter)
+
+    def _submit_compressed_file(self, target_path, target_paths, storage,
+                                path, filter=None):
+        """
+        Compresses the given file in the worker pool, and saves the variants
+        next to each of the given target paths once they are ready. Like
+        filtered files, only twice as many files as there are workers are
+        compressed ahead of the copying.
+        """
+        if not self.pool:
+            variants = self._compress_stored_file(target_path, storage, path,
+                                                  filter)
+            self._save_compressed_files(target_paths, variants)
+            return
+        result = self.pool.apply_async(self._compress_stored_file,
+                                       (target_path, storage, path, filter))
+        self.compressing_files.append((target_paths, result))
+        self._collect_compressed_files(self.jobs * 2)
+
+    def _collect_compressed_files(self, limit=0):
+        """
+        Saves the variants of the files compressed in the worker pool, in
+        order, until no more than `limit` files are left in the pool.
+        """
+        while len(self.compressing_files) > limit:
+            target_paths, result = self.compressing_files.popleft()
+            self._save_compressed_files(target_paths, result.get())
+
+    def _compress_unmodified_file(self, target_path):
+        """
+        Compresses a file that wasn't copied again, as it has not been
+        modified, unless it already has compressed variants, i.e. when the
+        last run didn't compress files.
+        """
+        if (self.dry_run or not self.compress or
+                not compress.is_compressible(target_path) or
+                not self.storage.exists(target_path)):
+            return
+        for encoding in compress.ENCODINGS:
+            if self.storage.exists('{0}.{1}'.format(target_path, encoding)):
+                return
+        self._submit_compressed_file(target_path, [target_path], self.storage,
+                                     target_path)
+
+    def _save_compressed_files(self, target_paths, variants):
+        """
+        Saves the given compressed variants next to each of the given target
+        paths, and closes them.
+        """
+        try:
+            for target_path in target_paths:
+                for encoding, variant in sorted(variants.items()):
+                    name = '{0}.{1}'.format(target_path, encoding)
+                    self.log("Compressed '%s' as '%s'" % (target_path, name))
+                    variant.seek(0)
+                    self.storage.save(name, File(variant))
+        finally:
+            self._close_files(variants)
+
+    def _close_files(self, variants):
+        for variant in (variants or {}).values():
+            variant.close()
+
+    def _delete_target_file(self, target_path):
+        """
+        Deletes the given file from the target storage, if it exists, and
+        its compressed variants, if compression is enabled.
+        """
+        names = [target_path]
+        if self.compress:
+            names += ['{0}.{1}'.format(target_path, encoding)
+                      for encoding in compress.ENCODINGS]
+        for name in names:
+            if self.storage.exists(name):
+                self.storage.delete(name)
+
+    def _add_timing(self, filter, target_path, step, duration):
+        """
+        Adds the duration of a step to the time spent on the given file, and
+        sends `assetfiles.signals.asset_collected`. Filtering may run in a
+        worker thread, but each file is only handled by one thread at a time.
+        """
+        self.asset_timings[target_path] = (
+            self.asset_timings.get(target_path, 0) + duration)
+        signals.asset_collected.send(sender=type(filter) if filter else None,
+                                     path=target_path, step=step,
+                                     duration=duration)
+
+    def _print_timings(self):
+        slowest = sorted(self.asset_timings.items(), key=lambda item: item[1],
+                         reverse=True)[:self.SLOWEST_ASSETS_COUNT]
+        self.stdout.write('\nSlowest files:')
+        for target_path, duration in slowest:
+            self.stdout.write('%8.3fs  %s' % (duration, target_path))
+
+        snapshot = stats.snapshot()
+        counters = snapshot['counters']
+        commands = snapshot['timings'].get('commands', {})
+        self.stdout.write('\nCommands: %s run (%s failed) in %.3fs, '
+                          '%s bytes of output' % (
+                              counters.get('commands.spawned', 0),
+                              counters.get('commands.failed', 0),
+                              commands.get('total', 0),
+                              counters.get('commands.bytes', 0)))
+        self.stdout.write('Workers: %s started' %
+                          counters.get('workers.spawned', 0))
+        for cache_name in ('memory', 'disk'):
+            self.stdout.write('Cache (%s): %s hits, %s misses' % (
+                cache_name, counters.get('cache.%s.hits' % cache_name, 0),
+                counters.get('cache.%s.misses' % cache_name, 0)))
+        peak_rss = get_peak_rss()
+        if peak_rss is not None:
+            self.stdout.write('Peak RSS: %.1f MB' % (peak_rss / 1024.0 / 1024))
 
     def _full_file_list(self):
         for finder in finders.get_finders():
@@ -123,4 +519,54 @@ class Command(collectstatic.Command):
                 pass
 
     def _is_copied(self, file):
-        return file in self.found_files or file in self.copied_files
+        return (file in self.found_files or file in self.copied_files or
+                file in self.unmodified_files)
+
+    def _build_record(self, filter, prefixed_path, source_path, hashes):
+        """
+        Returns the build manifest entry for the given filtered file, given
+        the content hashes of its inputs (see `cache.get_hashes`). Neither
+        the input path nor the digest depends on where the project is
+        checked out.
+        """
+        return {
+            'input': prefixed_path,
+            'digest': cache.get_digest(filter, source_path, hashes),
+        }
+
+    def _is_unmodified(self, target_path, record):
+        """
+        Returns true if the given filtered file was built from the same
+        inputs in the last run, and still exists in the target storage.
+        """
+        if self.previous_build_manifest.get(target_path) != record:
+            return False
+        if not self.storage.exists(target_path):
+            return False
+        if self.hash_names:
+            hashed_path = self.previous_hashed_files.get(target_path)
+            return bool(hashed_path) and self.storage.exists(hashed_path)
+        return True
+
+    def _load_build_manifest(self):
+        name = settings.BUILD_MANIFEST_NAME
+        try:
+            if not self.storage.exists(name):
+                return {}
+            with self.storage.open(name) as manifest_file:
+                data = json.loads(manifest_file.read().decode('utf-8'))
+        except (IOError, OSError, ValueError):
+            return {}
+        if data.get('version') != self.BUILD_MANIFEST_VERSION:
+            return {}
+        return data.get('outputs', {})
+
+    def _save_build_manifest(self):
+        name = settings.BUILD_MANIFEST_NAME
+        content = json.dumps({
+            'version': self.BUILD_MANIFEST_VERSION,
+            'outputs': self.build_manifest,
+        }, indent=2, sort_keys=True)
+        if self.storage.exists(name):
+            self.storage.delete(name)
+        self.storage.save(name, ContentFile(force_bytes(content)))
@@ -4,6 +4,7 @@ from django.conf import settings
 from django.core.management.commands.runserver import Command as RunserverCommand
 
 from assetfiles.handlers import AssetFilesHandler
+from assetfiles.watcher import AssetWatcher
 
 
 class Command(RunserverCommand):
@@ -16,6 +17,8 @@ class Command(RunserverCommand):
             help='Tells Django to NOT automatically serve static files at STATIC_URL.'),
         make_option('--insecure', action='store_true', dest='insecure_serving', default=False,
             help='Allows serving static files even if DEBUG is False.'),
+        make_option('--nowatch', action='store_false', dest='use_watcher', default=True,
+            help='Tells Django to NOT precompile changed assets in the background.'),
     )
     help = 'Starts a lightweight Web server for development and also serves static files.'
 
@@ -24,5 +27,16 @@ class Command(RunserverCommand):
         use_static_handler = options.get('use_static_handler', True)
         insecure_serving = options.get('insecure_serving', False)
         if use_static_handler and (settings.DEBUG or insecure_serving):
+            if options.get('use_watcher', True):
+                self.start_watcher()
             return AssetFilesHandler(handler)
         return handler
+
+    def start_watcher(self):
+        """
+        Starts precompiling changed assets into the cache in the background,
+        so requests after an edit don't wait for the compiler.
+        """
+        if getattr(self, 'watcher', None) is None:
+            self.watcher = AssetWatcher(log=self.stdout.write)
+            self.watcher.start()
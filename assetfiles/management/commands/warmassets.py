@@ -0,0 +1,115 @@
+import os
+import time
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
+from optparse import make_option
+
+from django.contrib.staticfiles import finders
+from django.core.management.base import CommandError, NoArgsCommand
+
+from assetfiles import assets, cache, filters
+from assetfiles.exceptions import FilterError
+
+
+class Command(NoArgsCommand):
+    """
+    Filters every asset into the persistent cache configured with
+    ASSETFILES_CACHE_DIR, so the first requests after a deploy or a new
+    checkout don't wait for the compilers.
+    """
+    option_list = NoArgsCommand.option_list + (
+        make_option('-j', '--jobs', type='int', dest='jobs', default=None,
+            help='The number of asset files to filter in parallel. '
+                 'Defaults to the number of CPUs.'),
+        make_option('-i', '--ignore', action='append', default=[],
+            dest='ignore_patterns', metavar='PATTERN',
+            help='Ignore files or directories matching this glob-style '
+                 'pattern. Use multiple times to ignore more.'),
+        make_option('--no-default-ignore', action='store_false',
+            dest='use_default_ignore_patterns', default=True,
+            help="Don't ignore the common private glob-style patterns "
+                 "'CVS', '.*' and '*~'."),
+    )
+    help = 'Filters all assets into the cache of filtered assets.'
+
+    def handle_noargs(self, **options):
+        if not cache.disk_cache.enabled:
+            raise CommandError('The asset cache is disabled. '
+                               'Set ASSETFILES_CACHE_DIR to enable it.')
+
+        self.verbosity = int(options.get('verbosity', 1))
+        ignore_patterns = options['ignore_patterns']
+        if options['use_default_ignore_patterns']:
+            ignore_patterns += ['CVS', '.*', '*~']
+        jobs = max(options.get('jobs') or cpu_count(), 1)
+
+        start = time.time()
+        pool = ThreadPool(jobs)
+        try:
+            results = [(output_path, pool.apply_async(
+                           self.warm_asset, (filter, input_path)))
+                       for output_path, input_path, filter
+                       in self.find_assets(ignore_patterns)]
+            failed_count = 0
+            for output_path, result in results:
+                duration, error = result.get()
+                if error:
+                    failed_count += 1
+                    self.stderr.write("Failed to filter '%s':\n%s" % (
+                        output_path, error))
+                elif self.verbosity >= 1:
+                    self.stdout.write("Filtered '%s' in %.3fs" % (
+                        output_path, duration))
+        finally:
+            pool.terminate()
+            pool.join()
+
+        self.stdout.write('Filtered %s assets in %.3fs.' % (
+            len(results) - failed_count, time.time() - start))
+        if failed_count:
+            raise CommandError('%s assets could not be filtered.' %
+                               failed_count)
+
+    def find_assets(self, ignore_patterns):
+        """
+        Returns a list of (output path, absolute input path, filter) tuples
+        for the files the finders list that a filter accepts, and for the
+        outputs of filters that build files from several inputs, like
+        BundleFilter. Dependencies, like Sass partials, are skipped.
+        """
+        found = []
+        seen = set()
+        for finder in finders.get_finders():
+            for path, storage in finder.list(ignore_patterns):
+                prefix = getattr(storage, 'prefix', None)
+                prefixed_path = os.path.join(prefix, path) if prefix else path
+                if prefixed_path in seen:
+                    continue
+                seen.add(prefixed_path)
+
+                filter = filters.find_by_input_path(prefixed_path)
+                if filter and filter.is_filterable(prefixed_path):
+                    found.append((filter.derive_output_path(prefixed_path),
+                                  storage.path(path), filter))
+
+        for filter in filters.get_filters():
+            for output_path in filter.get_output_paths():
+                input_path, asset_filter = assets.find(output_path)
+                if input_path and asset_filter is filter:
+                    found.append((output_path, input_path, filter))
+        return found
+
+    def warm_asset(self, filter, input_path):
+        """
+        Filters the given file into the cache. This runs in a worker thread.
+
+        Returns:
+            A tuple of the duration in seconds and the error message, if the
+            file could not be filtered.
+        """
+        start = time.time()
+        try:
+            cache.filter(filter, input_path, memory=False)
+        except FilterError as e:
+            return time.time() - start, e
+        return time.time() - start, None
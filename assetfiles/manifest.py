@@ -0,0 +1,161 @@
+"""
+The manifest of content-hashed names of filtered files, written by
+`collectstatic` and used by the `{% static %}` template tag.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+try:
+    from urllib.parse import urljoin
+except ImportError:     # Python 2
+    from urlparse import urljoin
+
+from django.conf import settings as django_settings
+from django.contrib.staticfiles import storage
+from django.core.files.base import ContentFile
+from django.utils.encoding import filepath_to_uri, force_bytes
+
+from assetfiles import settings
+
+
+def hash_name(name, content):
+    """
+    Returns the given file name with a hash of the given content inserted
+    before the extension, like Django's CachedStaticFilesStorage. The content
+    may be a string or a Django file object, which is read in chunks.
+
+    >>> hash_name('css/main.css', b'body {}')
+    'css/main.fcdce6b6d6e2.css'
+    """
+    root, ext = os.path.splitext(name)
+    digest = hashlib.md5()
+    if hasattr(content, 'chunks'):
+        for chunk in content.chunks():
+            digest.update(force_bytes(chunk))
+    else:
+        digest.update(force_bytes(content))
+    return '{0}.{1}{2}'.format(root, digest.hexdigest()[:12], ext)
+
+
+class AssetManifest(object):
+    """
+    AssetManifest maps the paths of filtered files to their content-hashed
+    names, as saved in the static files storage by `collectstatic`.
+
+    The manifest is read on first use, and read again when its modification
+    time changes, if the storage supports it. The modification time is
+    checked at most once every `check_interval` seconds, so rendering
+    `{% static %}` doesn't access the storage every time.
+
+    Attributes:
+        name: The name of the manifest file in the storage. Defaults to the
+            ASSETFILES_MANIFEST_NAME setting.
+        check_interval: The minimum number of seconds between checks for a
+            changed manifest. Defaults to the
+            ASSETFILES_MANIFEST_CHECK_INTERVAL setting.
+    """
+    VERSION = 1
+
+    def __init__(self, name=None, check_interval=None):
+        self._name = name
+        self._check_interval = check_interval
+        self._paths = None
+        self._modified_time = None
+        self._checked = 0
+        self._lock = threading.Lock()
+
+    @property
+    def name(self):
+        if self._name is None:
+            return settings.MANIFEST_NAME
+        return self._name
+
+    @property
+    def check_interval(self):
+        if self._check_interval is None:
+            return settings.MANIFEST_CHECK_INTERVAL
+        return self._check_interval
+
+    def get(self, path):
+        """
+        Returns the hashed name of the given file, or `None`.
+        """
+        return self._get_paths().get(path)
+
+    def url(self, path):
+        """
+        Returns the URL of the given static file, using its hashed name if
+        ASSETFILES_HASH_NAMES is set and there is one. As with
+        CachedStaticFilesStorage, hashed names are not used in DEBUG mode.
+        """
+        if not settings.HASH_NAMES or django_settings.DEBUG:
+            return storage.staticfiles_storage.url(path)
+        hashed_name = self.get(path)
+        if hashed_name:
+            return urljoin(django_settings.STATIC_URL,
+                           filepath_to_uri(hashed_name))
+        return storage.staticfiles_storage.url(path)
+
+    def save(self, paths, target_storage=None):
+        """
+        Saves the given dict of paths to hashed names as the manifest.
+        """
+        if target_storage is None:
+            target_storage = storage.staticfiles_storage
+        content = json.dumps({'version': self.VERSION, 'paths': paths},
+                             indent=2, sort_keys=True)
+        if target_storage.exists(self.name):
+            target_storage.delete(self.name)
+        target_storage.save(self.name, ContentFile(force_bytes(content)))
+        self.clear()
+
+    def load(self, source_storage=None):
+        """
+        Returns the dict of paths to hashed names saved in the given storage,
+        or an empty dict if there is no manifest.
+        """
+        if source_storage is None:
+            source_storage = storage.staticfiles_storage
+        try:
+            if not source_storage.exists(self.name):
+                return {}
+            with source_storage.open(self.name) as manifest_file:
+                data = json.loads(manifest_file.read().decode('utf-8'))
+        except (IOError, OSError, ValueError):
+            return {}
+        if data.get('version') != self.VERSION:
+            return {}
+        return data.get('paths', {})
+
+    def clear(self):
+        with self._lock:
+            self._paths = None
+            self._modified_time = None
+            self._checked = 0
+
+    def _get_paths(self):
+        with self._lock:
+            now = time.time()
+            if (self._paths is not None and
+                    now - self._checked < self.check_interval):
+                return self._paths
+            self._checked = now
+            modified_time = self._get_modified_time()
+            if self._paths is None or modified_time != self._modified_time:
+                self._paths = self.load()
+                self._modified_time = modified_time
+            return self._paths
+
+    def _get_modified_time(self):
+        try:
+            return storage.staticfiles_storage.modified_time(self.name)
+        except (NotImplementedError, OSError, IOError):
+            return None
+
+
+"""
+The manifest used by the `{% static %}` template tag.
+"""
+manifest = AssetManifest()
@@ -0,0 +1,103 @@
+// This is a long-running CoffeeScript compiler used by CoffeeScriptFilter's
+// worker mode. It loads the CoffeeScript compiler once, then compiles the
+// files requested on stdin. Each request and each response is a single line
+// of JSON:
+//
+//   {"path": "/path/to/main.coffee", "options": {"bare": true}}
+//   {"js": "var a;\n..."} or {"error": "/path/to/main.coffee:1:5: error: ..."}
+//
+// Usage: node coffee_worker.js <coffee command or compiler module>
+
+var fs = require('fs');
+var path = require('path');
+var readline = require('readline');
+
+var PACKAGE_NAMES = ['coffee-script', 'coffeescript'];
+
+// Finds the given command within the PATH, like `which`.
+function findCommand(command) {
+  if (command.indexOf(path.sep) !== -1) {
+    return fs.existsSync(command) ? command : null;
+  }
+  var dirs = (process.env.PATH || '').split(path.delimiter);
+  for (var i = 0; i < dirs.length; i++) {
+    var candidate = path.join(dirs[i], command);
+    if (fs.existsSync(candidate)) {
+      return candidate;
+    }
+  }
+  return null;
+}
+
+// Returns the CoffeeScript package directory the given command belongs to,
+// so the worker compiles with the same version as the `coffee` command.
+function findPackage(command) {
+  var commandPath = findCommand(command);
+  if (!commandPath) {
+    return null;
+  }
+  var dir = path.dirname(fs.realpathSync(commandPath));
+  while (dir !== path.dirname(dir)) {
+    var packagePath = path.join(dir, 'package.json');
+    if (fs.existsSync(packagePath)) {
+      var name = JSON.parse(fs.readFileSync(packagePath, 'utf8')).name;
+      return PACKAGE_NAMES.indexOf(name) !== -1 ? dir : null;
+    }
+    dir = path.dirname(dir);
+  }
+  return null;
+}
+
+function loadCompiler(target) {
+  var candidates = [];
+  if (target) {
+    if (/\.js$/.test(target) || fs.existsSync(path.join(target, 'package.json'))) {
+      candidates.push(path.resolve(target));
+    } else {
+      var packageDir = findPackage(target);
+      if (packageDir) {
+        candidates.push(packageDir);
+      }
+    }
+  }
+  candidates = candidates.concat(PACKAGE_NAMES);
+
+  for (var i = 0; i < candidates.length; i++) {
+    try {
+      var compiler = require(candidates[i]);
+      return compiler.compile ? compiler : compiler.CoffeeScript;
+    } catch (e) {
+      if (e.code !== 'MODULE_NOT_FOUND') {
+        throw e;
+      }
+    }
+  }
+  throw new Error('Could not find the CoffeeScript compiler.');
+}
+
+function formatError(error, filename) {
+  if (error.location) {
+    return filename + ':' + (error.location.first_line + 1) + ':' +
+      (error.location.first_column + 1) + ': error: ' + error.message;
+  }
+  return String(error.stack || error);
+}
+
+var CoffeeScript = loadCompiler(process.argv[2]);
+
+readline.createInterface({input: process.stdin, terminal: false})
+  .on('line', function (line) {
+    var response, filename = null;
+    try {
+      var request = JSON.parse(line);
+      var options = request.options || {};
+      filename = request.path;
+      response = {js: CoffeeScript.compile(fs.readFileSync(filename, 'utf8'), {
+        filename: filename,
+        bare: !!options.bare
+      })};
+    } catch (e) {
+      response = {error: formatError(e, filename)};
+    }
+    process.stdout.write(JSON.stringify(response) + '\n');
+  });
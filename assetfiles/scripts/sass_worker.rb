@@ -0,0 +1,65 @@
+# This is a long-running Sass compiler used by SassFilter's worker mode.
+# It requires the given files (usually sass_env.rb and sass_functions.rb) and
+# Sass itself once, then compiles the files requested on stdin. Each request
+# and each response is a single line of JSON:
+#
+#   {"path": "/path/to/main.scss", "static_url": "/static/", "options": {...}}
+#   {"css": "body {\n  color: red; }\n"} or {"error": "Syntax error: ..."}
+#
+# Usage: ruby sass_worker.rb [file to require...]
+
+# Keep stdout for the protocol. Anything printed by Sass or other gems goes
+# to stderr instead.
+protocol = STDOUT.dup
+protocol.sync = true
+$stdout = $stderr
+
+require 'json'
+ARGV.each { |path| require path }
+require 'sass'
+
+default_precision = Sass::Script::Number.precision
+compass_load_paths = nil
+
+while line = STDIN.gets
+  begin
+    request = JSON.parse(line)
+    path = request['path']
+    options = request['options'] || {}
+
+    ENV['DJANGO_STATIC_URL'] = request['static_url'] if request['static_url']
+    Sass::Script::Number.precision =
+      options['precision'] ? options['precision'].to_i : default_precision
+
+    engine_options = {
+      :filename => path,
+      :syntax => path.end_with?('.sass') ? :sass : :scss,
+      :load_paths => options['load_paths'] || [],
+      :style => (options['style'] || 'nested').to_sym,
+      :line_numbers => !!options['line_numbers'],
+      :debug_info => !!options['debug_info'],
+      :quiet => !!options['quiet'],
+    }
+    engine_options[:cache_location] = options['cache_location'] if options['cache_location']
+    engine_options[:cache] = false if options['no_cache']
+
+    if options['compass']
+      if compass_load_paths.nil?
+        require 'compass'
+        Compass.add_project_configuration
+        Compass.configuration.project_path ||= Dir.pwd
+        compass_load_paths = Compass.configuration.sass_load_paths
+      end
+      engine_options[:load_paths] += compass_load_paths
+    end
+
+    css = Sass::Engine.for_file(path, engine_options).render
+    response = { 'css' => css }
+  rescue Sass::SyntaxError => e
+    response = { 'error' => e.sass_backtrace_str(path) }
+  rescue StandardError, ScriptError => e
+    response = { 'error' => "#{e.class}: #{e.message}" }
+  end
+
+  protocol.puts JSON.generate(response)
+end
@@ -12,3 +12,47 @@ SASS_OPTIONS = getattr(settings, 'ASSETFILES_SASS_OPTIONS', {})
 
 COFFEE_SCRIPT_OPTIONS = getattr(settings,
                                 'ASSETFILES_COFFEE_SCRIPT_OPTIONS', {})
+
+MEMORY_CACHE_SIZE = getattr(settings, 'ASSETFILES_MEMORY_CACHE_SIZE',
+                            32 * 1024 * 1024)
+
+CACHE_DIR = getattr(settings, 'ASSETFILES_CACHE_DIR', None)
+
+CACHE_MAX_SIZE = getattr(settings, 'ASSETFILES_CACHE_MAX_SIZE',
+                         256 * 1024 * 1024)
+
+TOOLCHAIN_CACHE = getattr(settings, 'ASSETFILES_TOOLCHAIN_CACHE', False)
+
+BUILD_MANIFEST_NAME = getattr(settings, 'ASSETFILES_BUILD_MANIFEST_NAME',
+                              'assetfiles-build.json')
+
+SPOOL_SIZE = getattr(settings, 'ASSETFILES_SPOOL_SIZE', 1024 * 1024)
+
+TEMP_FILES_MEMORY_SIZE = getattr(settings, 'ASSETFILES_TEMP_FILES_MEMORY_SIZE',
+                                 64 * 1024 * 1024)
+
+WATCH_INTERVAL = getattr(settings, 'ASSETFILES_WATCH_INTERVAL', 1)
+
+INDEX_CHECK_INTERVAL = getattr(settings, 'ASSETFILES_INDEX_CHECK_INTERVAL', 1)
+
+MISS_CACHE_SIZE = getattr(settings, 'ASSETFILES_MISS_CACHE_SIZE', 1000)
+
+MISS_CACHE_TTL = getattr(settings, 'ASSETFILES_MISS_CACHE_TTL', 5)
+
+SERVER_TIMING = getattr(settings, 'ASSETFILES_SERVER_TIMING', False)
+
+PRECOMPRESS = getattr(settings, 'ASSETFILES_PRECOMPRESS', False)
+
+PRECOMPRESS_MIN_SIZE = getattr(settings, 'ASSETFILES_PRECOMPRESS_MIN_SIZE', 256)
+
+PRECOMPRESS_EXTENSIONS = getattr(settings, 'ASSETFILES_PRECOMPRESS_EXTENSIONS', (
+    'css', 'js', 'html', 'htm', 'txt', 'json', 'xml', 'svg', 'map',
+    'ico', 'eot', 'otf', 'ttf',
+))
+
+HASH_NAMES = getattr(settings, 'ASSETFILES_HASH_NAMES', False)
+
+MANIFEST_NAME = getattr(settings, 'ASSETFILES_MANIFEST_NAME', 'assetfiles.json')
+
+MANIFEST_CHECK_INTERVAL = getattr(settings,
+                                  'ASSETFILES_MANIFEST_CHECK_INTERVAL', 60)
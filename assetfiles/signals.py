@@ -0,0 +1,38 @@
+from django.dispatch import Signal
+
+
+"""
+Sent when a command run by a filter finishes. The sender is the class of
+the filter.
+"""
+command_finished = Signal(providing_args=['command', 'duration', 'size',
+                                          'returncode'])
+
+"""
+Sent when `assetfiles.assets.find` looked up an asset. The sender is the
+class of the filter that outputs the asset, or `None` if it wasn't found.
+"""
+asset_found = Signal(providing_args=['path', 'input_path', 'duration'])
+
+"""
+Sent when `assetfiles.views.serve` returns a response, or doesn't find the
+requested file. The sender is the class of the filter that processed the
+file, or `None` for static files.
+"""
+asset_served = Signal(providing_args=['path', 'duration', 'status_code'])
+
+"""
+Sent when `collectstatic` filtered (`step` is "filter") or copied (`step` is
+"copy") a file. The sender is the class of the filter that processed the
+file, or `None` for static files.
+"""
+asset_collected = Signal(providing_args=['path', 'step', 'duration'])
+
+"""
+Sent when files may have been added to, changed in or removed from the
+static directories, so the index of static files and the cache of missing
+paths are discarded. The sender is the class that noticed the change, i.e.
+AssetWatcher or AssetIndex. `paths` is a list of the absolute paths of the
+changed files, or `None` if they are not known.
+"""
+static_files_changed = Signal(providing_args=['paths'])
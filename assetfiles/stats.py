@@ -0,0 +1,130 @@
+"""
+Counters and timings of the work assetfiles does, so slow builds and page
+loads can be broken down.
+
+    >>> from assetfiles.stats import stats
+    >>> stats.snapshot()['counters']['commands.spawned']
+    12
+
+See also `assetfiles.signals`, which are sent as each step finishes.
+"""
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:     # Windows
+    resource = None
+
+
+class Stats(object):
+    """
+    Stats is a thread-safe, process-wide collection of counters and
+    timings. Timings keep their count, total and maximum duration, so their
+    size doesn't grow with the number of measurements.
+
+    Counters:
+        commands.spawned, commands.failed, commands.bytes: Commands run by
+            filters, and the number of bytes they output.
+        workers.spawned: Compiler worker processes started.
+        find.probes: Input paths searched for by `assetfiles.assets.find`.
+        cache.memory.hits, cache.memory.misses, cache.disk.hits,
+        cache.disk.misses: Lookups of filtered content.
+
+    Timings:
+        commands, find, serve, collectstatic.filter, collectstatic.copy
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def add_timing(self, name, duration):
+        with self._lock:
+            count, total, maximum = self._timings.get(name, (0, 0.0, 0.0))
+            self._timings[name] = (count + 1, total + duration,
+                                   max(maximum, duration))
+
+    def timer(self, name):
+        """
+        Returns a context manager that adds the duration of its block to
+        the given timing. The duration is available as its `duration`
+        attribute afterwards.
+        """
+        return Timer(self, name)
+
+    def get(self, name):
+        """
+        Returns the value of the given counter.
+        """
+        return self._counters.get(name, 0)
+
+    def snapshot(self):
+        """
+        Returns a dict of the `counters`, and of the `timings` as dicts of
+        their `count`, `total` and `max` duration in seconds.
+        """
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'timings': dict(
+                    (name, {'count': count, 'total': total, 'max': maximum})
+                    for name, (count, total, maximum)
+                    in self._timings.items()),
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters = {}
+            self._timings = {}
+
+
+class Timer(object):
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+        self.start = None
+        self.duration = None
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.duration = time.time() - self.start
+        self.stats.add_timing(self.name, self.duration)
+
+
+def add_duration(timings, name, start):
+    """
+    Adds the time since the given start to the given entry of the given dict
+    of durations, unless the dict is `None`.
+    """
+    if timings is not None:
+        timings[name] = timings.get(name, 0) + time.time() - start
+
+
+def get_peak_rss():
+    """
+    Returns the peak resident set size of this process in bytes, or `None`
+    if it's not available on this platform.
+    """
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes, except on OS X.
+    if sys.platform != 'darwin':
+        peak_rss *= 1024
+    return peak_rss
+
+
+"""
+The stats shared by the filters, views and commands.
+"""
+stats = Stats()
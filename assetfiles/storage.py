@@ -1,42 +1,150 @@
+import mmap
+import os
+import shutil
+import tempfile
+
 from django.conf import settings
 from django.core.files.base import File, ContentFile
 from django.core.files.storage import Storage
-from django.utils.encoding import filepath_to_uri, force_text
+from django.utils.encoding import filepath_to_uri, force_bytes, force_text
 from django.utils import six
 
+from assetfiles import settings as assetfiles_settings
+
 
 class TempFilesStorage(Storage):
     """
-    TempFilesStorage is an in-memory storage of files and file-like strings.
+    TempFilesStorage is a temporary storage of files and file-like strings.
 
     This is used to temporarily hold processed files before they're copied
-    to a new storage during `collectstatic`
+    to a new storage during `collectstatic`. Files are kept in memory until
+    their total size reaches `max_memory`, after which files are written to
+    a temporary directory instead. Files on disk are memory-mapped when
+    they're opened.
+
+    Attributes:
+        max_memory: The number of bytes to keep in memory. Defaults to the
+            ASSETFILES_TEMP_FILES_MEMORY_SIZE setting.
     """
 
-    def __init__(self):
+    def __init__(self, max_memory=None):
+        self._max_memory = max_memory
         self.files = {}
+        self.memory_size = 0
+        self.location = None
+
+    @property
+    def max_memory(self):
+        if self._max_memory is None:
+            return assetfiles_settings.TEMP_FILES_MEMORY_SIZE
+        return self._max_memory
 
     def _open(self, name, mode='rb'):
         if not self.exists(name):
             raise IOError('No such file in TempFilesStorage: {0}'.format(name))
         file = self.files[name]
 
-        if isinstance(file, six.string_types) or isinstance(file, six.binary_type):
-            file = ContentFile(file, name)
-        elif not isinstance(file, File):
-            file = File(file)
-
-        return file
+        if isinstance(file, _SpilledFile):
+            return MappedFile(file.path, name)
+        return ContentFile(file, name)
 
     def save(self, name, content):
         name = self.get_available_name(name)
-        self.files[name] = content
+        if isinstance(content, six.string_types) or isinstance(content, six.binary_type):
+            size = len(force_bytes(content))
+        else:
+            size = _get_size(content)
+
+        if self.memory_size + size <= self.max_memory:
+            if hasattr(content, 'read'):
+                content = content.read()
+            self.files[name] = content
+            self.memory_size += size
+        else:
+            self.files[name] = self._spill(content)
 
         # Store filenames with forward slashes, even on Windows
         return force_text(name.replace('\\', '/'))
 
     def delete(self, name):
-        del self.files[name]
+        file = self.files.pop(name)
+        if isinstance(file, _SpilledFile):
+            os.remove(file.path)
+        else:
+            self.memory_size -= len(force_bytes(file))
 
     def exists(self, name):
         return name in self.files
+
+    def clear(self):
+        """
+        Deletes all files, and the temporary directory.
+        """
+        self.files.clear()
+        self.memory_size = 0
+        if self.location:
+            shutil.rmtree(self.location, ignore_errors=True)
+            self.location = None
+
+    def _spill(self, content):
+        if self.location is None:
+            self.location = tempfile.mkdtemp(prefix='assetfiles-')
+        fd, path = tempfile.mkstemp(dir=self.location)
+        with os.fdopen(fd, 'wb') as file:
+            if hasattr(content, 'read'):
+                shutil.copyfileobj(content, file)
+            else:
+                file.write(force_bytes(content))
+        return _SpilledFile(path)
+
+
+class MappedFile(File):
+    """
+    A read-only file that is memory-mapped, if possible, so reading it
+    doesn't copy it into memory first.
+    """
+
+    def __init__(self, path, name=None):
+        self._file = open(path, 'rb')
+        self._mapped = None
+        try:
+            self._mapped = mmap.mmap(self._file.fileno(), 0,
+                                     access=mmap.ACCESS_READ)
+        except (ValueError, EnvironmentError):
+            # Empty files can't be mapped.
+            pass
+        super(MappedFile, self).__init__(self._mapped or self._file, name)
+        self._size = os.path.getsize(path)
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def read(self, size=-1):
+        # Python 2's mmap requires a size.
+        if size is None or size < 0:
+            size = self._size - self.file.tell()
+        return self.file.read(size)
+
+    def close(self):
+        if self._mapped is not None:
+            self._mapped.close()
+        self._file.close()
+
+
+class _SpilledFile(object):
+    """
+    A file TempFilesStorage has written to disk.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+
+def _get_size(file):
+    if hasattr(file, 'seek') and hasattr(file, 'tell'):
+        file.seek(0, os.SEEK_END)
+        size = file.tell()
+        file.seek(0)
+        return size
+    return file.size
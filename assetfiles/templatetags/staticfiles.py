@@ -1,4 +1,39 @@
 from django import template
-from django.contrib.staticfiles.templatetags import staticfiles
+from django.contrib.staticfiles.templatetags.staticfiles import StaticFilesNode
 
-register = staticfiles.register
+from assetfiles.manifest import manifest
+
+register = template.Library()
+
+
+class AssetFilesNode(StaticFilesNode):
+
+    def url(self, context):
+        path = self.path.resolve(context)
+        return static(path)
+
+
+@register.tag('static')
+def do_static(parser, token):
+    """
+    A template tag that returns the URL to a file, using the hashed name of
+    filtered files written by `collectstatic` when ASSETFILES_HASH_NAMES is
+    set, and staticfiles' storage backend otherwise.
+
+    Usage::
+
+        {% static path [as varname] %}
+
+    Examples::
+
+        {% static "myapp/css/base.css" %}
+        {% static variable_with_path %}
+        {% static "myapp/css/base.css" as admin_base_css %}
+        {% static variable_with_path as varname %}
+
+    """
+    return AssetFilesNode.handle_token(parser, token)
+
+
+def static(path):
+    return manifest.url(path)
@@ -0,0 +1,156 @@
+"""
+Finds the commands filters run, like Sass, Compass and CoffeeScript, and
+remembers their locations and versions, so they are looked up once per
+process rather than by every filter that needs them.
+"""
+from __future__ import unicode_literals
+
+import io
+import json
+import os
+import shlex
+import threading
+
+from django.utils.encoding import force_bytes
+
+from assetfiles import cache
+import assetfiles.settings
+
+
+class Toolchain(object):
+    """
+    Toolchain is a thread-safe, process-wide registry of the executables
+    found on the PATH and the versions reported by version commands.
+
+    If ASSETFILES_TOOLCHAIN_CACHE is set, versions are persisted in
+    ASSETFILES_CACHE_DIR along with the resolved path, modification time and
+    size of the files the version command runs, so new processes don't run
+    them again until one of the files changes. This is opt-in, as wrappers
+    like Bundler binstubs stay the same when the compiler is upgraded.
+    Failed version commands are only remembered for the process.
+
+    Attributes:
+        cache_path: The file to persist the versions in. Defaults to
+            `toolchain.json` within ASSETFILES_CACHE_DIR, if
+            ASSETFILES_TOOLCHAIN_CACHE is set.
+    """
+    CACHE_VERSION = 2
+
+    def __init__(self, cache_path=None):
+        self._cache_path = cache_path
+        self._executables = {}
+        self._versions = {}
+        self._persisted = None
+        self._lock = threading.RLock()
+
+    @property
+    def cache_path(self):
+        if (self._cache_path is None and assetfiles.settings.TOOLCHAIN_CACHE
+                and assetfiles.settings.CACHE_DIR):
+            return os.path.join(assetfiles.settings.CACHE_DIR,
+                                'toolchain.json')
+        return self._cache_path
+
+    def which(self, name):
+        """
+        Returns the path of the given executable, searching the PATH unless
+        the name contains a directory, or `None` if it's not found.
+        """
+        key = (name, os.environ.get('PATH', ''))
+        with self._lock:
+            if key not in self._executables:
+                self._executables[key] = _find_executable(name, key[1])
+            return self._executables[key]
+
+    def get_version(self, command, run):
+        """
+        Returns the version reported by the given command.
+
+        Args:
+            command: The command that prints the version.
+            run: A function that runs the command and returns the version,
+                or an empty string if the command fails. It's only called
+                when the version isn't known yet.
+        """
+        with self._lock:
+            if command in self._versions:
+                return self._versions[command]
+
+            if self._persisted is None:
+                self._persisted = self._load()
+            stamp = self._get_stamp(command)
+            entry = self._persisted.get(command)
+            if entry and entry['stamp'] == stamp:
+                version = entry['version']
+            else:
+                version = run(command)
+                if version and stamp:
+                    self._persisted[command] = {'stamp': stamp,
+                                                'version': version}
+                    self._save()
+
+            self._versions[command] = version
+            return version
+
+    def clear(self):
+        with self._lock:
+            self._executables = {}
+            self._versions = {}
+            self._persisted = None
+
+    def _get_stamp(self, command):
+        """
+        Returns a list of the path, modification time and size of the
+        executable of the given command and the files it's given, like
+        scripts run by an interpreter. Symlinks are resolved, so pointing a
+        link at another installation changes the stamp.
+        """
+        try:
+            args = shlex.split(command)
+        except ValueError:
+            return []
+
+        stamp = []
+        for i, arg in enumerate(args):
+            path = self.which(arg) if i == 0 else arg
+            if not path or not os.path.isfile(path):
+                continue
+            path = os.path.realpath(path)
+            stat = os.stat(path)
+            stamp.append([path, stat.st_mtime, stat.st_size])
+        return stamp
+
+    def _save(self):
+        if not self.cache_path:
+            return
+        data = {'version': self.CACHE_VERSION, 'commands': self._persisted}
+        cache.write_atomic(self.cache_path, force_bytes(json.dumps(data)))
+
+    def _load(self):
+        if not self.cache_path:
+            return {}
+        try:
+            with io.open(self.cache_path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except (IOError, OSError, ValueError):
+            return {}
+        if data.get('version') != self.CACHE_VERSION:
+            return {}
+        return data.get('commands', {})
+
+
+toolchain = Toolchain()
+
+
+def _find_executable(name, search_path):
+    if os.path.dirname(name):
+        return name if _is_executable(name) else None
+    for dir in search_path.split(os.pathsep):
+        path = os.path.join(dir, name)
+        if dir and _is_executable(path):
+            return path
+    return None
+
+
+def _is_executable(path):
+    return os.path.isfile(path) and os.access(path, os.X_OK)
@@ -0,0 +1,34 @@
+"""
+Helpers for mapping files to the static directories of the staticfiles
+finders.
+"""
+import os
+
+from django.contrib.staticfiles import finders
+
+
+def get_static_locations():
+    """
+    Returns a list of (location, prefix) tuples for the storages of the
+    staticfiles finders.
+    """
+    locations = []
+    for finder in finders.get_finders():
+        for storage in getattr(finder, 'storages', {}).values():
+            locations.append((storage.location,
+                              getattr(storage, 'prefix', None)))
+    return locations
+
+
+def get_static_path(path):
+    """
+    Returns the path of the given file relative to the static dirs, or
+    `None` if it's not in any of them.
+    """
+    for location, prefix in get_static_locations():
+        relative_path = os.path.relpath(path, location)
+        if relative_path.startswith(os.pardir):
+            continue
+        relative_path = relative_path.replace(os.sep, '/')
+        return '/'.join((prefix, relative_path)) if prefix else relative_path
+    return None
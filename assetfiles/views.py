@@ -5,18 +5,23 @@ used during development, and SHOULD NOT be used in a production setting.
 import mimetypes
 import os
 import posixpath
+import time
+from collections import OrderedDict
+from wsgiref.util import FileWrapper
 try:
     from urllib.parse import unquote
 except ImportError:     # Python 2
     from urllib import unquote
 
 from django.conf import settings
-from django.contrib.staticfiles import finders
 from django.core.exceptions import ImproperlyConfigured
-from django.http import Http404, HttpResponse
+from django.http import (Http404, HttpResponse, HttpResponseNotModified,
+                         StreamingHttpResponse)
+from django.utils.http import http_date, parse_etags, quote_etag
 from django.views import static
 
-from assetfiles import assets
+from assetfiles import assets, cache, signals, settings as assetfiles_settings
+from assetfiles.stats import add_duration, stats
 
 
 def serve(request, path, document_root=None, insecure=False, **kwargs):
@@ -31,6 +36,11 @@ def serve(request, path, document_root=None, insecure=False, **kwargs):
     in your URLconf.
 
     It uses the django.views.static view to serve the found files.
+
+    The time until the response is returned is added to the "serve" timing
+    of `assetfiles.stats`, and `assetfiles.signals.asset_served` is sent.
+    With ASSETFILES_SERVER_TIMING, the time is also broken down in a
+    Server-Timing header, which browsers show in their network panels.
     """
     if not settings.DEBUG and not insecure:
         raise ImproperlyConfigured('The staticfiles view can only be used in '
@@ -38,17 +48,140 @@ def serve(request, path, document_root=None, insecure=False, **kwargs):
                                    "option of 'runserver' is used")
     normalized_path = posixpath.normpath(unquote(path)).lstrip('/')
 
-    static_path = finders.find(normalized_path)
+    start = time.time()
+    filter = None
+    status_code = 500
+    try:
+        response, filter = _serve(request, path, normalized_path, **kwargs)
+        status_code = response.status_code
+        return response
+    except Http404:
+        status_code = 404
+        raise
+    finally:
+        duration = time.time() - start
+        stats.add_timing('serve', duration)
+        signals.asset_served.send(sender=type(filter) if filter else None,
+                                  path=normalized_path, duration=duration,
+                                  status_code=status_code)
+
+
+def _serve(request, path, normalized_path, **kwargs):
+    """
+    Returns a tuple of the response for the given path and the filter that
+    processed the file, if any.
+    """
+    # Requests for missing files are remembered for a short while, until the
+    # static directories change, so repeated requests don't search them all.
+    # The index checks for changes first, which clears the remembered files.
+    assets.index.check()
+    if cache.miss_cache.has(normalized_path):
+        raise _not_found(path)
+
+    timings = OrderedDict() if assetfiles_settings.SERVER_TIMING else None
+    start = step_start = time.time()
+    static_path = assets.find_static(normalized_path)
+    add_duration(timings, 'static', step_start)
     if static_path:
         document_root, path = os.path.split(static_path)
-        return static.serve(request, path, document_root=document_root, **kwargs)
+        response = static.serve(request, path, document_root=document_root,
+                                **kwargs)
+        _add_server_timing(response, timings, start)
+        return response, None
 
+    step_start = time.time()
     asset_path, filter = assets.find(normalized_path)
+    add_duration(timings, 'find', step_start)
     if asset_path:
-        content = filter.filter(asset_path)
-        mimetype, encoding = mimetypes.guess_type(normalized_path)
-        return HttpResponse(content, content_type=mimetype)
+        response = serve_asset(request, normalized_path, asset_path, filter,
+                               timings)
+        _add_server_timing(response, timings, start, filter)
+        return response, filter
+
+    cache.miss_cache.add(normalized_path)
+    raise _not_found(path)
+
+
+def serve_asset(request, path, asset_path, filter, timings=None):
+    """
+    Serves the filtered content of the given asset file.
+
+    Responses carry an ETag derived from the asset's inputs and a
+    Last-Modified date of the newest of the asset and its dependencies, so
+    conditional requests for unchanged assets get a 304 response without
+    filtering the asset. HEAD requests are answered without filtering too.
+
+    Content larger than ASSETFILES_SPOOL_SIZE is streamed from the temporary
+    file it was filtered into, rather than read into memory.
+
+    Args:
+        timings: A dict the time spent checking and looking up the caches
+            ("cache") and filtering the file ("compile") is added to, in
+            seconds.
+    """
+    start = time.time()
+    stamp = cache.get_stamp(filter, asset_path)
+    etag = cache.get_etag(filter, asset_path, stamp)
+    mtime = max(entry[1] or 0 for entry in stamp)
+    add_duration(timings, 'cache', start)
+
+    if not _was_modified(request, etag, mtime):
+        response = HttpResponseNotModified()
+    else:
+        mimetype, encoding = mimetypes.guess_type(path)
+        if request.method == 'HEAD':
+            response = HttpResponse(content_type=mimetype)
+        else:
+            response = _file_response(
+                cache.filter_file(filter, asset_path, stamp=stamp,
+                                  timings=timings), mimetype)
+    response['ETag'] = quote_etag(etag)
+    response['Last-Modified'] = http_date(mtime)
+    return response
+
+
+def _add_server_timing(response, timings, start, filter=None):
+    """
+    Adds a Server-Timing header with the given durations and the total time
+    since the given start, unless `timings` is `None`. The compile step is
+    described with the name of the filter.
+    """
+    if timings is None:
+        return
+    metrics = []
+    for name, duration in timings.items():
+        metric = '{0};dur={1:.1f}'.format(name, duration * 1000)
+        if name == 'compile' and filter is not None:
+            metric += ';desc="{0}"'.format(type(filter).__name__)
+        metrics.append(metric)
+    metrics.append('total;dur={0:.1f}'.format((time.time() - start) * 1000))
+    response['Server-Timing'] = ', '.join(metrics)
+
+
+def _file_response(file, mimetype):
+    file.seek(0, os.SEEK_END)
+    size = file.tell()
+    file.seek(0)
+    if size <= assetfiles_settings.SPOOL_SIZE:
+        with file:
+            return HttpResponse(file.read(), content_type=mimetype)
+
+    response = StreamingHttpResponse(FileWrapper(file),
+                                     content_type=mimetype)
+    response['Content-Length'] = size
+    return response
+
+
+def _was_modified(request, etag, mtime):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        return '*' not in etags and etag not in etags
+    return static.was_modified_since(
+        request.META.get('HTTP_IF_MODIFIED_SINCE'), mtime)
+
 
+def _not_found(path):
     if path.endswith('/') or path == '':
-        raise Http404('Directory indexes are not allowed here.')
-    raise Http404("'%s' could not be found" % path)
+        return Http404('Directory indexes are not allowed here.')
+    return Http404("'%s' could not be found" % path)
@@ -0,0 +1,227 @@
+"""
+A background watcher that precompiles assets while the development server
+runs, so the first request after an edit doesn't wait for the compiler.
+"""
+import os
+import threading
+
+
+from assetfiles import assets, cache, filters, settings, signals, utils
+from assetfiles.exceptions import FilterError
+
+try:
+    import pyinotify
+except ImportError:
+    pyinotify = None
+
+
+class AssetWatcher(object):
+    """
+    AssetWatcher watches the static directories of the staticfiles finders
+    in a background thread. When an input file or one of its dependencies
+    changes, the affected assets are filtered into the cache used by
+    `assetfiles.views.serve`.
+
+    Changes are detected with inotify if pyinotify is installed, and by
+    comparing the modification times and sizes of the files otherwise.
+
+    Attributes:
+        interval: The number of seconds between checks for changes.
+            Defaults to the ASSETFILES_WATCH_INTERVAL setting.
+        log: A function called with a message for each precompiled asset,
+            or `None`.
+    """
+
+    def __init__(self, interval=None, log=None):
+        self._interval = interval
+        self.log = log
+        self._files = None
+        self._dependents = {}
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def interval(self):
+        if self._interval is None:
+            return settings.WATCH_INTERVAL
+        return self._interval
+
+    def start(self):
+        """
+        Starts watching in a daemon thread.
+        """
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self.run,
+                                        name='assetfiles-watcher')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def run(self):
+        if pyinotify is not None:
+            changes = self._watch_inotify()
+        else:
+            changes = self._watch_polling()
+        for paths in changes:
+            # Errors are logged rather than raised, so they don't stop the
+            # watcher for the rest of the session.
+            try:
+                self.compile(paths)
+            except Exception as e:
+                self._log_error(', '.join(paths), e)
+
+    def poll(self):
+        """
+        Returns the absolute paths of the files that were modified, added or
+        removed since the last call. The first call only records the files.
+        """
+        files = {}
+        for location, prefix in utils.get_static_locations():
+            for path in _walk(location):
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files[path] = (stat.st_mtime, stat.st_size)
+
+        previous_files, self._files = self._files, files
+        if previous_files is None:
+            return []
+        changed = [path for path, stamp in files.items()
+                   if previous_files.get(path) != stamp]
+        changed += [path for path in previous_files if path not in files]
+        return sorted(changed)
+
+    def compile(self, paths):
+        """
+        Filters the assets affected by changes to the given files into the
+        cache. `assetfiles.signals.static_files_changed` is sent first, so
+        added and removed files are found.
+
+        Args:
+            paths: A list of absolute paths to changed files.
+        Returns:
+            A list of the absolute paths of the filtered input files.
+        """
+        signals.static_files_changed.send(sender=type(self), paths=paths)
+        compiled = []
+        for path in self.get_affected_paths(paths):
+            if self._compile(path):
+                compiled.append(path)
+        return compiled
+
+    def get_affected_paths(self, paths):
+        """
+        Returns the absolute paths of the input files whose output depends
+        on any of the given files, including the given files themselves.
+        """
+        affected = []
+        for path in paths:
+            static_path = utils.get_static_path(path)
+            filter = static_path and filters.find_by_input_path(static_path)
+            candidates = []
+            if filter:
+                if filter.is_filterable(static_path):
+                    candidates.append(path)
+                candidates += filter.get_dependents(path)
+            candidates += sorted(self._dependents.get(path, ()))
+            for candidate in candidates:
+                if candidate not in affected and os.path.isfile(candidate):
+                    affected.append(candidate)
+        return affected
+
+    def _compile(self, path):
+        """
+        Filters the given input file the same way `serve` would, and records
+        its dependencies. Errors are logged rather than raised, so they don't
+        stop the watcher.
+        """
+        try:
+            output_path = self._precompile(path)
+        except FilterError:
+            # The error is shown when the asset is requested.
+            return False
+        except Exception as e:
+            self._log_error(path, e)
+            return False
+        if not output_path:
+            return False
+        if self.log:
+            self.log("Precompiled '%s'" % output_path)
+        return True
+
+    def _log_error(self, path, error):
+        if self.log:
+            self.log("Failed to precompile '%s': %s: %s" % (
+                path, type(error).__name__, error))
+
+    def _precompile(self, path):
+        """
+        Returns the output path of the asset filtered from the given input
+        file, or `None` if the view would not filter it.
+        """
+        static_path = utils.get_static_path(path)
+        filter = static_path and filters.find_by_input_path(static_path)
+        if not filter or not filter.is_filterable(static_path):
+            return None
+
+        # Only precompile assets the view would serve from this file.
+        output_path = filter.derive_output_path(static_path)
+        if assets.find_static(output_path):
+            return None
+        asset_path, asset_filter = assets.find(output_path)
+        if asset_path != path:
+            return None
+
+        for dependency in asset_filter.get_dependencies(asset_path):
+            self._dependents.setdefault(dependency, set()).add(asset_path)
+        cache.filter(asset_filter, asset_path)
+        return output_path
+
+    def _watch_polling(self):
+        self.poll()
+        while not self._stopped.wait(self.interval):
+            paths = self.poll()
+            if paths:
+                yield paths
+
+    def _watch_inotify(self):
+        changed = set()
+
+        class EventHandler(pyinotify.ProcessEvent):
+            def process_default(self, event):
+                if not event.dir:
+                    changed.add(event.pathname)
+
+        mask = (pyinotify.IN_CLOSE_WRITE | pyinotify.IN_MOVED_TO |
+                pyinotify.IN_MOVED_FROM | pyinotify.IN_DELETE)
+        manager = pyinotify.WatchManager()
+        notifier = pyinotify.Notifier(manager, EventHandler(),
+                                      timeout=int(self.interval * 1000))
+        try:
+            for location, prefix in utils.get_static_locations():
+                if os.path.isdir(location):
+                    manager.add_watch(location, mask, rec=True, auto_add=True)
+            while not self._stopped.is_set():
+                if notifier.check_events():
+                    notifier.read_events()
+                    notifier.process_events()
+                elif changed:
+                    # Events are handled once the files stop changing, so
+                    # editors saving several files cause a single batch.
+                    paths = sorted(changed)
+                    changed.clear()
+                    yield paths
+        finally:
+            notifier.stop()
+
+
+def _walk(location):
+    for dir_path, dir_names, file_names in os.walk(location):
+        for file_name in file_names:
+            yield os.path.join(dir_path, file_name)
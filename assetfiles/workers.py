@@ -0,0 +1,268 @@
+"""
+Pools of long-running compiler processes, so filters don't pay for starting
+an interpreter and loading the compiler for every file.
+
+Workers speak a line-based JSON protocol: each request is written to the
+worker's stdin as a single line of JSON, and the worker answers with a single
+line of JSON on its stdout.
+"""
+import atexit
+import collections
+import json
+import os
+import threading
+from subprocess import Popen, PIPE
+try:
+    import queue
+except ImportError:     # Python 2
+    import Queue as queue
+
+from django.utils.encoding import force_bytes, force_text
+
+from assetfiles.exceptions import FilterError
+from assetfiles.stats import stats
+
+
+class WorkerError(FilterError):
+    """
+    Raised when a worker crashes or answers with garbage.
+    """
+    pass
+
+
+class WorkerTimeoutError(WorkerError):
+    """
+    Raised when a worker doesn't answer in time.
+    """
+    pass
+
+
+class Worker(object):
+    """
+    Worker wraps a single long-running process.
+
+    Attributes:
+        args: The command to start the process with, as a list.
+        env: Extra environment variables for the process.
+        jobs: The number of requests the worker has handled.
+    """
+
+    def __init__(self, args, env=None):
+        self.args = args
+        self.env = env
+        self.jobs = 0
+        self.process = None
+        self._responses = queue.Queue()
+        self._stderr = collections.deque(maxlen=50)
+
+    def start(self):
+        env = dict(os.environ)
+        if self.env:
+            env.update(self.env)
+
+        try:
+            self.process = Popen(self.args, stdin=PIPE, stdout=PIPE,
+                                 stderr=PIPE, env=env)
+        except OSError as e:
+            raise WorkerError('Could not start {0}: {1}'.format(
+                ' '.join(self.args), e))
+        stats.incr('workers.spawned')
+        self._start_reader(self.process.stdout, self._read_responses)
+        self._start_reader(self.process.stderr, self._read_errors)
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def request(self, payload, timeout=None):
+        """
+        Sends the given payload to the worker and returns its decoded answer.
+
+        Raises:
+            WorkerError: If the worker died or didn't answer within the given
+                number of seconds. The worker must not be used afterwards.
+        """
+        line = force_bytes(json.dumps(payload)) + b'\n'
+        try:
+            self.process.stdin.write(line)
+            self.process.stdin.flush()
+        except (IOError, OSError):
+            raise WorkerError(self._crash_message('died'))
+
+        try:
+            response = self._responses.get(timeout=timeout)
+        except queue.Empty:
+            self.stop()
+            raise WorkerTimeoutError(self._crash_message(
+                'timed out after {0} seconds'.format(timeout)))
+        if response is None:
+            raise WorkerError(self._crash_message('died'))
+
+        self.jobs += 1
+        try:
+            return json.loads(force_text(response))
+        except ValueError:
+            self.stop()
+            raise WorkerError(self._crash_message(
+                'answered with invalid JSON: {0!r}'.format(response)))
+
+    def stop(self):
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+        except (IOError, OSError):
+            pass
+        if self.process.poll() is None:
+            try:
+                self.process.kill()
+            except OSError:
+                pass
+        self.process.wait()
+
+    def _start_reader(self, stream, target):
+        thread = threading.Thread(target=target, args=(stream,))
+        thread.daemon = True
+        thread.start()
+
+    def _read_responses(self, stream):
+        for line in iter(stream.readline, b''):
+            self._responses.put(line)
+        self._responses.put(None)
+
+    def _read_errors(self, stream):
+        for line in iter(stream.readline, b''):
+            self._stderr.append(force_text(line, errors='replace'))
+
+    def _crash_message(self, reason):
+        message = 'Worker {0} {1}.'.format(' '.join(self.args), reason)
+        if self._stderr:
+            message += '\n' + ''.join(self._stderr)
+        return message
+
+
+class WorkerPool(object):
+    """
+    WorkerPool hands requests to a bounded set of workers.
+
+    Workers are started lazily, up to `size` of them, and requests wait for
+    an idle worker. A worker that crashes or times out is discarded and a
+    new one takes its place. Workers are also restarted after handling
+    `max_jobs` requests, to bound the effects of any leaks in the compiler.
+
+    Attributes:
+        args: The command to start each worker with, as a list.
+        size: The maximum number of workers.
+        max_jobs: The number of requests after which a worker is restarted.
+            Set to None to never restart workers.
+        timeout: The number of seconds to wait for an answer.
+        env: Extra environment variables for the workers.
+    """
+
+    def __init__(self, args, size=1, max_jobs=None, timeout=None, env=None):
+        self.args = args
+        self.size = max(size, 1)
+        self.max_jobs = max_jobs
+        self.timeout = timeout
+        self.env = env
+        self._idle = []
+        self._count = 0
+        self._condition = threading.Condition()
+
+    def request(self, payload):
+        """
+        Sends the given payload to a worker and returns its decoded answer.
+
+        If the worker dies before answering, the request is retried once
+        with a fresh worker. Requests that time out are not retried.
+        """
+        try:
+            return self._request(payload)
+        except WorkerTimeoutError:
+            raise
+        except WorkerError:
+            return self._request(payload)
+
+    def close(self):
+        """
+        Stops all idle workers.
+        """
+        with self._condition:
+            workers, self._idle = self._idle, []
+            self._count -= len(workers)
+        for worker in workers:
+            worker.stop()
+
+    def _request(self, payload):
+        worker = self._acquire()
+        try:
+            response = worker.request(payload, timeout=self.timeout)
+        except WorkerError:
+            worker.stop()
+            self._release(None)
+            raise
+        if self.max_jobs and worker.jobs >= self.max_jobs:
+            worker.stop()
+            worker = None
+        self._release(worker)
+        return response
+
+    def _acquire(self):
+        with self._condition:
+            while True:
+                while self._idle:
+                    worker = self._idle.pop()
+                    if worker.is_alive():
+                        return worker
+                    worker.stop()
+                    self._count -= 1
+                if self._count < self.size:
+                    self._count += 1
+                    break
+                self._condition.wait()
+
+        worker = Worker(self.args, env=self.env)
+        try:
+            worker.start()
+        except WorkerError:
+            self._release(None)
+            raise
+        return worker
+
+    def _release(self, worker):
+        with self._condition:
+            if worker is None:
+                self._count -= 1
+            else:
+                self._idle.append(worker)
+            self._condition.notify()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(args, **kwargs):
+    """
+    Returns the pool of workers started with the given command, creating it
+    with the given options if it doesn't exist yet. Pools are shared by all
+    filters within the process, i.e. by the development server and
+    `collectstatic`.
+    """
+    key = tuple(args)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = WorkerPool(list(args), **kwargs)
+        return _pools[key]
+
+
+def close_pools():
+    """
+    Stops the workers of all pools.
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+atexit.register(close_pools)
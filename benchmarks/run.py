@@ -0,0 +1,456 @@
+#!/usr/bin/env python
+"""
+Benchmarks for django-assetfiles.
+
+Generates a synthetic project with several apps, Sass stylesheets importing
+trees of partials, CoffeeScript files and a large tree of plain static
+files, and measures:
+
+* dispatch: finding filters by input and output path, and deriving paths.
+* find: looking up assets with `assetfiles.assets.find`.
+* serve: the latency of `assetfiles.views.serve` for cold and warm assets,
+  plain static files and missing files.
+* collectstatic: the wall time and peak memory of a first and a second run,
+  each in its own process.
+
+The `sass` and `coffee` commands are replaced by the deterministic stubs in
+`benchmarks/stubs`, so the benchmarks run without Ruby, Node or a network,
+and measure the cost of assetfiles rather than of the compilers.
+
+Results are written as JSON, so runs can be compared:
+
+    $ python benchmarks/run.py --output before.json
+    $ python benchmarks/run.py --output after.json --compare before.json
+"""
+from __future__ import division, print_function
+
+import json
+import os
+import pipes
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from optparse import OptionParser
+
+BENCHMARKS_ROOT = os.path.abspath(os.path.dirname(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARKS_ROOT)
+STUBS_ROOT = os.path.join(BENCHMARKS_ROOT, 'stubs')
+RESULTS_VERSION = 1
+APP_PREFIX = 'bench_app_'
+
+timer = getattr(time, 'perf_counter', time.time)
+
+
+def main(argv=None):
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option('--apps', type='int', default=5,
+        help='The number of apps with static files. [default: %default]')
+    parser.add_option('--stylesheets', type='int', default=20,
+        help='The number of Sass stylesheets. [default: %default]')
+    parser.add_option('--partials', type='int', default=15,
+        help='The number of Sass partials, imported as a tree. '
+             '[default: %default]')
+    parser.add_option('--scripts', type='int', default=20,
+        help='The number of CoffeeScript files. [default: %default]')
+    parser.add_option('--static-files', type='int', default=2000,
+        help='The number of plain static files. [default: %default]')
+    parser.add_option('--repeat', type='int', default=5,
+        help='The number of times warm measurements are repeated. '
+             '[default: %default]')
+    parser.add_option('--jobs', type='int', default=1,
+        help='The --jobs option for collectstatic. [default: %default]')
+    parser.add_option('-o', '--output',
+        help='Writes the results to this file instead of stdout.')
+    parser.add_option('--compare', metavar='FILE',
+        help='Compares the results with those of an earlier run.')
+    parser.add_option('--keep', action='store_true', default=False,
+        help='Keeps the generated project.')
+    parser.add_option('--collectstatic-child', metavar='PROJECT',
+        help='Runs collectstatic in the given project and prints the '
+             'measurements. Used internally.')
+    options, args = parser.parse_args(argv)
+
+    if options.collectstatic_child:
+        configure(options.collectstatic_child)
+        print(json.dumps(measure_collectstatic_child(options.jobs)))
+        return 0
+
+    root = tempfile.mkdtemp(prefix='assetfiles-bench-')
+    try:
+        log('Generating project in %s' % root)
+        project = generate_project(root, options)
+        configure(root)
+        results = {
+            'version': RESULTS_VERSION,
+            'environment': get_environment(),
+            'config': dict((name, getattr(options, name)) for name in (
+                'apps', 'stylesheets', 'partials', 'scripts', 'static_files',
+                'repeat', 'jobs')),
+            'results': {},
+        }
+        for name, benchmark in BENCHMARKS:
+            log('Running %s' % name)
+            results['results'][name] = benchmark(root, project, options)
+    finally:
+        if options.keep:
+            log('Kept project in %s' % root)
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if options.output:
+        with open(options.output, 'w') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+
+    if options.compare:
+        with open(options.compare) as file:
+            compare(json.load(file), results)
+    return 0
+
+
+def log(message):
+    sys.stderr.write(message + '\n')
+    sys.stderr.flush()
+
+
+# Project generation
+
+def generate_project(root, options):
+    """
+    Writes the synthetic project to the given directory.
+
+    Returns:
+        A dict with lists of the `apps`, and of the output paths of the
+        `stylesheets`, `scripts` and plain `static_files`.
+    """
+    apps = ['%s%s' % (APP_PREFIX, i) for i in range(options.apps)]
+    locations = [os.path.join(root, 'static')]
+    for app in apps:
+        write(os.path.join(root, app, '__init__.py'), '')
+        locations.append(os.path.join(root, app, 'static'))
+
+    # Partials form a binary tree, each importing its two children.
+    for i in range(options.partials):
+        imports = ''.join('@import "p%s";\n' % child
+                          for child in (2 * i + 1, 2 * i + 2)
+                          if child < options.partials)
+        write(os.path.join(root, 'static', 'css', 'partials', '_p%s.scss' % i),
+              '%s$color-%s: #%06x;\n.partial-%s { color: $color-%s; }\n' % (
+                  imports, i, i * 4099 % 0xffffff, i, i))
+
+    # Stylesheets are spread over the project and the apps, and import
+    # one of the top partials through the Sass load paths.
+    stylesheets = []
+    for i in range(options.stylesheets):
+        location = locations[i % len(locations)]
+        imports = ('@import "partials/p%s";\n' % (i % min(3, options.partials))
+                   if options.partials else '')
+        write(os.path.join(location, 'css', 'style%s.scss' % i),
+              '%s.style-%s {\n  margin: %spx;\n}\n' % (imports, i, i))
+        stylesheets.append('css/style%s.css' % i)
+
+    scripts = []
+    for i in range(options.scripts):
+        location = locations[i % len(locations)]
+        write(os.path.join(location, 'js', 'script%s.coffee' % i),
+              ''.join('value%s = (x) -> x * %s\n' % (j, i) for j in range(20)))
+        scripts.append('js/script%s.js' % i)
+
+    static_files = []
+    for i in range(options.static_files):
+        location = locations[i % len(locations)]
+        path = 'img/%s/%s/file%s.png' % (i // 1000, i // 100 % 10, i)
+        write(os.path.join(location, path), ('%08d' % i) * 128)
+        static_files.append(path)
+
+    return {
+        'apps': apps,
+        'stylesheets': stylesheets,
+        'scripts': scripts,
+        'static_files': static_files,
+    }
+
+
+def write(path, content):
+    dirname = os.path.dirname(path)
+    if not os.path.isdir(dirname):
+        os.makedirs(dirname)
+    with open(path, 'w') as file:
+        file.write(content)
+
+
+def configure(root):
+    """
+    Configures Django for the project in the given directory, with the
+    stubs as the Sass and CoffeeScript commands.
+    """
+    sys.path.insert(0, REPO_ROOT)
+    sys.path.insert(0, root)
+    apps = sorted(name for name in os.listdir(root)
+                  if name.startswith(APP_PREFIX))
+
+    from django.conf import settings
+    settings.configure(
+        DEBUG=True,
+        SECRET_KEY='benchmarks',
+        INSTALLED_APPS=['assetfiles'] + apps,
+        STATIC_URL='/static/',
+        STATIC_ROOT=os.path.join(root, 'public'),
+        STATICFILES_DIRS=[os.path.join(root, 'static')],
+        ASSETFILES_SASS_OPTIONS={
+            'sass_path': stub_command('sass'),
+            'compass': False,
+        },
+        ASSETFILES_COFFEE_SCRIPT_OPTIONS={
+            'coffee_path': stub_command('coffee'),
+        },
+        ASSETFILES_CACHE_DIR=None,
+    )
+
+
+def stub_command(name):
+    return '%s %s' % (pipes.quote(sys.executable),
+                      pipes.quote(os.path.join(STUBS_ROOT, name + '.py')))
+
+
+def get_environment():
+    import django
+    import assetfiles
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'django': django.get_version(),
+        'assetfiles': assetfiles.__version__,
+    }
+
+
+# Benchmarks
+
+def bench_dispatch(root, project, options):
+    from assetfiles import filters
+
+    input_paths = list_static_paths()
+    output_paths = project['stylesheets'] + project['scripts']
+    filtered_paths = [path for path in input_paths
+                      if filters.find_by_input_path(path)]
+
+    def find_inputs():
+        for path in input_paths:
+            filters.find_by_input_path(path)
+
+    def find_outputs():
+        for path in output_paths + project['static_files']:
+            filters.find_by_output_path(path)
+
+    def derive_paths():
+        for path in filtered_paths:
+            filter = filters.find_by_input_path(path)
+            filter.derive_input_paths(filter.derive_output_path(path))
+
+    return {
+        'find_by_input_path': time_per_call(
+            find_inputs, len(input_paths), options.repeat),
+        'find_by_output_path': time_per_call(
+            find_outputs, len(output_paths) + len(project['static_files']),
+            options.repeat),
+        'derive_paths': time_per_call(
+            derive_paths, len(filtered_paths), options.repeat),
+    }
+
+
+def bench_find(root, project, options):
+    from assetfiles import assets
+
+    paths = project['stylesheets'] + project['scripts']
+    missing_paths = ['missing/file%s.css' % i for i in range(len(paths))]
+
+    def find_all():
+        for path in paths + missing_paths:
+            assets.find(path)
+
+    assets.index.clear()
+    cold = time_once(find_all)
+    return {
+        'cold_ms': cold * 1000,
+        'warm': time_per_call(find_all, len(paths) + len(missing_paths),
+                              options.repeat),
+    }
+
+
+def bench_serve(root, project, options):
+    from django.http import Http404
+    from django.test.client import RequestFactory
+    from assetfiles import cache, views
+
+    factory = RequestFactory()
+
+    def serve(path):
+        request = factory.get('/static/' + path)
+        start = timer()
+        try:
+            response = views.serve(request, path, insecure=True)
+        except Http404:
+            return timer() - start
+        if getattr(response, 'streaming', False):
+            b''.join(response.streaming_content)
+        else:
+            response.content
+        return timer() - start
+
+    assets = project['stylesheets'] + project['scripts']
+    # Each asset is filtered on its first request.
+    cache.memory_cache.clear()
+    cold = [serve(path) for path in assets]
+
+    warm = []
+    for i in range(options.repeat):
+        warm += [serve(path) for path in assets]
+
+    static_files = project['static_files'][:200]
+    static = []
+    for i in range(options.repeat):
+        static += [serve(path) for path in static_files]
+
+    missing = []
+    for i in range(options.repeat):
+        missing += [serve('missing/file%s.css' % j) for j in range(20)]
+
+    return {
+        'cold': summarize(cold),
+        'warm': summarize(warm),
+        'static': summarize(static),
+        'missing': summarize(missing),
+    }
+
+
+def bench_collectstatic(root, project, options):
+    results = {}
+    for run in ('cold', 'warm'):
+        output = subprocess.check_output([
+            sys.executable, os.path.abspath(__file__),
+            '--collectstatic-child', root, '--jobs', str(options.jobs)])
+        results[run] = json.loads(output.decode('utf-8'))
+    return results
+
+
+def measure_collectstatic_child(jobs):
+    from django.core.management import call_command
+
+    baseline_rss = get_peak_rss(resource.RUSAGE_SELF)
+    devnull = open(os.devnull, 'w')
+    start = timer()
+    with devnull:
+        call_command('collectstatic', interactive=False, verbosity=0,
+                     jobs=jobs, stdout=devnull)
+    return {
+        'wall_time_s': timer() - start,
+        'baseline_rss_bytes': baseline_rss,
+        'peak_rss_bytes': get_peak_rss(resource.RUSAGE_SELF),
+        'peak_child_rss_bytes': get_peak_rss(resource.RUSAGE_CHILDREN),
+    }
+
+
+BENCHMARKS = (
+    ('dispatch', bench_dispatch),
+    ('find', bench_find),
+    ('serve', bench_serve),
+    ('collectstatic', bench_collectstatic),
+)
+
+
+# Helpers
+
+def list_static_paths():
+    """
+    Returns the paths of all static files the finders list, relative to
+    the static dirs.
+    """
+    from django.contrib.staticfiles import finders
+
+    paths = []
+    for finder in finders.get_finders():
+        for path, storage in finder.list(['CVS', '.*', '*~']):
+            prefix = getattr(storage, 'prefix', None)
+            paths.append(os.path.join(prefix, path) if prefix else path)
+    return paths
+
+
+def time_once(function):
+    start = timer()
+    function()
+    return timer() - start
+
+
+def time_per_call(function, calls, repeat):
+    """
+    Runs the given function, which makes the given number of calls,
+    repeatedly and returns the best time per call in microseconds.
+    """
+    best = min(time_once(function) for i in range(max(repeat, 1)))
+    return {
+        'calls': calls,
+        'best_us_per_call': best / max(calls, 1) * 1e6,
+    }
+
+
+def summarize(durations):
+    """
+    Returns statistics of the given durations in seconds, in milliseconds.
+    """
+    if not durations:
+        return {'count': 0}
+    durations = sorted(durations)
+    count = len(durations)
+    return {
+        'count': count,
+        'mean_ms': sum(durations) / count * 1000,
+        'median_ms': durations[count // 2] * 1000,
+        'p95_ms': durations[min(int(count * 0.95), count - 1)] * 1000,
+        'max_ms': durations[-1] * 1000,
+    }
+
+
+def get_peak_rss(who):
+    """
+    Returns the peak resident set size in bytes. `ru_maxrss` is given in
+    kilobytes on Linux and in bytes on OS X.
+    """
+    peak_rss = resource.getrusage(who).ru_maxrss
+    if sys.platform != 'darwin':
+        peak_rss *= 1024
+    return peak_rss
+
+
+def flatten(results, prefix=''):
+    """
+    Returns a dict of the dotted paths of the numbers in the given results
+    to the numbers.
+    """
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, prefix + key + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[prefix + key] = value
+    return flat
+
+
+def compare(old, new):
+    old_values = flatten(old['results'])
+    new_values = flatten(new['results'])
+    log('%-45s %14s %14s %9s' % ('metric', 'before', 'after', 'change'))
+    for key in sorted(set(old_values) & set(new_values)):
+        before, after = old_values[key], new_values[key]
+        change = (after - before) / before * 100 if before else 0
+        log('%-45s %14.3f %14.3f %+8.1f%%' % (key, before, after, change))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,27 @@
+"""
+A stand-in for the `coffee` command, so the benchmarks run without Node.
+
+It wraps each line of the input in a statement the way `coffee --print
+--compile` wraps a file, which is deterministic for the same input file.
+"""
+import sys
+
+
+def main(args):
+    if '--version' in args:
+        sys.stdout.write('CoffeeScript version 1.6.3 (benchmark stub)\n')
+        return 0
+
+    path = [arg for arg in args if not arg.startswith('-')][-1]
+    with open(path) as file:
+        lines = file.read().splitlines()
+
+    output = ['(function() {']
+    output += ['  %s;' % line.strip() for line in lines if line.strip()]
+    output.append('}).call(this);')
+    sys.stdout.write('\n'.join(output) + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,77 @@
+"""
+A stand-in for the `sass` command, so the benchmarks run without Ruby.
+
+It inlines `@import`s the way Sass resolves them, replaces variables with
+their values and writes the result, which is deterministic for the same
+input files.
+"""
+import os
+import re
+import sys
+
+IMPORT_RE = re.compile(r'''^\s*@import\s+["']([^"']+)["']\s*;\s*$''', re.M)
+DECLARATION_RE = re.compile(r'^\s*(\$[\w-]+)\s*:\s*([^;]*);\s*$', re.M)
+VARIABLE_RE = re.compile(r'\$[\w-]+')
+
+
+def resolve(name, dirs):
+    directory, base_name = os.path.split(name)
+    for dir in dirs:
+        for file_name in ('_' + base_name + '.scss', base_name + '.scss'):
+            path = os.path.join(dir, directory, file_name)
+            if os.path.isfile(path):
+                return path
+    raise IOError('File to import not found or unreadable: ' + name)
+
+
+def compile(path, load_paths, seen):
+    with open(path) as file:
+        source = file.read()
+
+    def inline(match):
+        import_path = resolve(match.group(1),
+                              [os.path.dirname(path)] + load_paths)
+        if import_path in seen:
+            return ''
+        seen.add(import_path)
+        return compile(import_path, load_paths, seen)
+
+    return IMPORT_RE.sub(inline, source)
+
+
+def replace_variables(source):
+    variables = dict(DECLARATION_RE.findall(source))
+    source = DECLARATION_RE.sub('', source)
+    return VARIABLE_RE.sub(
+        lambda match: variables.get(match.group(), match.group()), source)
+
+
+def main(args):
+    if '--version' in args:
+        sys.stdout.write('Sass 3.2.19 (benchmark stub)\n')
+        return 0
+
+    load_paths = []
+    path = None
+    args = iter(args)
+    for arg in args:
+        if arg == '--load-path':
+            load_paths.append(next(args))
+        elif arg in ('--require', '--style', '--precision',
+                     '--cache-location'):
+            next(args)
+        elif not arg.startswith('-'):
+            path = arg
+
+    try:
+        output = replace_variables(compile(path, load_paths, set()))
+    except IOError as e:
+        sys.stderr.write('Syntax error: %s\n' % e)
+        return 1
+    sys.stdout.write('\n'.join(line for line in output.splitlines()
+                               if line.strip()) + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
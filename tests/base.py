@@ -9,7 +9,10 @@ from django.test import TestCase
 from django.utils import six
 from django.utils.functional import empty
 
-from assetfiles import assets, filters
+from assetfiles import assets, cache, filters
+from assetfiles.manifest import manifest
+from assetfiles.filters.sass_imports import import_graph
+from assetfiles.toolchain import toolchain
 import assetfiles.settings
 
 
@@ -30,6 +33,14 @@ def is_glob2_available():
         return False
 
 
+def is_libsass_available():
+    try:
+        import sass
+        return hasattr(sass, 'compile')
+    except ImportError:
+        return False
+
+
 class AssetfilesTestCase(TestCase):
 
     def setUp(self):
@@ -42,7 +53,18 @@ class AssetfilesTestCase(TestCase):
         finders._finders.clear()
         # Clear the cached assetfile filters, so they are reinitialized every
         # run and pick up changes in settings.ASSETFILES_FILTERS.
-        filters._filters.clear()
+        filters.registry.clear()
+        # Clear the cached filtered content, so assets are filtered again
+        # for every test.
+        cache.memory_cache.clear()
+        cache.miss_cache.clear()
+        import_graph.clear()
+        # Clear the detected commands and versions, as tests change them.
+        toolchain.clear()
+        # Clear the index of static files, as the filters and finders change.
+        assets.index.clear()
+        # Clear the loaded manifest of hashed names, as STATIC_ROOT changes.
+        manifest.clear()
 
         if not os.path.exists(settings.PROJECT_ROOT):
             shutil.copytree(
@@ -47,5 +47,12 @@ TEMPLATE_DIRS = (
     path.join(PROJECT_ROOT, 'templates'),
 )
 
+# Files are added and removed between lookups, so the static directories
+# are checked for changes on every lookup.
+ASSETFILES_INDEX_CHECK_INTERVAL = 0
+
+# Manifests are rewritten within tests, so they are checked on every use.
+ASSETFILES_MANIFEST_CHECK_INTERVAL = 0
+
 SECRET_KEY = 'ev2pj15ucf^d84l216^@-mv)pl4$^@9g4)9_)7xi@0j0xop94f'
 DEFAULT_CHARSET = 'utf-8'
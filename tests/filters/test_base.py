@@ -16,6 +16,17 @@ class Filter2(ExtensionMixin, BaseFilter):
     output_ext = 'out2'
 
 
+class PrefixFilter(ExtensionMixin, BaseFilter):
+    input_ext = 'in'
+    output_ext = 'out'
+
+    def matches_input(self, input_path):
+        return input_path.startswith('js/')
+
+    def matches_output(self, output_path):
+        return output_path.startswith('js/')
+
+
 class TestFilters(AssetfilesTestCase):
 
     def setUp(self):
@@ -40,6 +51,23 @@ class TestFilters(AssetfilesTestCase):
         assert_is_instance(filters.find_by_output_path('main.out2'), Filter2)
         assert_equal(None, filters.find_by_output_path('main.in'))
 
+    def test_classify(self):
+        classified = filters.classify(['main.in', 'main.in2', 'main.out'])
+        assert_is_instance(classified['main.in'], Filter1)
+        assert_is_instance(classified['main.in2'], Filter2)
+        assert_equal(None, classified['main.out'])
+
+    def test_finds_filters_that_match_any_path(self):
+        settings.FILTERS = (
+            'tests.filters.test_base.PrefixFilter',
+            'tests.filters.test_base.Filter1',
+        )
+        assert_is_instance(filters.find_by_input_path('js/main.in'),
+                           PrefixFilter)
+        assert_is_instance(filters.find_by_input_path('css/main.in'), Filter1)
+        assert_is_instance(filters.find_by_output_path('js/main.out'),
+                           PrefixFilter)
+
 
 class ReplaceFilter(BaseFilter):
 
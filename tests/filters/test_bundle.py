@@ -0,0 +1,107 @@
+from __future__ import unicode_literals
+
+from django.core.exceptions import ImproperlyConfigured
+from django_nose.tools import *
+
+from assetfiles import cache, filters, settings
+from assetfiles.exceptions import FilterError
+from assetfiles.filters.bundle import BundleFilter
+
+from tests.base import AssetfilesTestCase, filter
+
+
+class TestBundleFilter(AssetfilesTestCase):
+
+    def setUp(self):
+        super(TestBundleFilter, self).setUp()
+        self.old_filters = settings.FILTERS
+        settings.FILTERS = (
+            'assetfiles.filters.coffee.CoffeeScriptFilter',
+            ('assetfiles.filters.bundle.BundleFilter', {
+                'output_path': 'js/list.js',
+                'input_paths': ('js/b.js', 'js/a.js'),
+            }),
+            ('assetfiles.filters.bundle.BundleFilter', {
+                'output_path': 'js/glob.js',
+                'input_paths': 'js/*.js',
+            }),
+            ('assetfiles.filters.bundle.BundleFilter', {
+                'output_path': 'js/compiled.js',
+                'input_paths': ('js/a.js', 'js/c.coffee', 'js/d.js'),
+                'separator': ';\n',
+            }),
+        )
+
+    def tearDown(self):
+        super(TestBundleFilter, self).tearDown()
+        settings.FILTERS = self.old_filters
+
+    def mk_files(self):
+        self.mkfile('static/js/a.js', 'var a;')
+        self.mkfile('app-1/static/js/b.js', 'var b;')
+        self.mkfile('static/js/c.coffee', 'c = 1')
+        self.mkfile('static/js/d.coffee', 'd = 1')
+
+    def test_requires_an_output_path(self):
+        with assert_raises(ImproperlyConfigured):
+            BundleFilter(input_paths='js/*.js')
+
+    def test_requires_input_paths(self):
+        with assert_raises(ImproperlyConfigured):
+            BundleFilter(output_path='js/all.js')
+
+    def test_bundles_listed_files_in_order(self):
+        self.mk_files()
+        assert_equal(b'var b;\nvar a;', filter('js/list.js'))
+
+    def test_bundles_glob_in_order_of_paths(self):
+        self.mk_files()
+        assert_equal(b'var a;\nvar b;', filter('js/glob.js'))
+
+    def test_filters_members_with_their_filters(self):
+        self.mk_files()
+        content = filter('js/compiled.js')
+        assert_true(content.startswith(b'var a;;\n'))
+        assert_in(b'c = 1;', content)
+        assert_in(b'd = 1;', content)
+
+    def test_raises_error_for_missing_members(self):
+        self.mkfile('static/js/a.js', 'var a;')
+        with assert_raises(FilterError):
+            filter('js/list.js')
+
+    def test_builds_bundle_again_when_a_member_changes(self):
+        self.mk_files()
+        bundle = BundleFilter(input_paths=('js/a.js', 'js/c.coffee'),
+                              output_path='js/all.js')
+        path = self.mkfile('static/js/a.js', 'var a;')
+        assert_in(b'c = 1;', cache.filter(bundle, path))
+        self.mkfile('static/js/c.coffee', 'c = 2')
+        assert_in(b'c = 2;', cache.filter(bundle, path))
+
+    def test_filters_members_without_memory_cache(self):
+        self.mk_files()
+        bundle = BundleFilter(input_paths=('js/a.js', 'js/c.coffee'),
+                              output_path='js/all.js')
+        path = self.mkfile('static/js/a.js', 'var a;')
+        cache.filter(bundle, path, memory=False)
+        member = self.mkfile('static/js/c.coffee', 'c = 1')
+        member_filter = filters.find_by_input_path('js/c.coffee')
+        assert_equal(None, cache.memory_cache.get(
+            (member_filter.get_fingerprint(), member)))
+
+    def test_versions_only_filters_of_members(self):
+        self.mk_files()
+        bundle = BundleFilter(input_paths=('js/a.js', 'js/b.js'),
+                              output_path='js/all.js')
+        assert_equal([], bundle._get_member_filters())
+        bundle = BundleFilter(input_paths=('js/a.js', 'js/c.coffee'),
+                              output_path='js/all.js')
+        member_filters = bundle._get_member_filters()
+        assert_equal(['CoffeeScriptFilter'],
+                     [type(filter).__name__ for filter in member_filters])
+
+    def test_serves_bundles(self):
+        self.mk_files()
+        response = self.client.get('/static/js/list.js')
+        assert_contains(response, 'var b;\nvar a;')
@@ -31,3 +31,22 @@ class TestCoffeeScriptFilter(AssetfilesTestCase):
         with assert_raises(CoffeeScriptFilterError):
             self.mkfile('static/js/simple.coffee', '\n\n\n\na = foo: "1#{2}3')
             filter('js/simple.js')
+
+
+class TestCoffeeScriptFilterWithWorkers(TestCoffeeScriptFilter):
+
+    def setUp(self):
+        super(TestCoffeeScriptFilterWithWorkers, self).setUp()
+        settings.COFFEE_SCRIPT_OPTIONS = dict(self.original_coffee_options,
+                                              workers=1)
+
+    def test_uses_coffee_script_options(self):
+        settings.COFFEE_SCRIPT_OPTIONS = {'bare': True, 'workers': 1}
+        self.mkfile('static/js/simple.coffee', 'a = foo: "1#{2}3"')
+        assert_not_in(b'(function() {', filter('js/simple.js'))
+
+    def test_reports_syntax_error_location(self):
+        with assert_raises(CoffeeScriptFilterError) as context:
+            self.mkfile('static/js/simple.coffee', '\n\n\n\na = foo: "1#{2}3')
+            filter('js/simple.js')
+        assert_in('simple.coffee:5:', str(context.exception))
@@ -0,0 +1,106 @@
+from __future__ import unicode_literals
+
+from nose.tools import *
+
+from assetfiles import assets, settings
+from assetfiles.filters.minify import CSSMinFilter, minify_css, minify_js
+
+from tests.base import AssetfilesTestCase, filter
+
+
+class TestCSSMinFilter(AssetfilesTestCase):
+
+    def setUp(self):
+        super(TestCSSMinFilter, self).setUp()
+        self.old_filters = settings.FILTERS
+        settings.FILTERS = (
+            ['assetfiles.filters.sass.SassFilter',
+             'assetfiles.filters.minify.CSSMinFilter'],
+            'assetfiles.filters.minify.CSSMinFilter',
+        )
+
+    def tearDown(self):
+        super(TestCSSMinFilter, self).tearDown()
+        settings.FILTERS = self.old_filters
+
+    def test_removes_whitespace_and_comments(self):
+        assert_equal('a>b,c:hover{color:red;margin:0 auto}',
+                     minify_css('/* c */\na > b ,\nc:hover {\n'
+                                '  color: red;\n  margin: 0  auto;\n}\n'))
+
+    def test_keeps_strings_and_urls(self):
+        assert_equal('a{content:"  a ; } ";background:url(a  b.png)}',
+                     minify_css('a { content: "  a ; } "; '
+                                'background: url(a  b.png); }'))
+
+    def test_keeps_significant_whitespace(self):
+        assert_equal('div :hover{width:calc(1px + 2px)}'
+                     '@media screen and (max-width:10px){a{b:c}}',
+                     minify_css('div :hover { width: calc(1px + 2px); }\n'
+                                '@media screen and (max-width: 10px) {\n'
+                                '  a { b: c; }\n}'))
+
+    def test_keeps_important_comments(self):
+        assert_equal('/*! License */ a{b:c}',
+                     minify_css('/*! License */\na { b: c }'))
+
+    def test_outputs_the_input_path(self):
+        assert_equal('css/main.css',
+                     CSSMinFilter().derive_output_path('css/main.css'))
+
+    def test_minifies_plain_css_files(self):
+        self.mkfile('static/css/plain.css', 'a {\n  color: blue;\n}\n')
+        asset_path, asset_filter = assets.find('css/plain.css')
+        assert_is_instance(asset_filter, CSSMinFilter)
+        assert_equal(b'a{color:blue}', asset_filter.filter(asset_path))
+
+    def test_minifies_files_in_other_encodings(self):
+        path = self.mkfile('static/css/vendor.css')
+        with open(path, 'wb') as file:
+            file.write('a {\n  content: "\xe9";\n}\n'.encode('latin-1'))
+        assert_equal('a{content:"\xe9"}'.encode('latin-1'),
+                     CSSMinFilter().filter(path))
+
+    def test_minifies_output_of_pipelines(self):
+        self.mkfile('static/css/main.scss', '$c: red; body { color: $c; }')
+        assert_equal(b'body{color:red}', filter('css/main.css'))
+
+
+class TestJSMinFilter(AssetfilesTestCase):
+
+    def setUp(self):
+        super(TestJSMinFilter, self).setUp()
+        self.old_filters = settings.FILTERS
+        settings.FILTERS = (
+            ['assetfiles.filters.coffee.CoffeeScriptFilter',
+             'assetfiles.filters.minify.JSMinFilter'],
+        )
+
+    def tearDown(self):
+        super(TestJSMinFilter, self).tearDown()
+        settings.FILTERS = self.old_filters
+
+    def test_removes_whitespace_and_comments(self):
+        assert_equal('var a=1,b=a/2;function f(x){return x}',
+                     minify_js('/* c */\nvar a = 1 , b = a / 2;  // two\n'
+                               'function f ( x ) {\n  return x\n}\n'))
+
+    def test_keeps_strings_regexes_and_templates(self):
+        assert_equal('a="x // y",b=/[/]+\\/ "/g,c=`${ {d: 1}.d }  `',
+                     minify_js('a = "x // y", b = /[/]+\\/ "/g, '
+                               'c = `${ {d: 1}.d }  `'))
+
+    def test_keeps_line_breaks_ending_statements(self):
+        assert_equal('return\nx\na=b\n(c)',
+                     minify_js('return\n  x\na = b\n\n(c)'))
+
+    def test_keeps_whitespace_between_operators(self):
+        assert_equal('a=b+ +c;a++ +b;d=1 .toString()',
+                     minify_js('a = b + +c; a++ + b; d = 1 .toString()'))
+
+    def test_minifies_output_of_pipelines(self):
+        self.mkfile('static/js/main.coffee', 'a = 1')
+        content = filter('js/main.js')
+        assert_in(b'a=1;', content)
+        assert_not_in(b'\n\n', content)
+
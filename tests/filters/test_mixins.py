@@ -2,7 +2,11 @@ import unittest
 
 from nose.tools import *
 
-from assetfiles.filters import BaseFilter, MultiInputMixin, ExtensionMixin
+from assetfiles import signals
+from assetfiles.exceptions import FilterError
+from assetfiles.stats import stats
+from assetfiles.filters import (BaseFilter, CommandMixin, ExtensionMixin,
+                                MultiInputMixin)
 
 from tests.base import is_glob2_available, AssetfilesTestCase
 
@@ -11,6 +15,45 @@ class MultiInputFilter(MultiInputMixin, BaseFilter):
     pass
 
 
+class CommandFilter(CommandMixin, BaseFilter):
+    pass
+
+
+class TestCommandMixin(object):
+
+    def test_runs_command(self):
+        filter = CommandFilter()
+        assert_equal(b'hello\n', filter.run_command('echo hello'))
+
+    def test_streams_command_output_in_chunks(self):
+        filter = CommandFilter()
+        chunks = list(filter.stream_command('printf 0123456789',
+                                            chunk_size=4))
+        assert_equal([b'0123', b'4567', b'89'], chunks)
+
+    def test_raises_error_output_of_failed_command(self):
+        filter = CommandFilter()
+        with assert_raises(FilterError) as context:
+            list(filter.stream_command('echo out; echo err >&2; exit 1'))
+        assert_in(b'err', context.exception.args[0])
+
+    def test_records_commands(self):
+        finished = []
+        receiver = lambda sender, **kwargs: finished.append((sender, kwargs))
+        signals.command_finished.connect(receiver)
+        try:
+            spawned = stats.get('commands.spawned')
+            CommandFilter().run_command('printf hello')
+        finally:
+            signals.command_finished.disconnect(receiver)
+        assert_equal(spawned + 1, stats.get('commands.spawned'))
+        sender, kwargs = finished[0]
+        assert_is(CommandFilter, sender)
+        assert_equal('printf hello', kwargs['command'])
+        assert_equal(5, kwargs['size'])
+        assert_equal(0, kwargs['returncode'])
+
+
 class TestMultiInputMixin(AssetfilesTestCase):
 
     def mk_project_files(self):
@@ -189,3 +232,33 @@ class TessExtensionMixin(AssetfilesTestCase):
         filter = ExtensionFilter(output_path='dir/main.out')
         assert_equal(filter.derive_output_path('main.in'), 'dir/main.out')
         assert_equal(filter.derive_output_path('dir/main.in'), 'dir/main.out')
+
+
+
+class TestExtensionMixinPaths(object):
+
+    def test_derives_input_paths(self):
+        filter = ExtensionFilter()
+        assert_equal(['dir/main.bar.foo', 'dir/main.foo',
+                      'dir/main.bar.baz', 'dir/main.baz'],
+                     filter.derive_input_paths('dir/main.bar'))
+
+    def test_derives_output_path(self):
+        filter = ExtensionFilter()
+        assert_equal('dir/main.bar', filter.derive_output_path('dir/main.foo'))
+        assert_equal('dir/main.bar',
+                     filter.derive_output_path('dir/main.bar.foo'))
+
+    def test_matches_changed_extensions(self):
+        filter = ExtensionFilter()
+        assert_true(filter.matches_input('main.foo'))
+        filter.input_ext = 'other'
+        assert_false(filter.matches_input('main.foo'))
+        assert_true(filter.matches_input('main.other'))
+
+    def test_returns_exts_for_the_filter_registry(self):
+        filter = ExtensionFilter()
+        assert_equal(('foo', 'baz'), filter.get_input_exts())
+        assert_equal(('bar',), filter.get_output_exts())
+        filter = ExtensionFilter(input_path='main.x')
+        assert_equal(None, filter.get_input_exts())
@@ -0,0 +1,104 @@
+from __future__ import unicode_literals
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+from nose.tools import *
+
+from assetfiles import cache, filters, settings
+from assetfiles.filters import BaseFilter, ExtensionMixin, PipelineFilter
+
+from tests.base import AssetfilesTestCase, filter
+
+
+class UpperFilter(ExtensionMixin, BaseFilter):
+    input_ext = 'in'
+    output_ext = 'mid'
+    count = 0
+
+    def filter(self, input_path):
+        UpperFilter.count += 1
+        with open(input_path, 'rb') as file:
+            return file.read().upper()
+
+
+class SuffixFilter(ExtensionMixin, BaseFilter):
+    input_ext = 'mid'
+    output_ext = 'out'
+
+    def __init__(self, suffix='!', *args, **kwargs):
+        super(SuffixFilter, self).__init__(*args, **kwargs)
+        self.options = {'suffix': suffix}
+
+    def filter_content(self, content, input_path):
+        return content + self.options['suffix'].encode('utf-8')
+
+
+class NameFilter(ExtensionMixin, BaseFilter):
+    input_ext = 'mid'
+    output_ext = 'out'
+
+    def filter_content(self, content, input_path):
+        return content + os.path.basename(input_path).encode('utf-8')
+
+
+class TestPipelineFilter(AssetfilesTestCase):
+
+    def setUp(self):
+        super(TestPipelineFilter, self).setUp()
+        self.old_filters = settings.FILTERS
+        settings.FILTERS = (
+            ['tests.filters.test_pipeline.UpperFilter',
+             'tests.filters.test_pipeline.SuffixFilter'],
+        )
+        UpperFilter.count = 0
+
+    def tearDown(self):
+        super(TestPipelineFilter, self).tearDown()
+        settings.FILTERS = self.old_filters
+
+    def test_builds_pipelines_from_lists(self):
+        pipeline = filters.find_by_input_path('main.in')
+        assert_is_instance(pipeline, PipelineFilter)
+        assert_is_instance(pipeline.filters[0], UpperFilter)
+        assert_is_instance(pipeline.filters[1], SuffixFilter)
+
+    def test_requires_later_filters_to_filter_content(self):
+        with assert_raises(ImproperlyConfigured):
+            PipelineFilter([SuffixFilter(), UpperFilter()])
+
+    def test_derives_paths_through_all_filters(self):
+        pipeline = PipelineFilter([UpperFilter(), SuffixFilter()])
+        assert_equal('dir/main.out', pipeline.derive_output_path('dir/main.in'))
+        assert_in('dir/main.in', pipeline.derive_input_paths('dir/main.out'))
+        assert_true(pipeline.matches_output('dir/main.out'))
+        assert_false(pipeline.matches_output('dir/main.mid'))
+
+    def test_filters_through_all_filters(self):
+        self.mkfile('static/main.in', 'hello')
+        assert_equal(b'HELLO!', filter('main.out'))
+
+    def test_caches_each_filter_separately(self):
+        path = self.mkfile('static/main.in', 'hello')
+        upper = UpperFilter()
+        assert_equal(b'HELLO!',
+                     cache.filter(PipelineFilter([upper, SuffixFilter()]), path))
+        assert_equal(b'HELLO?',
+                     cache.filter(PipelineFilter([upper, SuffixFilter('?')]),
+                                  path))
+        assert_equal(1, UpperFilter.count)
+
+    def test_caches_content_of_each_file_separately(self):
+        a = self.mkfile('static/a.in', 'hello')
+        b = self.mkfile('static/b.in', 'hello')
+        pipeline = PipelineFilter([UpperFilter(), NameFilter()])
+        assert_equal(b'HELLOa.in', cache.filter(pipeline, a))
+        assert_equal(b'HELLOb.in', cache.filter(pipeline, b))
+
+    def test_filters_without_memory_cache(self):
+        path = self.mkfile('static/main.in', 'hello')
+        upper = UpperFilter()
+        pipeline = PipelineFilter([upper, SuffixFilter()])
+        assert_equal(b'HELLO!', cache.filter(pipeline, path, memory=False))
+        assert_equal(None, cache.memory_cache.get(
+            (upper.get_fingerprint(), path)))
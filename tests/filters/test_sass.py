@@ -1,14 +1,18 @@
 from __future__ import unicode_literals
 
+import json
 import os
 import re
+import unittest
 
+from django.core.exceptions import ImproperlyConfigured
 from nose.tools import *
 
 from assetfiles import settings
-from assetfiles.filters.sass import SassFilterError
+from assetfiles.filters import sass
+from assetfiles.filters.sass import SassFilter, SassFilterError
 
-from tests.base import AssetfilesTestCase, filter
+from tests.base import is_libsass_available, AssetfilesTestCase, filter
 
 
 class TestSassFilter(AssetfilesTestCase):
@@ -51,6 +55,45 @@ class TestSassFilter(AssetfilesTestCase):
             filter('css/with_app_deps.css'),
             b'body {\n  color: white; }')
 
+    def test_finds_sass_dirs_on_first_use(self):
+        calls = []
+        get_static_sass_dirs = sass.get_static_sass_dirs
+        def counting_get_static_sass_dirs():
+            calls.append(True)
+            return get_static_sass_dirs()
+        sass.get_static_sass_dirs = counting_get_static_sass_dirs
+        self.addCleanup(setattr, sass, 'get_static_sass_dirs',
+                        get_static_sass_dirs)
+
+        sass_filter = SassFilter({'compass': False})
+        assert_equal([], calls)
+        assert_in(os.path.join(self.root, 'static', 'css'),
+                  sass_filter.options['load_paths'])
+        sass_filter.options
+        assert_equal([True], calls)
+
+    def test_leaves_server_paths_out_of_fingerprint(self):
+        settings.SASS_OPTIONS = {
+            'load_paths': [os.path.join(self.root, 'additional/load/path')],
+        }
+        options = SassFilter().get_fingerprint_options()
+        assert_in('css', options['load_paths'])
+        assert_not_in(self.root, json.dumps(options))
+        assert_not_in(SassFilter.SCRIPTS_PATH, json.dumps(options))
+
+    def test_does_not_change_given_options(self):
+        options = {'compass': False, 'workers': 2, 'require': ['x']}
+        SassFilter(options)
+        SassFilter(options)
+        assert_equal({'compass': False, 'workers': 2, 'require': ['x']},
+                     options)
+        assert_equal(['x'], SassFilter(options).options['require'][-1:])
+        assert_equal(1, SassFilter(options).options['require'].count('x'))
+
+    def test_finds_sass_load_paths_lazily(self):
+        assert_in(os.path.join(self.root, 'static', 'css'),
+                  list(sass.sass_load_paths))
+
     def test_integrates_static_url_with_sass(self):
         self.mkfile(
             'static/css/with_url.scss',
@@ -116,3 +159,56 @@ class TestSassFilter(AssetfilesTestCase):
         with assert_raises(SassFilterError):
             self.mkfile('static/css/syntax_error.scss', '\n\n\n\nbody {')
             filter('css/syntax_error.css')
+
+
+class TestSassFilterWithWorkers(TestSassFilter):
+
+    def setUp(self):
+        super(TestSassFilterWithWorkers, self).setUp()
+        settings.SASS_OPTIONS = dict(self.original_sass_options, workers=1)
+
+    def test_uses_sass_options(self):
+        settings.SASS_OPTIONS = {
+            'load_paths': [os.path.join(self.root, 'additional/load/path')],
+            'style': 'compressed',
+            'workers': 1,
+        }
+        self.mkfile('additional/load/path/folder/_dep.scss', '$c: white;')
+        self.mkfile(
+            'static/css/with_load_path_deps.scss',
+            '@import "folder/dep"; body { color: $c; }')
+        assert_equal(
+            filter('css/with_load_path_deps.css'),
+            b'body{color:#fff}')
+
+
+@unittest.skipUnless(is_libsass_available(), 'libsass is not installed')
+class TestSassFilterWithLibsass(TestSassFilter):
+
+    def setUp(self):
+        super(TestSassFilterWithLibsass, self).setUp()
+        settings.SASS_OPTIONS = dict(self.original_sass_options,
+                                     backend='libsass')
+
+    def test_uses_sass_options(self):
+        settings.SASS_OPTIONS = {
+            'load_paths': [os.path.join(self.root, 'additional/load/path')],
+            'style': 'compressed',
+            'backend': 'libsass',
+        }
+        self.mkfile('additional/load/path/folder/_dep.scss', '$c: white;')
+        self.mkfile(
+            'static/css/with_load_path_deps.scss',
+            '@import "folder/dep"; body { color: $c; }')
+        assert_equal(
+            filter('css/with_load_path_deps.css'),
+            b'body{color:#fff}')
+
+    @unittest.skip('Compass is not supported by libsass')
+    def test_integrates_with_compass(self):
+        pass
+
+    def test_rejects_unknown_backends(self):
+        settings.SASS_OPTIONS = {'backend': 'nope'}
+        with assert_raises(ImproperlyConfigured):
+            SassFilter()
@@ -0,0 +1,121 @@
+from __future__ import unicode_literals
+
+import os
+
+from nose.tools import *
+
+from assetfiles.filters.sass_imports import (ImportGraph, parse_imports,
+                                             resolve_import)
+
+from tests.base import AssetfilesTestCase
+
+
+class TestParseImports(object):
+
+    def test_parses_imports(self):
+        assert_equal(parse_imports('@import "base"; @import \'dep\';'),
+                     ['base', 'dep'])
+
+    def test_parses_multiple_imports(self):
+        assert_equal(parse_imports('@import "base",\n  "folder/dep";'),
+                     ['base', 'folder/dep'])
+
+    def test_parses_use_and_forward(self):
+        assert_equal(
+            parse_imports('@use "config" with ($a: 1); @forward "lib";'),
+            ['config', 'lib'])
+
+    def test_skips_css_imports(self):
+        assert_equal(parse_imports(
+            '@import "x.css"; @import url(x); @import "http://x/x";'
+            '@use "sass:math";'), [])
+
+    def test_skips_comments_and_strings(self):
+        assert_equal(parse_imports(
+            '// @import "a";\n/* @import "b"; */\n'
+            'a { content: "@import \'c\'"; }'), [])
+
+    def test_parses_nested_imports(self):
+        assert_equal(parse_imports('.a { @import "dep"; }'), ['dep'])
+
+    def test_parses_indented_syntax(self):
+        assert_equal(parse_imports('@import base, dep\n@import "x"\n', 'sass'),
+                     ['base', 'dep', 'x'])
+
+
+class TestImportGraph(AssetfilesTestCase):
+
+    def setUp(self):
+        super(TestImportGraph, self).setUp()
+        self.load_paths = [os.path.join(self.root, 'static/css')]
+        self.graph = ImportGraph(
+            cache_path=os.path.join(self.root, 'cache/sass-imports.json'))
+
+    def test_resolves_partials(self):
+        path = self.mkfile('static/css/folder/_dep.scss')
+        assert_equal(path, resolve_import('folder/dep', self.root,
+                                          self.load_paths))
+        assert_equal(None, resolve_import('folder/missing', self.root,
+                                          self.load_paths))
+
+    def test_resolves_relative_to_importing_file(self):
+        path = self.mkfile('static/css/folder/_dep.scss')
+        self.mkfile('static/css/dep.scss')
+        assert_equal(path, resolve_import(
+            'dep', os.path.dirname(path), self.load_paths))
+
+    def test_finds_dependencies(self):
+        main = self.mkfile('static/css/main.scss', '@import "folder/dep";')
+        dep = self.mkfile('static/css/folder/_dep.scss', '@import "vars";')
+        variables = self.mkfile('static/css/folder/_vars.scss', '$c: red;')
+        self.mkfile('static/css/_unused.scss')
+        assert_equal(self.graph.get_dependencies(main, self.load_paths),
+                     [dep, variables])
+
+    def test_finds_dependents(self):
+        main = self.mkfile('static/css/main.scss', '@import "folder/dep";')
+        dep = self.mkfile('static/css/folder/_dep.scss', '@import "vars";')
+        variables = self.mkfile('static/css/folder/_vars.scss', '$c: red;')
+        self.mkfile('static/css/other.scss')
+        assert_equal(self.graph.get_dependents(variables, self.load_paths),
+                     [dep, main])
+
+    def test_builds_dependents_once(self):
+        self.mkfile('static/css/main.scss', '@import "a";')
+        self.mkfile('static/css/_a.scss')
+        reverse = self.graph.build(self.load_paths)
+        assert_is(reverse, self.graph.build(self.load_paths))
+
+    def test_updates_dependents_of_changed_and_added_files(self):
+        main = self.mkfile('static/css/main.scss', '@import "a";')
+        a = self.mkfile('static/css/_a.scss')
+        assert_equal(self.graph.get_dependents(a, self.load_paths), [main])
+        self.mkfile('static/css/main.scss', '@import "b";')
+        assert_equal(self.graph.get_dependents(a, self.load_paths), [])
+        b = self.mkfile('static/css/folder/_b.scss')
+        other = self.mkfile('static/css/other.scss', '@import "folder/b";')
+        assert_equal(self.graph.get_dependents(b, self.load_paths), [other])
+
+    def test_handles_circular_imports(self):
+        a = self.mkfile('static/css/_a.scss', '@import "b";')
+        b = self.mkfile('static/css/_b.scss', '@import "a";')
+        assert_equal(self.graph.get_dependencies(a, self.load_paths), [b])
+
+    def test_updates_changed_files(self):
+        main = self.mkfile('static/css/main.scss', '@import "a";')
+        a = self.mkfile('static/css/_a.scss')
+        b = self.mkfile('static/css/_b.scss')
+        assert_equal(self.graph.get_dependencies(main, self.load_paths), [a])
+        self.mkfile('static/css/main.scss', '@import "a", "b";')
+        assert_equal(self.graph.get_dependencies(main, self.load_paths),
+                     [a, b])
+
+    def test_persists_parsed_imports(self):
+        main = self.mkfile('static/css/main.scss', '@import "a";')
+        a = self.mkfile('static/css/_a.scss')
+        self.graph.get_dependencies(main, self.load_paths)
+        assert_true(os.path.isfile(self.graph.cache_path))
+
+        graph = ImportGraph(cache_path=self.graph.cache_path)
+        assert_equal(graph.get_dependencies(main, self.load_paths), [a])
+        assert_false(graph._dirty)
@@ -1,8 +1,10 @@
+import os
+
 from django.conf import settings
 
 from nose.tools import *
 
-from assetfiles import assets
+from assetfiles import assets, signals
 from assetfiles.filters import BaseFilter, ExtensionMixin
 import assetfiles.settings
 
@@ -44,3 +46,52 @@ class TestAssets(AssetfilesTestCase):
         assert_is_instance(filter2, Filter2)
         assert_equal(None, asset_path3)
         assert_equal(None, filter3)
+
+    def test_finds_added_assets(self):
+        assert_equal((None, None), assets.find('some/dir/main.out'))
+        path = self.mkfile('static/some/dir/main.in')
+        asset_path, filter = assets.find('some/dir/main.out')
+        assert_equal(path, asset_path)
+        assert_is_instance(filter, Filter1)
+
+    def test_forgets_removed_assets(self):
+        path = self.mkfile('static/some/dir/main.in')
+        assert_equal(path, assets.find('some/dir/main.out')[0])
+        os.remove(path)
+        assert_equal((None, None), assets.find('some/dir/main.out'))
+
+    def test_prefers_earlier_input_extensions(self):
+        self.mkfile('app-1/static/main.in1')
+        path = self.mkfile('app-2/static/main.in')
+        assert_equal(path, assets.find('main.out')[0])
+
+
+class TestAssetIndex(AssetfilesTestCase):
+
+    def test_checks_for_changes_once_per_interval(self):
+        index = assets.AssetIndex(check_interval=60)
+        assert_equal(None, index.find('css/main.css'))
+        path = self.mkfile('static/css/main.css')
+        assert_equal(None, index.find('css/main.css'))
+        signals.static_files_changed.send(sender=None, paths=[path])
+        assert_equal(path, index.find('css/main.css'))
+
+    def test_notices_changes_after_the_interval(self):
+        index = assets.AssetIndex(check_interval=0)
+        assert_equal(None, index.find('css/main.css'))
+        path = self.mkfile('static/css/main.css')
+        assert_equal(path, index.find('css/main.css'))
+
+
+class TestFindStatic(AssetfilesTestCase):
+
+    def test_finds_static_files(self):
+        path = self.mkfile('static/css/main.css')
+        self.mkfile('app-1/static/css/main.css')
+        assert_equal(path, assets.find_static('css/main.css'))
+        assert_equal(None, assets.find_static('css/other.css'))
+
+    def test_finds_prefixed_static_files(self):
+        path = self.mkfile('static-prefix/css/main.css')
+        assert_equal(path, assets.find_static('prefix/css/main.css'))
+        assert_equal(None, assets.find_static('css/main.css'))
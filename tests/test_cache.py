@@ -0,0 +1,294 @@
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import time
+
+from django.contrib.staticfiles import finders
+from django.test.utils import override_settings
+from nose.tools import *
+
+from assetfiles import cache, signals
+from assetfiles.cache import DiskCache, MemoryCache, MissCache
+import assetfiles.settings
+from assetfiles.filters import BaseFilter
+from assetfiles.stats import stats
+
+from tests.base import AssetfilesTestCase
+
+
+class CountingFilter(BaseFilter):
+
+    def __init__(self, dependencies=None, **kwargs):
+        super(CountingFilter, self).__init__(**kwargs)
+        self.dependencies = dependencies or []
+        self.count = 0
+
+    def get_dependencies(self, input_path):
+        return self.dependencies
+
+    def filter(self, input_path):
+        self.count += 1
+        with open(input_path, 'rb') as file:
+            return file.read().upper()
+
+
+class TestMemoryCache(object):
+
+    def test_stores_values(self):
+        memory_cache = MemoryCache(max_size=100)
+        memory_cache.set('key', b'value')
+        assert_equal(b'value', memory_cache.get('key'))
+        assert_equal(5, memory_cache.size)
+
+    def test_returns_default_for_missing_keys(self):
+        memory_cache = MemoryCache(max_size=100)
+        assert_equal(None, memory_cache.get('key'))
+        assert_equal(b'default', memory_cache.get('key', b'default'))
+
+    def test_evicts_least_recently_used_values(self):
+        memory_cache = MemoryCache(max_size=10)
+        memory_cache.set('a', b'aaaa')
+        memory_cache.set('b', b'bbbb')
+        memory_cache.get('a')
+        memory_cache.set('c', b'cccc')
+        assert_in('a', memory_cache)
+        assert_not_in('b', memory_cache)
+        assert_in('c', memory_cache)
+        assert_equal(8, memory_cache.size)
+
+    def test_does_not_store_values_larger_than_max_size(self):
+        memory_cache = MemoryCache(max_size=4)
+        assert_false(memory_cache.set('key', b'value'))
+        assert_not_in('key', memory_cache)
+        assert_equal(0, memory_cache.size)
+
+    def test_replaces_values(self):
+        memory_cache = MemoryCache(max_size=100)
+        memory_cache.set('key', b'value')
+        memory_cache.set('key', b'other value')
+        assert_equal(b'other value', memory_cache.get('key'))
+        assert_equal(11, memory_cache.size)
+
+    def test_clears_values(self):
+        memory_cache = MemoryCache(max_size=100)
+        memory_cache.set('key', b'value')
+        memory_cache.clear()
+        assert_equal(0, len(memory_cache))
+        assert_equal(0, memory_cache.size)
+
+
+class TestMissCache(object):
+
+    def test_stores_keys(self):
+        miss_cache = MissCache(max_size=10, ttl=60)
+        miss_cache.add('key')
+        assert_true(miss_cache.has('key'))
+        assert_false(miss_cache.has('other'))
+
+    def test_expires_keys(self):
+        miss_cache = MissCache(max_size=10, ttl=0)
+        miss_cache.add('key')
+        assert_false(miss_cache.has('key'))
+        assert_equal(0, len(miss_cache))
+
+    def test_clears_keys_when_static_files_change(self):
+        miss_cache = MissCache(max_size=10, ttl=60)
+        miss_cache.add('key')
+        signals.static_files_changed.send(sender=None, paths=None)
+        assert_false(miss_cache.has('key'))
+
+    def test_evicts_oldest_keys(self):
+        miss_cache = MissCache(max_size=2, ttl=60)
+        miss_cache.add('a')
+        miss_cache.add('b')
+        miss_cache.add('c')
+        assert_false(miss_cache.has('a'))
+        assert_true(miss_cache.has('b'))
+        assert_true(miss_cache.has('c'))
+
+    def test_can_be_disabled(self):
+        miss_cache = MissCache(max_size=0, ttl=60)
+        miss_cache.add('key')
+        assert_false(miss_cache.has('key'))
+
+
+class TestDiskCache(object):
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.location, ignore_errors=True)
+
+    def test_is_disabled_without_a_location(self):
+        assert_false(DiskCache(location='').enabled)
+        assert_true(DiskCache(location=self.location).enabled)
+
+    def test_stores_values(self):
+        disk_cache = DiskCache(location=self.location)
+        disk_cache.set('abcdef', b'value')
+        assert_equal(b'value', disk_cache.get('abcdef'))
+        assert_true(os.path.isfile(os.path.join(self.location, 'ab', 'cdef')))
+
+    def test_returns_none_for_missing_keys(self):
+        disk_cache = DiskCache(location=self.location)
+        assert_equal(None, disk_cache.get('abcdef'))
+
+    def test_stores_text_as_utf8(self):
+        disk_cache = DiskCache(location=self.location)
+        disk_cache.set('abcdef', '\xe9')
+        assert_equal(b'\xc3\xa9', disk_cache.get('abcdef'))
+
+    def test_shares_values_across_instances(self):
+        DiskCache(location=self.location).set('abcdef', b'value')
+        assert_equal(b'value', DiskCache(location=self.location).get('abcdef'))
+
+    def test_prunes_least_recently_used_values(self):
+        disk_cache = DiskCache(location=self.location, max_size=100)
+        disk_cache.set('aaaa', b'aaaa')
+        disk_cache.set('bbbb', b'bbbb')
+        disk_cache.set('cccc', b'cccc')
+        past = time.time() - 100
+        os.utime(os.path.join(self.location, 'aa', 'aa'), (past, past))
+        os.utime(os.path.join(self.location, 'bb', 'bb'), (past + 1, past + 1))
+        disk_cache.get('aaaa')
+        assert_equal(8, disk_cache.prune(8))
+        assert_equal(b'aaaa', disk_cache.get('aaaa'))
+        assert_equal(None, disk_cache.get('bbbb'))
+        assert_equal(b'cccc', disk_cache.get('cccc'))
+
+    def test_prunes_when_exceeding_max_size(self):
+        disk_cache = DiskCache(location=self.location, max_size=10)
+        disk_cache.set('aaaa', b'aaaaaa')
+        disk_cache.set('bbbb', b'bbbbbb')
+        assert_true(disk_cache.size() <= 10)
+
+    def test_clears_values(self):
+        disk_cache = DiskCache(location=self.location)
+        disk_cache.set('abcdef', b'value')
+        disk_cache.clear()
+        assert_equal([], disk_cache.entries())
+
+
+class TestFilter(AssetfilesTestCase):
+
+    def setUp(self):
+        super(TestFilter, self).setUp()
+        self.old_cache_dir = assetfiles.settings.CACHE_DIR
+        self.cache_dir = assetfiles.settings.CACHE_DIR = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        assetfiles.settings.CACHE_DIR = self.old_cache_dir
+
+    def test_filters_once_until_modified(self):
+        filter = CountingFilter()
+        path = self.mkfile('static/main.in', 'hello')
+        assert_equal(b'HELLO', cache.filter(filter, path))
+        assert_equal(b'HELLO', cache.filter(filter, path))
+        assert_equal(1, filter.count)
+
+        self.mkfile('static/main.in', 'hello world')
+        assert_equal(b'HELLO WORLD', cache.filter(filter, path))
+        assert_equal(2, filter.count)
+
+    def test_filters_again_when_dependencies_change(self):
+        dependency = self.mkfile('static/_dep.in', 'a')
+        filter = CountingFilter(dependencies=[dependency])
+        path = self.mkfile('static/main.in', 'hello')
+        cache.filter(filter, path)
+        cache.filter(filter, path)
+        assert_equal(1, filter.count)
+
+        self.mkfile('static/_dep.in', 'ab')
+        cache.filter(filter, path)
+        assert_equal(2, filter.count)
+
+        os.remove(dependency)
+        cache.filter(filter, path)
+        assert_equal(3, filter.count)
+
+    def test_reads_filtered_content_from_disk(self):
+        filter = CountingFilter()
+        path = self.mkfile('static/main.in', 'hello')
+        cache.filter(filter, path)
+        cache.memory_cache.clear()
+        assert_equal(b'HELLO', cache.filter(filter, path))
+        assert_equal(1, filter.count)
+
+    def test_counts_hits_and_misses(self):
+        filter = CountingFilter()
+        path = self.mkfile('static/main.in', 'hello')
+        stats.reset()
+        cache.filter(filter, path)
+        cache.memory_cache.clear()
+        cache.filter(filter, path)
+        cache.filter(filter, path)
+        counters = stats.snapshot()['counters']
+        assert_equal(1, counters['cache.memory.hits'])
+        assert_equal(2, counters['cache.memory.misses'])
+        assert_equal(1, counters['cache.disk.hits'])
+        assert_equal(1, counters['cache.disk.misses'])
+
+    def test_does_not_use_memory_if_disabled(self):
+        filter = CountingFilter()
+        path = self.mkfile('static/main.in', 'hello')
+        cache.filter(filter, path, memory=False)
+        assert_equal(0, len(cache.memory_cache))
+
+    def test_keys_disk_cache_by_content(self):
+        filter = CountingFilter()
+        path = self.mkfile('static/main.in', 'hello')
+        digest = cache.get_digest(filter, path)
+        os.utime(path, (0, 0))
+        assert_equal(digest, cache.get_digest(filter, path))
+        self.mkfile('static/main.in', 'hello world')
+        assert_not_equal(digest, cache.get_digest(filter, path))
+
+    def test_keys_disk_cache_by_static_path(self):
+        filter = CountingFilter()
+        path = self.mkfile('static/main.in', 'hello')
+        outside_path = self.mkfile('outside/dep.in', 'dep')
+        assert_equal('main.in', cache.get_key_path(path))
+        assert_equal('', cache.get_key_path(outside_path))
+        digest = cache.get_digest(filter, path)
+
+        # The same project, checked out in another directory.
+        other_path = self.mkfile('checkout/static/main.in', 'hello')
+        finders._finders.clear()
+        self.addCleanup(finders._finders.clear)
+        with override_settings(
+                STATICFILES_DIRS=(os.path.join(self.root, 'checkout/static'),)):
+            assert_equal(digest, cache.get_digest(filter, other_path))
+
+    def test_filters_into_a_file(self):
+        filter = CountingFilter()
+        path = self.mkfile('static/main.in', 'hello')
+        with cache.filter_file(filter, path) as file:
+            assert_equal(b'HELLO', file.read())
+        with cache.filter_file(filter, path) as file:
+            assert_equal(b'HELLO', file.read())
+        assert_equal(1, filter.count)
+
+    def test_opens_filtered_file_from_disk(self):
+        filter = CountingFilter()
+        path = self.mkfile('static/main.in', 'hello')
+        cache.filter_file(filter, path).close()
+        cache.memory_cache.clear()
+        with cache.filter_file(filter, path) as file:
+            assert_equal(b'HELLO', file.read())
+        assert_equal(1, filter.count)
+
+    def test_does_not_keep_large_files_in_memory(self):
+        old_spool_size = assetfiles.settings.SPOOL_SIZE
+        assetfiles.settings.SPOOL_SIZE = 2
+        try:
+            filter = CountingFilter()
+            path = self.mkfile('static/main.in', 'hello')
+            with cache.filter_file(filter, path) as file:
+                assert_equal(b'HELLO', file.read())
+            assert_equal(0, len(cache.memory_cache))
+        finally:
+            assetfiles.settings.SPOOL_SIZE = old_spool_size
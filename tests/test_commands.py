@@ -2,7 +2,11 @@
 from __future__ import unicode_literals
 
 import codecs
+import gzip
 import os
+import shutil
+import tempfile
+import threading
 
 from django.conf import settings
 from django.contrib.staticfiles import storage
@@ -11,6 +15,12 @@ from django.core.management.base import CommandError
 from django.utils import six
 from nose.tools import *
 
+from assetfiles import compress
+from assetfiles.cache import disk_cache
+from assetfiles.management.commands import collectstatic
+from assetfiles.manifest import manifest
+import assetfiles.settings
+
 from tests.base import is_at_least_django_15, AssetfilesTestCase
 
 
@@ -44,6 +54,15 @@ def assert_static_file_contains(path, text):
             "'{0}' not in file '{1}'.".format(text, path))
 
 
+def assert_static_file_gzipped(path):
+    static_path = os.path.join(settings.STATIC_ROOT, path)
+    assert_static_file_exists(path + '.gz')
+    with open(static_path, 'rb') as file:
+        content = file.read()
+    with gzip.open(static_path + '.gz', 'rb') as file:
+        assert_equal(content, file.read())
+
+
 class TestFindStatic(AssetfilesTestCase):
 
     def setUp(self):
@@ -67,6 +86,84 @@ class TestFindStatic(AssetfilesTestCase):
         assert_in('app-2/static/css/main.css', lines[2])
 
 
+class TestAssetCache(AssetfilesTestCase):
+
+    def setUp(self):
+        super(TestAssetCache, self).setUp()
+        self.old_cache_dir = assetfiles.settings.CACHE_DIR
+        self.cache_dir = assetfiles.settings.CACHE_DIR = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        assetfiles.settings.CACHE_DIR = self.old_cache_dir
+
+    def test_inspects_cache(self):
+        disk_cache.set('abcdef', b'value')
+        out = call_command('assetcache').read()
+        assert_in('Entries: 1', out)
+        assert_in('Size: 5 bytes', out)
+
+    def test_prunes_cache(self):
+        disk_cache.set('abcdef', b'value')
+        out = call_command('assetcache', max_size=0).read()
+        assert_in('Removed 1 entries.', out)
+        assert_in('Entries: 0', out)
+
+    def test_clears_cache(self):
+        disk_cache.set('abcdef', b'value')
+        call_command('assetcache', clear=True)
+        assert_equal([], disk_cache.entries())
+
+    def test_requires_cache_dir(self):
+        assetfiles.settings.CACHE_DIR = None
+        error = CommandError if is_at_least_django_15() else SystemExit
+        with assert_raises(error):
+            call_command('assetcache')
+
+
+class TestWarmAssets(AssetfilesTestCase):
+
+    def setUp(self):
+        super(TestWarmAssets, self).setUp()
+        self.old_cache_dir = assetfiles.settings.CACHE_DIR
+        self.cache_dir = assetfiles.settings.CACHE_DIR = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        assetfiles.settings.CACHE_DIR = self.old_cache_dir
+
+    def test_filters_assets_into_cache(self):
+        self.mkfile('static/css/main.scss', 'a { b: c; }')
+        self.mkfile('app-1/static/js/app.coffee', 'a = 1')
+        self.mkfile('static/css/plain.css', 'a { b: c; }')
+        out = call_command('warmassets', jobs=2).read()
+        assert_in("Filtered 'css/main.css' in ", out)
+        assert_in("Filtered 'js/app.js' in ", out)
+        assert_in('Filtered 2 assets in ', out)
+        assert_equal(2, len(disk_cache.entries()))
+
+    def test_skips_dependencies(self):
+        self.mkfile('static/css/_dep.scss', '$c: red;')
+        self.mkfile('static/css/main.scss', '@import "dep"; a { b: $c; }')
+        out = call_command('warmassets').read()
+        assert_not_in('_dep', out)
+        assert_equal(1, len(disk_cache.entries()))
+
+    def test_reports_assets_that_fail(self):
+        self.mkfile('static/css/main.scss', 'a { b: $undefined; }')
+        self.mkfile('static/css/other.scss', 'a { b: c; }')
+        error = CommandError if is_at_least_django_15() else SystemExit
+        with assert_raises(error):
+            call_command('warmassets')
+        assert_equal(1, len(disk_cache.entries()))
+
+    def test_requires_cache_dir(self):
+        assetfiles.settings.CACHE_DIR = None
+        error = CommandError if is_at_least_django_15() else SystemExit
+        with assert_raises(error):
+            call_command('warmassets')
+
+
 class CustomStorage(storage.StaticFilesStorage):
 
     def post_process(self, paths, dry_run=False, **options):
@@ -90,7 +187,8 @@ class TestCollectStatic(AssetfilesTestCase):
         storage.staticfiles_storage = self.old_staticfiles_storage
 
     def collectstatic(self, *args, **kwargs):
-        kwargs.update({'interactive': False, 'clear': True})
+        kwargs.setdefault('interactive', False)
+        kwargs.setdefault('clear', True)
         return call_command('collectstatic', *args, **kwargs)
 
     def test_copies_static_files(self):
@@ -204,7 +302,266 @@ class TestCollectStatic(AssetfilesTestCase):
         assert_static_file_contains('prefix/css/complex.css',
             'body {\n  color: red; }')
 
+    def test_processes_files_in_parallel(self):
+        for i in range(4):
+            self.mkfile('static/css/simple%s.scss' % i,
+                '$c: red; body { color: $c; }')
+            self.mkfile('static/js/simple%s.coffee' % i, 'a = foo: "1#{2}3"')
+        self.mkfile('static/css/static.css', 'body { color: red; }')
+        self.collectstatic(jobs=4)
+        for i in range(4):
+            assert_static_file_contains('css/simple%s.css' % i,
+                'body {\n  color: red; }')
+            assert_static_file_contains('js/simple%s.js' % i,
+                'foo: "1" + 2 + "3"')
+        assert_static_file_contains('css/static.css', 'body { color: red; }')
+
+    def test_limits_files_filtered_ahead_in_parallel(self):
+        submit = collectstatic.Command.__dict__['_submit_prepared_files']
+        self.addCleanup(setattr, collectstatic.Command,
+                        '_submit_prepared_files', submit)
+        in_flight = []
+        def recording_submit(command):
+            submit(command)
+            in_flight.append(len(command.prepared_files))
+        collectstatic.Command._submit_prepared_files = recording_submit
+
+        for i in range(8):
+            self.mkfile('static/css/simple%s.scss' % i,
+                '$c: red; body { color: $c; }')
+        self.collectstatic(jobs=2)
+        assert_equal(4, max(in_flight))
+        for i in range(8):
+            assert_static_file_contains('css/simple%s.css' % i,
+                'body {\n  color: red; }')
+
+    def test_logs_files_in_order_in_parallel(self):
+        for i in range(4):
+            self.mkfile('static/css/simple%s.scss' % i,
+                '$c: red; body { color: $c; }')
+        self.collectstatic()
+        serial = self.collectstatic().read()
+        parallel = self.collectstatic(jobs=4).read()
+        assert_equal(serial, parallel)
+
+    def test_writes_build_manifest(self):
+        self.mkfile('static/css/simple.scss', '$c: red; body { color: $c; }')
+        self.collectstatic()
+        assert_static_file_contains(assetfiles.settings.BUILD_MANIFEST_NAME,
+                                    '"css/simple.css"')
+        with open(os.path.join(settings.STATIC_ROOT,
+                  assetfiles.settings.BUILD_MANIFEST_NAME)) as manifest_file:
+            assert_not_in(self.root, manifest_file.read())
+
+    def test_skips_unmodified_asset_files(self):
+        self.mkfile('static/css/simple.scss', '$c: red; body { color: $c; }')
+        self.collectstatic()
+        self.mkfile('public/css/simple.css', 'not filtered again')
+        self.collectstatic(clear=False)
+        assert_static_file_contains('css/simple.css', 'not filtered again')
+
+    def test_filters_asset_files_with_modified_deps(self):
+        self.mkfile('static/css/_dep.scss', '$c: black;')
+        self.mkfile('static/css/with_deps.scss',
+            '@import "dep"; body { color: $c; }')
+        self.collectstatic()
+        self.mkfile('static/css/_dep.scss', '$c: white;')
+        self.collectstatic(clear=False)
+        assert_static_file_contains('css/with_deps.css',
+            'body {\n  color: white; }')
+
+    def test_filters_missing_asset_files(self):
+        self.mkfile('static/css/simple.scss', '$c: red; body { color: $c; }')
+        self.collectstatic()
+        os.remove(os.path.join(settings.STATIC_ROOT, 'css/simple.css'))
+        self.collectstatic(clear=False)
+        assert_static_file_contains('css/simple.css',
+            'body {\n  color: red; }')
+
+    def test_filters_unmodified_asset_files_with_force(self):
+        self.mkfile('static/css/simple.scss', '$c: red; body { color: $c; }')
+        self.collectstatic()
+        self.mkfile('public/css/simple.css', 'not filtered again')
+        self.collectstatic(clear=False, force=True)
+        assert_static_file_contains('css/simple.css',
+            'body {\n  color: red; }')
+
     def test_does_not_allow_symlinking(self):
         error = CommandError if is_at_least_django_15() else SystemExit
         with assert_raises(error):
             self.collectstatic(link=True)
+
+    def test_compresses_files(self):
+        self.mkfile('static/css/simple.scss',
+            '$c: red; body { color: $c; }\n' * 50)
+        self.mkfile('static/css/static.css', 'body { color: red; }\n' * 50)
+        self.mkfile('static/css/small.css', 'body { color: red; }')
+        self.mkfile('static/img/image.png', 'body { color: red; }\n' * 50)
+        self.collectstatic(compress=True)
+        assert_static_file_gzipped('css/simple.css')
+        assert_static_file_gzipped('css/static.css')
+        assert_static_file_not_found('css/small.css.gz')
+        assert_static_file_not_found('img/image.png.gz')
+
+    def test_compresses_files_in_parallel(self):
+        for i in range(4):
+            self.mkfile('static/css/simple%s.scss' % i,
+                '$c: red; body { color: $c; }\n' * 50)
+        self.collectstatic(compress=True, jobs=4)
+        for i in range(4):
+            assert_static_file_gzipped('css/simple%s.css' % i)
+
+    def test_deletes_stale_compressed_files(self):
+        self.mkfile('static/css/simple.scss',
+            '$c: red; body { color: $c; }\n' * 50)
+        self.collectstatic(compress=True)
+        self.mkfile('static/css/simple.scss', '$c: red; body { color: $c; }')
+        self.collectstatic(clear=False, compress=True)
+        assert_static_file_not_found('css/simple.css.gz')
+
+    def test_compresses_unmodified_files(self):
+        self.mkfile('static/css/simple.scss',
+            '$c: red; body { color: $c; }\n' * 50)
+        self.mkfile('static/css/static.css', 'body { color: red; }\n' * 50)
+        self.collectstatic()
+        self.collectstatic(clear=False, compress=True)
+        assert_static_file_gzipped('css/simple.css')
+        assert_static_file_gzipped('css/static.css')
+
+    def test_does_not_check_compressed_files_when_not_compressing(self):
+        exists = storage.StaticFilesStorage.exists
+        self.addCleanup(setattr, storage.StaticFilesStorage, 'exists', exists)
+        names = []
+        def recording_exists(storage, name):
+            names.append(name)
+            return exists(storage, name)
+        storage.StaticFilesStorage.exists = recording_exists
+
+        self.mkfile('static/css/simple.scss',
+            '$c: red; body { color: $c; }\n' * 50)
+        self.mkfile('static/css/static.css', 'body { color: red; }\n' * 50)
+        self.collectstatic()
+        assert_in('css/simple.css', names)
+        assert_false([name for name in names
+                      if name.endswith(('.gz', '.br'))])
+
+    def test_compresses_copied_files_in_parallel(self):
+        compress_file = compress.compress_file
+        self.addCleanup(setattr, compress, 'compress_file', compress_file)
+        threads = []
+        def recording_compress_file(path, file):
+            threads.append(threading.current_thread())
+            return compress_file(path, file)
+        compress.compress_file = recording_compress_file
+
+        for i in range(4):
+            self.mkfile('static/css/static%s.css' % i,
+                'body { color: red; }\n' * 50)
+            self.mkfile('static/css/simple%s.scss' % i,
+                '$c: red; body { color: $c; }\n' * 50)
+        self.collectstatic(compress=True, jobs=2)
+        for i in range(4):
+            assert_static_file_gzipped('css/static%s.css' % i)
+            assert_static_file_gzipped('css/simple%s.css' % i)
+        assert_equal(8, len(threads))
+        assert_not_in(threading.current_thread(), threads)
+
+    def test_processes_files_spilled_to_disk(self):
+        self.addCleanup(setattr, assetfiles.settings, 'TEMP_FILES_MEMORY_SIZE',
+                        assetfiles.settings.TEMP_FILES_MEMORY_SIZE)
+        assetfiles.settings.TEMP_FILES_MEMORY_SIZE = 0
+        self.mkfile('static/css/simple.scss', '$c: red; body { color: $c; }')
+        self.collectstatic(compress=True)
+        assert_static_file_contains('css/simple.css', 'body {\n  color: red; }')
+
+    def test_prints_timings(self):
+        self.mkfile('static/css/simple.scss', '$c: red; body { color: $c; }')
+        self.mkfile('static/css/plain.css', 'a { b: c; }')
+        out = self.collectstatic(timings=True).read()
+        assert_in('Slowest files:', out)
+        assert_in('css/simple.css', out)
+        assert_in('css/plain.css', out)
+        assert_in('Commands: ', out)
+        assert_in('Peak RSS: ', out)
+
+    def test_collects_bundles(self):
+        self.addCleanup(setattr, assetfiles.settings, 'FILTERS',
+                        assetfiles.settings.FILTERS)
+        assetfiles.settings.FILTERS = (
+            'assetfiles.filters.coffee.CoffeeScriptFilter',
+            ('assetfiles.filters.bundle.BundleFilter', {
+                'output_path': 'js/all.js',
+                'input_paths': ('js/b.js', 'js/a.coffee'),
+            }),
+        )
+        self.mkfile('static/js/a.coffee', 'a = 1')
+        self.mkfile('static/js/b.js', 'var b;')
+        self.collectstatic()
+        assert_static_file_contains('js/all.js', 'var b;\n')
+        assert_static_file_contains('js/all.js', 'a = 1;')
+        assert_static_file_contains('js/a.js', 'a = 1;')
+        assert_static_file_contains('js/b.js', 'var b;')
+        self.collectstatic(clear=False)
+        assert_static_file_contains('js/all.js', 'var b;\n')
+
+    def test_minifies_plain_and_filtered_files(self):
+        self.addCleanup(setattr, assetfiles.settings, 'FILTERS',
+                        assetfiles.settings.FILTERS)
+        assetfiles.settings.FILTERS = (
+            ['assetfiles.filters.sass.SassFilter',
+             'assetfiles.filters.minify.CSSMinFilter'],
+            'assetfiles.filters.minify.CSSMinFilter',
+            'assetfiles.filters.minify.JSMinFilter',
+        )
+        self.mkfile('static/css/main.scss', '$c: red; body { color: $c; }')
+        self.mkfile('static/css/plain.css', 'a {\n  color: blue;\n}\n')
+        self.mkfile('static/js/plain.js', 'var a = 1;  // one\n')
+        self.collectstatic()
+        assert_static_file_contains('css/main.css', 'body{color:red}')
+        assert_static_file_contains('css/plain.css', 'a{color:blue}')
+        assert_static_file_contains('js/plain.js', 'var a=1;')
+        assert_static_file_not_found('css/main.scss')
+
+    def enable_hash_names(self):
+        self.addCleanup(setattr, assetfiles.settings, 'HASH_NAMES',
+                        assetfiles.settings.HASH_NAMES)
+        assetfiles.settings.HASH_NAMES = True
+
+    def test_writes_hashed_asset_files(self):
+        self.enable_hash_names()
+        self.mkfile('static/css/simple.scss', '$c: red; body { color: $c; }')
+        self.mkfile('static/css/static.css', 'body { color: red; }')
+        self.collectstatic()
+        hashed_path = manifest.get('css/simple.css')
+        assert_regexp_matches(hashed_path, r'^css/simple\.[0-9a-f]{12}\.css$')
+        assert_static_file_contains(hashed_path, 'body {\n  color: red; }')
+        assert_static_file_contains('css/simple.css', 'body {\n  color: red; }')
+        assert_equal(None, manifest.get('css/static.css'))
+
+    def test_keeps_hashed_names_of_unmodified_asset_files(self):
+        self.enable_hash_names()
+        self.mkfile('static/css/simple.scss', '$c: red; body { color: $c; }')
+        self.collectstatic()
+        hashed_path = manifest.get('css/simple.css')
+        self.collectstatic(clear=False)
+        assert_equal(hashed_path, manifest.get('css/simple.css'))
+
+    def test_compresses_hashed_asset_files(self):
+        self.enable_hash_names()
+        self.mkfile('static/css/simple.scss',
+            '$c: red; body { color: $c; }\n' * 50)
+        self.collectstatic(compress=True)
+        assert_static_file_gzipped('css/simple.css')
+        assert_static_file_gzipped(manifest.get('css/simple.css'))
+
+    def test_changes_hashed_names_of_modified_asset_files(self):
+        self.enable_hash_names()
+        self.mkfile('static/css/simple.scss', '$c: red; body { color: $c; }')
+        self.collectstatic()
+        old_hashed_path = manifest.get('css/simple.css')
+        self.mkfile('static/css/simple.scss', '$c: blue; body { color: $c; }')
+        self.collectstatic(clear=False)
+        hashed_path = manifest.get('css/simple.css')
+        assert_not_equal(old_hashed_path, hashed_path)
+        assert_static_file_contains(hashed_path, 'body {\n  color: blue; }')
+        assert_static_file_exists(old_hashed_path)
@@ -0,0 +1,33 @@
+from __future__ import unicode_literals
+
+import gzip
+import io
+
+from nose.tools import *
+
+from assetfiles import compress
+
+
+class TestCompress(object):
+
+    def test_compresses_content(self):
+        content = b'body { color: red; }\n' * 50
+        variants = compress.compress('css/main.css', content)
+        with gzip.GzipFile(fileobj=io.BytesIO(variants['gz'])) as file:
+            assert_equal(content, file.read())
+
+    def test_compresses_deterministically(self):
+        content = b'body { color: red; }\n' * 50
+        assert_equal(compress.compress('css/main.css', content),
+                     compress.compress('css/main.css', content))
+
+    def test_skips_small_files(self):
+        assert_equal({}, compress.compress('css/main.css', b'body {}'))
+
+    def test_skips_incompressible_formats(self):
+        content = b'body { color: red; }\n' * 50
+        assert_equal({}, compress.compress('img/main.png', content))
+
+    def test_skips_variants_larger_than_the_content(self):
+        content = bytes(bytearray(range(256)))
+        assert_not_in('gz', compress.compress('css/main.css', content))
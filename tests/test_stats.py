@@ -0,0 +1,37 @@
+from nose.tools import *
+
+from assetfiles.stats import Stats, get_peak_rss
+
+
+class TestStats(object):
+
+    def test_counts(self):
+        stats = Stats()
+        stats.incr('a')
+        stats.incr('a', 2)
+        assert_equal(3, stats.get('a'))
+        assert_equal(0, stats.get('b'))
+
+    def test_records_timings(self):
+        stats = Stats()
+        stats.add_timing('a', 1.0)
+        stats.add_timing('a', 3.0)
+        assert_equal({'count': 2, 'total': 4.0, 'max': 3.0},
+                     stats.snapshot()['timings']['a'])
+
+    def test_times_blocks(self):
+        stats = Stats()
+        with stats.timer('a') as timer:
+            pass
+        assert_true(timer.duration >= 0)
+        assert_equal(1, stats.snapshot()['timings']['a']['count'])
+
+    def test_resets(self):
+        stats = Stats()
+        stats.incr('a')
+        stats.add_timing('a', 1.0)
+        stats.reset()
+        assert_equal({'counters': {}, 'timings': {}}, stats.snapshot())
+
+    def test_returns_peak_rss(self):
+        assert_true(get_peak_rss() > 0)
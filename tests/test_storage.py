@@ -1,8 +1,12 @@
 from __future__ import unicode_literals
 
+import io
+import os
+import tempfile
+
 from nose.tools import *
 
-from assetfiles.storage import TempFilesStorage
+from assetfiles.storage import MappedFile, TempFilesStorage
 
 
 class TestTempFilesStorage(object):
@@ -23,3 +27,48 @@ class TestTempFilesStorage(object):
         storage.save('path/to/file.txt', 'Hello World!')
         storage.delete('path/to/file.txt')
         assert_false(storage.exists('path/to/file.txt'))
+
+    def test_stores_file_objects(self):
+        storage = TempFilesStorage()
+        storage.save('path/to/file.txt', io.BytesIO(b'Hello World!'))
+        file = storage.open('path/to/file.txt')
+        assert_equal(b'Hello World!', file.read())
+
+    def test_spills_files_beyond_max_memory_to_disk(self):
+        storage = TempFilesStorage(max_memory=16)
+        storage.save('small.txt', b'Hello World!')
+        storage.save('large.txt', io.BytesIO(b'Hello World!'))
+        assert_equal(12, storage.memory_size)
+        assert_equal(1, len(os.listdir(storage.location)))
+        with storage.open('large.txt') as file:
+            assert_is_instance(file, MappedFile)
+            assert_equal(b'Hello World!', file.read())
+            assert_equal([b'Hello World!'], list(file.chunks()))
+        storage.clear()
+
+    def test_frees_deleted_files(self):
+        storage = TempFilesStorage(max_memory=16)
+        storage.save('small.txt', b'Hello World!')
+        storage.save('large.txt', b'Hello World!')
+        storage.delete('small.txt')
+        storage.delete('large.txt')
+        assert_equal(0, storage.memory_size)
+        assert_equal([], os.listdir(storage.location))
+        storage.clear()
+
+    def test_clears_files(self):
+        storage = TempFilesStorage(max_memory=0)
+        storage.save('path/to/file.txt', b'Hello World!')
+        location = storage.location
+        storage.clear()
+        assert_false(storage.exists('path/to/file.txt'))
+        assert_false(os.path.exists(location))
+
+    def test_maps_empty_files(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            with MappedFile(path) as file:
+                assert_equal(b'', file.read())
+        finally:
+            os.remove(path)
@@ -1,8 +1,13 @@
+import os
+
 from django.template import loader, Context
 from django.test.utils import override_settings
 from django.utils import six
 from nose.tools import *
 
+from assetfiles.manifest import AssetManifest
+import assetfiles.settings
+
 from tests.base import AssetfilesTestCase
 
 
@@ -54,3 +59,47 @@ class TestStaticTagWithCachedStorage(AssetfilesTestCase):
                               '/static/test/file.78138d2003f1.txt')
         assert_static_renders('test/file.txt',
                               '/static/test/file.78138d2003f1.txt')
+
+
+class TestStaticTagWithManifest(AssetfilesTestCase):
+
+    def setUp(self):
+        super(TestStaticTagWithManifest, self).setUp()
+        self.addCleanup(setattr, assetfiles.settings, 'HASH_NAMES',
+                        assetfiles.settings.HASH_NAMES)
+        assetfiles.settings.HASH_NAMES = True
+        self.mkfile('public/assetfiles.json',
+            '{"version": 1, "paths": {"css/main.css": "css/main.abc123.css"}}')
+
+    @override_settings(DEBUG=False)
+    def test_returns_hashed_name_from_manifest(self):
+        assert_static_renders('css/main.css', '/static/css/main.abc123.css')
+        assert_static_renders('css/other.css', '/static/css/other.css')
+
+    @override_settings(DEBUG=True)
+    def test_ignores_manifest_in_debug_mode(self):
+        assert_static_renders('css/main.css', '/static/css/main.css')
+
+    @override_settings(DEBUG=False)
+    def test_ignores_manifest_without_hash_names(self):
+        assetfiles.settings.HASH_NAMES = False
+        assert_static_renders('css/main.css', '/static/css/main.css')
+
+    @override_settings(DEBUG=False)
+    def test_checks_manifest_once_per_interval(self):
+        manifest = AssetManifest(check_interval=60)
+        assert_equal('css/main.abc123.css', manifest.get('css/main.css'))
+        path = self.mkfile('public/assetfiles.json',
+            '{"version": 1, "paths": {"css/main.css": "css/main.def456.css"}}')
+        mtime = os.path.getmtime(path) + 10
+        os.utime(path, (mtime, mtime))
+        assert_equal('css/main.abc123.css', manifest.get('css/main.css'))
+
+    @override_settings(DEBUG=False)
+    def test_reloads_changed_manifest(self):
+        assert_static_renders('css/main.css', '/static/css/main.abc123.css')
+        path = self.mkfile('public/assetfiles.json',
+            '{"version": 1, "paths": {"css/main.css": "css/main.def456.css"}}')
+        mtime = os.path.getmtime(path) + 10
+        os.utime(path, (mtime, mtime))
+        assert_static_renders('css/main.css', '/static/css/main.def456.css')
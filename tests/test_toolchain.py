@@ -0,0 +1,101 @@
+import os
+import shutil
+import stat
+import tempfile
+
+from nose.tools import *
+
+from assetfiles import settings
+from assetfiles.toolchain import Toolchain
+
+
+class TestToolchain(object):
+
+    def setup(self):
+        self.root = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.root, 'cache', 'toolchain.json')
+        self.runs = []
+
+    def teardown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def mkexe(self, name, content='#!/bin/sh\n'):
+        path = os.path.join(self.root, name)
+        with open(path, 'w') as file:
+            file.write(content)
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+        return path
+
+    def run(self, command):
+        self.runs.append(command)
+        return '1.0'
+
+    def test_finds_executables_on_the_path(self):
+        path = self.mkexe('tool')
+        old_path = os.environ.get('PATH', '')
+        os.environ['PATH'] = os.pathsep.join((self.root, old_path))
+        try:
+            toolchain = Toolchain()
+            assert_equal(path, toolchain.which('tool'))
+            assert_is_none(toolchain.which('missing-tool'))
+        finally:
+            os.environ['PATH'] = old_path
+
+    def test_finds_executables_by_path(self):
+        path = self.mkexe('tool')
+        with open(os.path.join(self.root, 'script'), 'w'):
+            pass
+        toolchain = Toolchain()
+        assert_equal(path, toolchain.which(path))
+        assert_is_none(toolchain.which(os.path.join(self.root, 'script')))
+
+    def test_runs_version_commands_once(self):
+        command = '{0} --version'.format(self.mkexe('tool'))
+        toolchain = Toolchain()
+        assert_equal('1.0', toolchain.get_version(command, self.run))
+        assert_equal('1.0', toolchain.get_version(command, self.run))
+        assert_equal([command], self.runs)
+
+    def test_persists_versions(self):
+        command = '{0} --version'.format(self.mkexe('tool'))
+        Toolchain(self.cache_path).get_version(command, self.run)
+        toolchain = Toolchain(self.cache_path)
+        assert_equal('1.0', toolchain.get_version(command, self.run))
+        assert_equal([command], self.runs)
+
+    def test_runs_version_commands_again_when_executables_change(self):
+        command = '{0} --version'.format(self.mkexe('tool'))
+        Toolchain(self.cache_path).get_version(command, self.run)
+        self.mkexe('tool', '#!/bin/sh\necho 2.0\n')
+        Toolchain(self.cache_path).get_version(command, self.run)
+        assert_equal([command, command], self.runs)
+
+    def test_runs_version_commands_again_when_links_change(self):
+        old_path = self.mkexe('tool-1')
+        new_path = self.mkexe('tool-2')
+        link_path = os.path.join(self.root, 'tool')
+        os.symlink(old_path, link_path)
+        command = '{0} --version'.format(link_path)
+        Toolchain(self.cache_path).get_version(command, self.run)
+        os.remove(link_path)
+        os.symlink(new_path, link_path)
+        Toolchain(self.cache_path).get_version(command, self.run)
+        assert_equal([command, command], self.runs)
+
+    def test_only_persists_versions_if_enabled(self):
+        old_settings = settings.CACHE_DIR, settings.TOOLCHAIN_CACHE
+        settings.CACHE_DIR = self.root
+        try:
+            settings.TOOLCHAIN_CACHE = False
+            assert_is_none(Toolchain().cache_path)
+            settings.TOOLCHAIN_CACHE = True
+            assert_equal(os.path.join(self.root, 'toolchain.json'),
+                         Toolchain().cache_path)
+        finally:
+            settings.CACHE_DIR, settings.TOOLCHAIN_CACHE = old_settings
+
+    def test_does_not_persist_failed_version_commands(self):
+        command = '{0} --version'.format(self.mkexe('tool'))
+        Toolchain(self.cache_path).get_version(command, lambda command: '')
+        toolchain = Toolchain(self.cache_path)
+        assert_equal('1.0', toolchain.get_version(command, self.run))
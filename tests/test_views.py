@@ -3,6 +3,11 @@ from __future__ import unicode_literals
 
 from django_nose.tools import *
 
+from assetfiles import assets, signals
+from assetfiles.filters.sass import SassFilter
+from assetfiles.stats import stats
+import assetfiles.settings
+
 from tests.base import AssetfilesTestCase
 
 
@@ -12,6 +17,21 @@ class TestServe(AssetfilesTestCase):
         response = self.client.get('/static/non/existent/file.css')
         assert_equal(response.status_code, 404)
 
+    def test_records_served_files(self):
+        self.mkfile('static/css/simple.scss', '$c: red; body { color: $c; }')
+        served = []
+        receiver = lambda sender, **kwargs: served.append((sender, kwargs))
+        signals.asset_served.connect(receiver)
+        self.addCleanup(signals.asset_served.disconnect, receiver)
+        count = stats.snapshot()['timings'].get('serve', {}).get('count', 0)
+        self.client.get('/static/css/simple.css')
+        self.client.get('/static/css/missing.css')
+        assert_equal(count + 2, stats.snapshot()['timings']['serve']['count'])
+        assert_equal([SassFilter, None], [sender for sender, kwargs in served])
+        assert_equal([200, 404],
+                     [kwargs['status_code'] for sender, kwargs in served])
+        assert_equal('css/simple.css', served[0][1]['path'])
+
     def test_returns_static_files(self):
         self.mkfile('static/css/static.css', 'body { color: red; }')
         response = self.client.get('/static/css/static.css')
@@ -72,3 +92,102 @@ class TestServe(AssetfilesTestCase):
         assert_contains(response, 'a::before {\n  content: "é"; }')
         response = self.client.get('/static/js/simple.js')
         assert_contains(response, 'foo: "é" + 2 + "3"')
+
+    def test_returns_files_added_after_not_found(self):
+        response = self.client.get('/static/css/simple.css')
+        assert_equal(response.status_code, 404)
+        self.mkfile('static/css/simple.scss',
+            '$c: red; body { color: $c; }')
+        response = self.client.get('/static/css/simple.css')
+        assert_contains(response, 'body {\n  color: red; }')
+
+    def test_returns_files_added_after_not_found_when_notified(self):
+        self.addCleanup(setattr, assets.index, '_check_interval', None)
+        assets.index._check_interval = 60
+        response = self.client.get('/static/css/simple.css')
+        assert_equal(response.status_code, 404)
+        path = self.mkfile('static/css/simple.scss',
+            '$c: red; body { color: $c; }')
+        response = self.client.get('/static/css/simple.css')
+        assert_equal(response.status_code, 404)
+        signals.static_files_changed.send(sender=None, paths=[path])
+        response = self.client.get('/static/css/simple.css')
+        assert_contains(response, 'body {\n  color: red; }')
+
+    def test_returns_processed_files_with_etag_and_last_modified(self):
+        self.mkfile('static/css/simple.scss',
+            '$c: red; body { color: $c; }')
+        response = self.client.get('/static/css/simple.css')
+        assert_true(response.get('etag'))
+        assert_true(response.get('last-modified'))
+
+    def test_returns_not_modified_for_matching_etag(self):
+        self.mkfile('static/css/simple.scss',
+            '$c: red; body { color: $c; }')
+        response = self.client.get('/static/css/simple.css')
+        response = self.client.get('/static/css/simple.css',
+            HTTP_IF_NONE_MATCH=response['etag'])
+        assert_equal(response.status_code, 304)
+
+    def test_returns_modified_files_for_old_etag(self):
+        self.mkfile('static/css/folder/_dep.scss', '$c: black;')
+        self.mkfile('static/css/with_deps.scss',
+            '@import "folder/dep"; body { color: $c; }')
+        response = self.client.get('/static/css/with_deps.css')
+        self.mkfile('static/css/folder/_dep.scss', '$c: white; $d: 1;')
+        response = self.client.get('/static/css/with_deps.css',
+            HTTP_IF_NONE_MATCH=response['etag'])
+        assert_contains(response, 'body {\n  color: white; }')
+
+    def test_returns_not_modified_since_last_modified(self):
+        self.mkfile('static/css/simple.scss',
+            '$c: red; body { color: $c; }')
+        response = self.client.get('/static/css/simple.css')
+        response = self.client.get('/static/css/simple.css',
+            HTTP_IF_MODIFIED_SINCE=response['last-modified'])
+        assert_equal(response.status_code, 304)
+
+    def test_answers_head_requests_without_processing(self):
+        self.mkfile('static/css/syntax_error.scss', 'body {')
+        response = self.client.head('/static/css/syntax_error.css')
+        assert_equal(response.status_code, 200)
+        assert_true(response.get('etag'))
+
+    def test_streams_large_processed_files(self):
+        self.mkfile('static/css/simple.scss',
+            '$c: red; body { color: $c; }')
+        old_spool_size = assetfiles.settings.SPOOL_SIZE
+        assetfiles.settings.SPOOL_SIZE = 8
+        try:
+            response = self.client.get('/static/css/simple.css')
+        finally:
+            assetfiles.settings.SPOOL_SIZE = old_spool_size
+        assert_true(response.streaming)
+        content = b''.join(response.streaming_content)
+        assert_equal(content.decode('utf-8').strip(),
+                     'body {\n  color: red; }')
+        assert_equal(int(response['content-length']), len(content))
+
+    def test_adds_server_timing_headers(self):
+        self.mkfile('static/css/timed.scss', '$c: red; body { color: $c; }')
+        self.mkfile('static/css/static.css', 'body { color: red; }')
+        old_server_timing = assetfiles.settings.SERVER_TIMING
+        assetfiles.settings.SERVER_TIMING = True
+        try:
+            first = self.client.get('/static/css/timed.css')['server-timing']
+            second = self.client.get('/static/css/timed.css')['server-timing']
+            static = self.client.get('/static/css/static.css')['server-timing']
+        finally:
+            assetfiles.settings.SERVER_TIMING = old_server_timing
+        assert_regexp_matches(first, r'^static;dur=[\d.]+, find;dur=[\d.]+, '
+                                     r'cache;dur=[\d.]+, '
+                                     r'compile;dur=[\d.]+;desc="SassFilter", '
+                                     r'total;dur=[\d.]+$')
+        assert_not_in('compile', second)
+        assert_in('cache;dur=', second)
+        assert_regexp_matches(static, r'^static;dur=[\d.]+, total;dur=[\d.]+$')
+
+    def test_omits_server_timing_headers_by_default(self):
+        self.mkfile('static/css/simple.scss', '$c: red; body { color: $c; }')
+        response = self.client.get('/static/css/simple.css')
+        assert_false(response.has_header('server-timing'))
@@ -0,0 +1,112 @@
+from __future__ import unicode_literals
+
+import time
+
+from nose.tools import *
+
+from assetfiles import cache, filters
+from assetfiles.watcher import AssetWatcher
+
+from tests.base import AssetfilesTestCase
+
+
+def is_cached(path):
+    filter = filters.find_by_input_path('css/' + path.rsplit('/', 1)[-1])
+    entry = cache.memory_cache.get((filter.get_fingerprint(), path))
+    return entry is not None and entry[0] == cache.get_stamp(filter, path)
+
+
+class TestAssetWatcher(AssetfilesTestCase):
+
+    def setUp(self):
+        super(TestAssetWatcher, self).setUp()
+        self.watcher = AssetWatcher()
+
+    def test_polls_for_changed_files(self):
+        path = self.mkfile('static/css/main.scss', 'a { b: c; }')
+        assert_equal([], self.watcher.poll())
+        assert_equal([], self.watcher.poll())
+        self.mkfile('static/css/main.scss', 'a { b: cd; }')
+        added_path = self.mkfile('static/css/other.scss', 'a { b: c; }')
+        assert_equal(sorted([path, added_path]), self.watcher.poll())
+
+    def test_compiles_changed_files_into_the_cache(self):
+        path = self.mkfile('static/css/main.scss', 'a { b: c; }')
+        assert_equal([path], self.watcher.compile([path]))
+        assert_true(is_cached(path))
+
+    def test_compiles_files_depending_on_changed_files(self):
+        dep_path = self.mkfile('static/css/_dep.scss', '$c: red;')
+        path = self.mkfile('static/css/main.scss',
+                           '@import "dep"; a { b: $c; }')
+        assert_equal([path], self.watcher.compile([dep_path]))
+        assert_true(is_cached(path))
+
+    def test_skips_files_served_as_they_are(self):
+        path = self.mkfile('static/css/main.css', 'a { b: c; }')
+        assert_equal([], self.watcher.compile([path]))
+
+    def test_skips_files_that_fail_to_compile(self):
+        path = self.mkfile('static/css/main.scss', 'a { b: $undefined; }')
+        assert_equal([], self.watcher.compile([path]))
+
+    def test_logs_errors_and_continues(self):
+        messages = []
+        self.watcher.log = messages.append
+        path = self.mkfile('static/css/main.scss', 'a { b: c; }')
+        other_path = self.mkfile('static/css/other.scss', 'a { b: c; }')
+        filter = cache.filter
+        def failing_filter(asset_filter, asset_path, *args, **kwargs):
+            if asset_path == path:
+                raise ValueError('unexpected output')
+            return filter(asset_filter, asset_path, *args, **kwargs)
+        cache.filter = failing_filter
+        self.addCleanup(setattr, cache, 'filter', filter)
+
+        assert_equal([other_path], self.watcher.compile([path, other_path]))
+        assert_in("Failed to precompile '%s': ValueError: unexpected output"
+                  % path, messages)
+
+    def test_keeps_running_after_errors(self):
+        path = self.mkfile('static/css/main.scss', 'a { b: c; }')
+        compiled = []
+        def compile(paths):
+            if not compiled:
+                compiled.append(None)
+                raise RuntimeError('worker crashed')
+            compiled.extend(paths)
+        messages = []
+        self.watcher.log = messages.append
+        self.watcher.compile = compile
+        self.watcher._interval = 0.01
+        self.watcher.start()
+        self.addCleanup(self.watcher.stop)
+        time.sleep(0.1)
+        self.mkfile('static/css/main.scss', 'a { b: cd; }')
+        for i in range(100):
+            if compiled:
+                break
+            time.sleep(0.01)
+        self.mkfile('static/css/main.scss', 'a { b: cde; }')
+        for i in range(100):
+            if len(compiled) > 1:
+                break
+            time.sleep(0.01)
+        assert_equal([None, path], compiled)
+        assert_in("Failed to precompile '%s': RuntimeError: worker crashed"
+                  % path, messages)
+
+    def test_runs_in_the_background(self):
+        path = self.mkfile('static/css/main.scss', 'a { b: c; }')
+        compiled = []
+        self.watcher.compile = compiled.extend
+        self.watcher._interval = 0.01
+        self.watcher.start()
+        self.addCleanup(self.watcher.stop)
+        time.sleep(0.1)
+        self.mkfile('static/css/main.scss', 'a { b: cd; }')
+        for i in range(100):
+            if compiled:
+                break
+            time.sleep(0.01)
+        assert_equal([path], compiled)
@@ -0,0 +1,101 @@
+from __future__ import unicode_literals
+
+import sys
+
+from nose.tools import *
+
+from assetfiles.workers import (Worker, WorkerError, WorkerPool,
+                                WorkerTimeoutError, get_pool)
+
+
+ECHO_WORKER = '''
+import json, os, sys, time
+while True:
+    line = sys.stdin.readline()
+    if not line:
+        break
+    request = json.loads(line)
+    if request.get('crash'):
+        sys.stderr.write('crashed\\n')
+        sys.stderr.flush()
+        sys.exit(1)
+    time.sleep(request.get('sleep', 0))
+    request['pid'] = os.getpid()
+    sys.stdout.write(json.dumps(request) + '\\n')
+    sys.stdout.flush()
+'''
+
+ECHO_ARGS = [sys.executable, '-c', ECHO_WORKER]
+
+
+class TestWorker(object):
+
+    def setUp(self):
+        self.worker = Worker(ECHO_ARGS)
+        self.worker.start()
+
+    def tearDown(self):
+        self.worker.stop()
+
+    def test_answers_requests(self):
+        assert_equal('bar', self.worker.request({'foo': 'bar'})['foo'])
+        assert_equal('baz', self.worker.request({'foo': 'baz'})['foo'])
+        assert_equal(2, self.worker.jobs)
+
+    def test_raises_error_when_worker_dies(self):
+        with assert_raises(WorkerError) as context:
+            self.worker.request({'crash': True})
+        assert_in('crashed', str(context.exception))
+
+    def test_raises_error_on_timeout(self):
+        with assert_raises(WorkerTimeoutError):
+            self.worker.request({'sleep': 5}, timeout=0.1)
+        assert_false(self.worker.is_alive())
+
+
+class TestWorkerPool(object):
+
+    def test_reuses_workers(self):
+        pool = WorkerPool(ECHO_ARGS)
+        try:
+            pids = set(pool.request({})['pid'] for i in range(3))
+            assert_equal(1, len(pids))
+        finally:
+            pool.close()
+
+    def test_restarts_workers_after_max_jobs(self):
+        pool = WorkerPool(ECHO_ARGS, max_jobs=2)
+        try:
+            pids = [pool.request({})['pid'] for i in range(4)]
+            assert_equal(pids[0], pids[1])
+            assert_equal(pids[2], pids[3])
+            assert_not_equal(pids[1], pids[2])
+        finally:
+            pool.close()
+
+    def test_replaces_crashed_workers(self):
+        pool = WorkerPool(ECHO_ARGS)
+        try:
+            with assert_raises(WorkerError):
+                pool.request({'crash': True})
+            assert_equal('bar', pool.request({'foo': 'bar'})['foo'])
+        finally:
+            pool.close()
+
+    def test_does_not_retry_timeouts(self):
+        pool = WorkerPool(ECHO_ARGS, timeout=0.1)
+        try:
+            with assert_raises(WorkerTimeoutError):
+                pool.request({'sleep': 5})
+            assert_equal('bar', pool.request({'foo': 'bar'})['foo'])
+        finally:
+            pool.close()
+
+    def test_raises_error_when_command_is_missing(self):
+        pool = WorkerPool(['assetfiles-missing-worker'])
+        with assert_raises(WorkerError):
+            pool.request({})
+
+
+def test_shares_pools_by_command():
+    assert_is(get_pool(ECHO_ARGS), get_pool(list(ECHO_ARGS)))